@@ -15,7 +15,7 @@ interface BookingModalProps {
 }
 
 // URL temporária para acesso externo via Serveo
-const API_BASE_URL = 'https://7a66ca5f5bf0ad88-216-234-209-114.serveousercontent.com';
+export const API_BASE_URL = 'https://7a66ca5f5bf0ad88-216-234-209-114.serveousercontent.com';
 
 export default function BookingModal({ isOpen, onClose, initialCabana }: BookingModalProps) {
   const [step, setStep] = useState(1);
@@ -75,16 +75,21 @@ export default function BookingModal({ isOpen, onClose, initialCabana }: Booking
     }
   }, [isOpen]);
 
-  // Buscar datas ocupadas
+  // Buscar datas ocupadas, e de novo a cada reserva da cabana avisada pelo backend (SSE)
   useEffect(() => {
-    if (selectedCabana) {
-      axios.get(`${API_BASE_URL}/api/public/ocupacao/${selectedCabana.id}`)
-        .then(res => {
-          const dates = res.data.map((d: string) => new Date(d + 'T12:00:00'));
-          setDisabledDays(dates);
-        })
-        .catch(err => console.error("Erro ao carregar ocupação", err));
-    }
+    if (!selectedCabana) return;
+    const carregar = () => axios.get(`${API_BASE_URL}/api/public/ocupacao/${selectedCabana.id}`)
+      .then(res => {
+        const dates = res.data.map((d: string) => new Date(d + 'T12:00:00'));
+        setDisabledDays(dates);
+      })
+      .catch(err => console.error("Erro ao carregar ocupação", err));
+    carregar();
+
+    const fonte = new EventSource(`${API_BASE_URL}/api/public/eventos?cabana_id=${selectedCabana.id}`);
+    fonte.addEventListener('disponibilidade', carregar);
+    fonte.addEventListener('ressincronizar', carregar);
+    return () => fonte.close();
   }, [selectedCabana]);
 
   // Calculadora de Preço
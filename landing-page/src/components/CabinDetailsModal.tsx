@@ -2,6 +2,7 @@
 
 import React, { useState } from 'react';
 import { X, Check, Instagram, ArrowRight, ChevronLeft, ChevronRight } from 'lucide-react';
+import Foto from './Foto';
 
 interface CabinDetailsModalProps {
   isOpen: boolean;
@@ -37,10 +38,12 @@ export default function CabinDetailsModal({ isOpen, onClose, cabin, onBookingCli
 
         {/* Lado Esquerdo - Galeria */}
         <div className="md:w-3/5 bg-stone-200 relative group aspect-video md:aspect-auto">
-          <img 
-            src={cabin.images[currentImageIndex]} 
-            alt={cabin.title} 
+          <Foto
+            foto={cabin.images[currentImageIndex]}
+            alt={cabin.title}
+            sizes="(min-width: 768px) 60vw, 100vw"
             className="w-full h-full object-cover"
+            prioridade
           />
           
           {cabin.images.length > 1 && (
@@ -1,7 +1,10 @@
 'use client';
 
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
+import axios from 'axios';
 import CabinDetailsModal from './CabinDetailsModal';
+import { API_BASE_URL } from './BookingModal';
+import Foto, { ImagemGaleria } from './Foto';
 
 interface FeaturesProps {
   onBookingClick: () => void;
@@ -9,6 +12,23 @@ interface FeaturesProps {
 
 const Features: React.FC<FeaturesProps> = ({ onBookingClick }) => {
   const [selectedCabin, setSelectedCabin] = useState<any>(null);
+  const [galerias, setGalerias] = useState<Record<number, { capa: ImagemGaleria; fotos: ImagemGaleria[] }>>({});
+
+  // Fotos enviadas pelo painel (variantes otimizadas); sem elas, ficam as imagens de public/assets
+  useEffect(() => {
+    axios.get(`${API_BASE_URL}/api/public/cabanas`)
+      .then(res => {
+        const porCabana: typeof galerias = {};
+        for (const cabana of res.data) {
+          const fotos: ImagemGaleria[] = cabana.galeria_urls;
+          if (!fotos.length) continue;
+          const capa = fotos.find(foto => foto.medium === cabana.imagem_url) ?? fotos[0];
+          porCabana[cabana.id] = { capa, fotos };
+        }
+        setGalerias(porCabana);
+      })
+      .catch(() => {});
+  }, []);
 
   const cabins = [
     {
@@ -54,7 +74,9 @@ const Features: React.FC<FeaturesProps> = ({ onBookingClick }) => {
       ],
       amenities: ['Piscina Privativa', 'Espaço Gourmet', 'Até 5 hóspedes', 'Pé direito duplo', 'Design Exclusivo', 'Estacionamento Privado']
     },
-  ];
+  ].map(cabin => galerias[cabin.id]
+    ? { ...cabin, image: galerias[cabin.id].capa, images: galerias[cabin.id].fotos }
+    : cabin);
 
   return (
     <section id="acomodacoes" className="py-20 md:py-32 bg-stone-50 text-gray-800">
@@ -72,9 +94,10 @@ const Features: React.FC<FeaturesProps> = ({ onBookingClick }) => {
           {cabins.map((cabin) => (
             <div key={cabin.id} className="bg-white rounded-2xl shadow-xl overflow-hidden hover:shadow-2xl transition-all duration-300 flex flex-col group">
               <div className="aspect-[4/3] overflow-hidden relative cursor-pointer" onClick={() => setSelectedCabin(cabin)}>
-                <img 
-                  src={cabin.image} 
-                  alt={cabin.title} 
+                <Foto
+                  foto={cabin.image}
+                  alt={cabin.title}
+                  sizes="(min-width: 768px) 33vw, 100vw"
                   className="w-full h-full object-cover transition-transform duration-700 group-hover:scale-110"
                 />
                 <div className="absolute inset-0 bg-black/10 group-hover:bg-transparent transition-colors duration-300"></div>
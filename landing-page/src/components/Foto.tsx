@@ -0,0 +1,49 @@
+import React from 'react';
+
+// Foto da galeria como a API devolve: variantes WebP e, quando geradas, as mesmas em AVIF
+export interface ImagemGaleria {
+  full: string;
+  medium?: string;
+  thumbnail?: string;
+  avif?: Record<string, string>;
+  largura?: number;
+  altura?: number;
+}
+
+interface FotoProps {
+  foto: string | ImagemGaleria;
+  alt: string;
+  sizes: string;
+  className?: string;
+  prioridade?: boolean;
+}
+
+const LARGURAS: [string, number][] = [['thumbnail', 320], ['medium', 960], ['full', 1920]];
+
+export default function Foto({ foto, alt, sizes, className, prioridade }: FotoProps) {
+  // Imagens estáticas de public/assets, sem variantes
+  if (typeof foto === 'string') return <img src={foto} alt={alt} className={className} />;
+
+  // Imagens menores que a variante não são ampliadas no backend
+  const srcSet = (urls: Record<string, string | undefined>) => LARGURAS
+    .filter(([variante]) => urls[variante])
+    .map(([variante, largura]) => `${urls[variante]} ${Math.min(largura, foto.largura ?? largura)}w`)
+    .join(', ');
+
+  return (
+    <picture className="contents">
+      {foto.avif && <source type="image/avif" srcSet={srcSet(foto.avif)} sizes={sizes} />}
+      <img
+        src={foto.medium ?? foto.full}
+        srcSet={srcSet({ thumbnail: foto.thumbnail, medium: foto.medium, full: foto.full })}
+        sizes={sizes}
+        width={foto.largura}
+        height={foto.altura}
+        alt={alt}
+        className={className}
+        loading={prioridade ? 'eager' : 'lazy'}
+        decoding="async"
+      />
+    </picture>
+  );
+}
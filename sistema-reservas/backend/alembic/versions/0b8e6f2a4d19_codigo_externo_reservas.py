@@ -0,0 +1,49 @@
+"""codigo_externo_reservas
+
+Revision ID: 0b8e6f2a4d19
+Revises: f3c9a1e5d278
+Create Date: 2026-10-18 17:12:09.551207
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0b8e6f2a4d19'
+down_revision: Union[str, Sequence[str], None] = 'f3c9a1e5d278'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('reservas', sa.Column('codigo_externo', sa.String(), nullable=True))
+
+    # Recupera o código das reservas já importadas do reservations.csv: "... reservations.csv (HMABC123)"
+    conexao = op.get_bind()
+    reservas = sa.table('reservas', sa.column('id', sa.Integer), sa.column('origem', sa.String),
+                        sa.column('observacoes', sa.Text), sa.column('codigo_externo', sa.String))
+    padrao = re.compile(r"\(([A-Z0-9]+)\)\s*$")
+    vistos = set()
+    for id_reserva, observacoes in conexao.execute(
+        sa.select(reservas.c.id, reservas.c.observacoes).where(reservas.c.origem == 'airbnb').order_by(reservas.c.id)
+    ):
+        codigo = padrao.search(observacoes or "")
+        if codigo and codigo.group(1) not in vistos:
+            vistos.add(codigo.group(1))
+            conexao.execute(
+                reservas.update().where(reservas.c.id == id_reserva).values(codigo_externo=codigo.group(1))
+            )
+
+    op.create_index('ix_reservas_codigo_externo', 'reservas', ['codigo_externo'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reservas_codigo_externo', table_name='reservas')
+    with op.batch_alter_table('reservas') as batch_op:
+        batch_op.drop_column('codigo_externo')
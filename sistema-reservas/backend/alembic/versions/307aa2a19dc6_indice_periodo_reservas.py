@@ -0,0 +1,28 @@
+"""indice_periodo_reservas
+
+Revision ID: 307aa2a19dc6
+Revises: 234b5b35611b
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '307aa2a19dc6'
+down_revision: Union[str, Sequence[str], None] = '234b5b35611b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_reservas_cabana_periodo', 'reservas', ['cabana_id', 'data_checkout', 'data_checkin'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reservas_cabana_periodo', table_name='reservas')
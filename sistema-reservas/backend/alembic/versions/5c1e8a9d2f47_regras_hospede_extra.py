@@ -0,0 +1,33 @@
+"""regras_hospede_extra
+
+Revision ID: 5c1e8a9d2f47
+Revises: 307aa2a19dc6
+Create Date: 2026-10-18 10:03:21.540917
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e8a9d2f47'
+down_revision: Union[str, Sequence[str], None] = '307aa2a19dc6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('cabanas', sa.Column('hospedes_inclusos', sa.Integer(), server_default='2', nullable=True))
+    op.add_column('cabanas', sa.Column('valor_hospede_extra', sa.Float(), server_default='0', nullable=True))
+    # Regra que antes estava fixa no código: adulto extra na Cabana Hobbit (ID 3) custa R$ 350/noite
+    op.execute("UPDATE cabanas SET valor_hospede_extra = 350.0 WHERE id = 3")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('cabanas') as batch_op:
+        batch_op.drop_column('valor_hospede_extra')
+        batch_op.drop_column('hospedes_inclusos')
@@ -0,0 +1,47 @@
+"""jobs
+
+Revision ID: 7a2d9c4e6b18
+Revises: 0b8e6f2a4d19
+Create Date: 2026-10-18 19:42:10.318264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a2d9c4e6b18'
+down_revision: Union[str, Sequence[str], None] = '0b8e6f2a4d19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('tipo', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('parametros', sa.Text(), nullable=True),
+    sa.Column('progresso', sa.Integer(), nullable=True),
+    sa.Column('resultado', sa.Text(), nullable=True),
+    sa.Column('erro', sa.Text(), nullable=True),
+    sa.Column('tentativas', sa.Integer(), nullable=True),
+    sa.Column('dono', sa.String(), nullable=True),
+    sa.Column('expira_em', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('iniciado_em', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('concluido_em', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_jobs_id'), 'jobs', ['id'], unique=False)
+    op.create_index('ix_jobs_status_id', 'jobs', ['status', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_jobs_status_id', table_name='jobs')
+    op.drop_index(op.f('ix_jobs_id'), table_name='jobs')
+    op.drop_table('jobs')
@@ -0,0 +1,45 @@
+"""regras_tarifa
+
+Revision ID: 8e2b4f6a1c93
+Revises: 5c1e8a9d2f47
+Create Date: 2026-10-18 11:20:07.302381
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e2b4f6a1c93'
+down_revision: Union[str, Sequence[str], None] = '5c1e8a9d2f47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('regras_tarifa',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cabana_id', sa.Integer(), nullable=True),
+    sa.Column('nome', sa.String(), nullable=False),
+    sa.Column('tipo', sa.String(), nullable=True),
+    sa.Column('data_inicio', sa.Date(), nullable=False),
+    sa.Column('data_fim', sa.Date(), nullable=False),
+    sa.Column('preco_semana', sa.Float(), nullable=True),
+    sa.Column('preco_fds', sa.Float(), nullable=True),
+    sa.Column('estadia_minima', sa.Integer(), nullable=True),
+    sa.Column('prioridade', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['cabana_id'], ['cabanas.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_regras_tarifa_id'), 'regras_tarifa', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_regras_tarifa_id'), table_name='regras_tarifa')
+    op.drop_table('regras_tarifa')
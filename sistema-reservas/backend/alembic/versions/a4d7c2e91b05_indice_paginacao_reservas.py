@@ -0,0 +1,28 @@
+"""indice_paginacao_reservas
+
+Revision ID: a4d7c2e91b05
+Revises: 8e2b4f6a1c93
+Create Date: 2026-10-18 12:41:55.718240
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d7c2e91b05'
+down_revision: Union[str, Sequence[str], None] = '8e2b4f6a1c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_reservas_checkin_id', 'reservas', ['data_checkin', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_reservas_checkin_id', table_name='reservas')
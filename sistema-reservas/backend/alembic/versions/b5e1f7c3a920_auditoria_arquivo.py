@@ -0,0 +1,79 @@
+"""auditoria_arquivo
+
+Revision ID: b5e1f7c3a920
+Revises: 7a2d9c4e6b18
+Create Date: 2026-10-18 21:03:47.120455
+
+"""
+import ast
+import json
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e1f7c3a920'
+down_revision: Union[str, Sequence[str], None] = '7a2d9c4e6b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Datas no repr de dicionário que as versões anteriores gravavam: datetime.date(2027, 1, 31)
+_DATA_REPR = re.compile(r"datetime\.date\((\d+), (\d+), (\d+)\)")
+
+
+def _detalhes_estruturados(texto):
+    """Converte o `str(dict)` gravado antes em JSON; texto que não é dicionário vira {"texto": ...}."""
+    if not texto:
+        return None
+    try:
+        valor = ast.literal_eval(_DATA_REPR.sub(
+            lambda m: repr(f"{int(m.group(1)):04d}-{int(m.group(2)):02d}-{int(m.group(3)):02d}"), texto
+        ))
+    except (ValueError, SyntaxError):
+        valor = None
+    if not isinstance(valor, dict):
+        valor = {"texto": texto}
+    return json.dumps(valor, default=str)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conexao = op.get_bind()
+    logs = sa.table('audit_logs', sa.column('id', sa.Integer), sa.column('detalhes', sa.Text))
+    for id_log, detalhes in conexao.execute(
+        sa.select(logs.c.id, logs.c.detalhes).where(logs.c.detalhes.isnot(None))
+    ).fetchall():
+        conexao.execute(logs.update().where(logs.c.id == id_log).values(detalhes=_detalhes_estruturados(detalhes)))
+    with op.batch_alter_table('audit_logs') as batch_op:
+        batch_op.alter_column('detalhes', existing_type=sa.Text(), type_=sa.JSON(), existing_nullable=True,
+                              postgresql_using='detalhes::json')
+
+    op.create_index('ix_audit_logs_reserva_created', 'audit_logs', ['reserva_id', 'created_at'], unique=False)
+    op.create_index('ix_audit_logs_created', 'audit_logs', ['created_at'], unique=False)
+    op.create_table('audit_logs_arquivo',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('reserva_id', sa.Integer(), nullable=True),
+    sa.Column('usuario', sa.String(), nullable=True),
+    sa.Column('acao', sa.String(), nullable=True),
+    sa.Column('detalhes', sa.JSON(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('arquivado_em', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_audit_logs_arquivo_reserva_created', 'audit_logs_arquivo', ['reserva_id', 'created_at'], unique=False)
+    op.create_index('ix_audit_logs_arquivo_created', 'audit_logs_arquivo', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_audit_logs_arquivo_created', table_name='audit_logs_arquivo')
+    op.drop_index('ix_audit_logs_arquivo_reserva_created', table_name='audit_logs_arquivo')
+    op.drop_table('audit_logs_arquivo')
+    op.drop_index('ix_audit_logs_created', table_name='audit_logs')
+    op.drop_index('ix_audit_logs_reserva_created', table_name='audit_logs')
+    # O JSON continua legível como texto
+    with op.batch_alter_table('audit_logs') as batch_op:
+        batch_op.alter_column('detalhes', existing_type=sa.JSON(), type_=sa.Text(), existing_nullable=True)
@@ -0,0 +1,126 @@
+"""resumos_financeiros
+
+Revision ID: c6f3a8d2b714
+Revises: a4d7c2e91b05
+Create Date: 2026-10-18 14:07:12.403918
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6f3a8d2b714'
+down_revision: Union[str, Sequence[str], None] = 'a4d7c2e91b05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Status que contam como receita (como em `relatorio_service`, no momento desta migração)
+STATUS_FATURADOS = ("confirmada", "concluída")
+# Meses por INSERT ... SELECT (o SQLite limita os SELECTs de um UNION ALL)
+MESES_POR_LOTE = 120
+
+
+def _meses(inicio: date, fim: date):
+    """(ano, mes, primeiro dia, primeiro dia do mês seguinte) de cada mês com noites em [inicio, fim)."""
+    ano, mes = inicio.year, inicio.month
+    while date(ano, mes, 1) < fim:
+        proximo = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+        yield ano, mes, date(ano, mes, 1), date(*proximo, 1)
+        ano, mes = proximo
+
+
+def _dias(dialeto: str, inicio, fim):
+    if dialeto == 'sqlite':
+        return sa.cast(sa.func.julianday(fim) - sa.func.julianday(inicio), sa.Integer)
+    return sa.type_coerce(fim - inicio, sa.Integer)
+
+
+def _data(dialeto: str, valor: date):
+    literal = sa.literal(valor, sa.Date)
+    # No SQLite, CAST(... AS DATE) viraria número; lá a data fica como texto ISO
+    return literal if dialeto == 'sqlite' else sa.cast(literal, sa.Date)
+
+
+def _gerar_resumos():
+    """Resumos das reservas já existentes, agrupados por cabana e mês direto no banco.
+
+    Mesma regra do `relatorio_service`: a reserva e o faturamento contam no
+    mês do check-in; as noites e a receita das diárias (rateada por noite), no
+    mês de cada noite.
+    """
+    conexao = op.get_bind()
+    dialeto = conexao.dialect.name
+    reservas = sa.table('reservas', sa.column('cabana_id', sa.Integer), sa.column('data_checkin', sa.Date),
+                        sa.column('data_checkout', sa.Date), sa.column('valor_total', sa.Float),
+                        sa.column('status', sa.String))
+    resumos = sa.table('resumos_financeiros', sa.column('cabana_id', sa.Integer), sa.column('ano', sa.Integer),
+                       sa.column('mes', sa.Integer), sa.column('reservas', sa.Integer),
+                       sa.column('faturamento', sa.Float), sa.column('noites_ocupadas', sa.Integer),
+                       sa.column('receita_diarias', sa.Float))
+    faturadas = sa.and_(reservas.c.status.in_(STATUS_FATURADOS), reservas.c.data_checkout > reservas.c.data_checkin)
+    primeiro, ultimo = conexao.execute(
+        sa.select(sa.func.min(reservas.c.data_checkin), sa.func.max(reservas.c.data_checkout)).where(faturadas)
+    ).one()
+    if primeiro is None:
+        return
+    if isinstance(primeiro, str):
+        primeiro, ultimo = date.fromisoformat(primeiro), date.fromisoformat(ultimo)
+
+    meses = list(_meses(primeiro, ultimo))
+    for i in range(0, len(meses), MESES_POR_LOTE):
+        mes = sa.union_all(*[
+            sa.select(sa.literal(ano).label('ano'), sa.literal(numero).label('mes'),
+                      _data(dialeto, inicio).label('inicio'), _data(dialeto, fim).label('fim'))
+            for ano, numero, inicio, fim in meses[i:i + MESES_POR_LOTE]
+        ]).subquery('meses')
+        checkin, checkout = reservas.c.data_checkin, reservas.c.data_checkout
+        valor = sa.func.coalesce(reservas.c.valor_total, 0.0)
+        noites = _dias(dialeto,
+                       sa.case((checkin > mes.c.inicio, checkin), else_=mes.c.inicio),
+                       sa.case((checkout < mes.c.fim, checkout), else_=mes.c.fim))
+        no_mes_do_checkin = sa.and_(checkin >= mes.c.inicio, checkin < mes.c.fim)
+        conexao.execute(resumos.insert().from_select(
+            ['cabana_id', 'ano', 'mes', 'reservas', 'faturamento', 'noites_ocupadas', 'receita_diarias'],
+            sa.select(
+                reservas.c.cabana_id, mes.c.ano, mes.c.mes,
+                sa.func.sum(sa.case((no_mes_do_checkin, 1), else_=0)),
+                sa.func.sum(sa.case((no_mes_do_checkin, valor), else_=0.0)),
+                sa.func.sum(noites),
+                sa.func.sum(valor * noites / sa.cast(_dias(dialeto, checkin, checkout), sa.Float)),
+            ).select_from(reservas.join(mes, sa.and_(checkin < mes.c.fim, checkout > mes.c.inicio)))
+            .where(faturadas, reservas.c.cabana_id.isnot(None))
+            .group_by(reservas.c.cabana_id, mes.c.ano, mes.c.mes)
+        ))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('resumos_financeiros',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cabana_id', sa.Integer(), nullable=False),
+    sa.Column('ano', sa.Integer(), nullable=False),
+    sa.Column('mes', sa.Integer(), nullable=False),
+    sa.Column('reservas', sa.Integer(), nullable=True),
+    sa.Column('faturamento', sa.Float(), nullable=True),
+    sa.Column('noites_ocupadas', sa.Integer(), nullable=True),
+    sa.Column('receita_diarias', sa.Float(), nullable=True),
+    sa.Column('atualizado_em', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['cabana_id'], ['cabanas.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_resumos_financeiros_id'), 'resumos_financeiros', ['id'], unique=False)
+    op.create_index('ix_resumos_cabana_ano_mes', 'resumos_financeiros', ['cabana_id', 'ano', 'mes'], unique=True)
+    op.create_index('ix_resumos_ano_mes', 'resumos_financeiros', ['ano', 'mes'], unique=False)
+    _gerar_resumos()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_resumos_ano_mes', table_name='resumos_financeiros')
+    op.drop_index('ix_resumos_cabana_ano_mes', table_name='resumos_financeiros')
+    op.drop_index(op.f('ix_resumos_financeiros_id'), table_name='resumos_financeiros')
+    op.drop_table('resumos_financeiros')
@@ -0,0 +1,74 @@
+"""galeria_estruturada
+
+Revision ID: d2a9e4b7c615
+Revises: b5e1f7c3a920
+Create Date: 2026-10-18 23:12:05.384127
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd2a9e4b7c615'
+down_revision: Union[str, Sequence[str], None] = 'b5e1f7c3a920'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _lista(texto):
+    """Texto separado por vírgula (ou lista JSON em texto) vira lista; vazio vira None."""
+    if not texto or not texto.strip():
+        return None
+    texto = texto.strip()
+    if texto.startswith("["):
+        try:
+            valor = json.loads(texto)
+            if isinstance(valor, list):
+                return [str(item).strip() for item in valor if str(item).strip()] or None
+        except ValueError:
+            pass
+    return [item.strip() for item in texto.split(",") if item.strip()] or None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    conexao = op.get_bind()
+    cabanas = sa.table('cabanas', sa.column('id', sa.Integer), sa.column('amenities', sa.Text),
+                       sa.column('galeria_urls', sa.Text))
+    for id_cabana, amenities, galeria_urls in conexao.execute(
+        sa.select(cabanas.c.id, cabanas.c.amenities, cabanas.c.galeria_urls)
+    ).fetchall():
+        amenities, galeria_urls = _lista(amenities), _lista(galeria_urls)
+        conexao.execute(cabanas.update().where(cabanas.c.id == id_cabana).values(
+            amenities=json.dumps(amenities) if amenities else None,
+            galeria_urls=json.dumps([{"full": url} for url in galeria_urls]) if galeria_urls else None,
+        ))
+    with op.batch_alter_table('cabanas') as batch_op:
+        batch_op.alter_column('amenities', existing_type=sa.Text(), type_=sa.JSON(), existing_nullable=True,
+                              postgresql_using='amenities::json')
+        batch_op.alter_column('galeria_urls', existing_type=sa.Text(), type_=sa.JSON(), existing_nullable=True,
+                              postgresql_using='galeria_urls::json')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('cabanas') as batch_op:
+        batch_op.alter_column('amenities', existing_type=sa.JSON(), type_=sa.Text(), existing_nullable=True)
+        batch_op.alter_column('galeria_urls', existing_type=sa.JSON(), type_=sa.Text(), existing_nullable=True)
+    # De volta ao texto separado por vírgula (as variantes das fotos se perdem)
+    conexao = op.get_bind()
+    cabanas = sa.table('cabanas', sa.column('id', sa.Integer), sa.column('amenities', sa.Text),
+                       sa.column('galeria_urls', sa.Text))
+    for id_cabana, amenities, galeria_urls in conexao.execute(
+        sa.select(cabanas.c.id, cabanas.c.amenities, cabanas.c.galeria_urls)
+    ).fetchall():
+        amenities = json.loads(amenities) if amenities else None
+        galeria_urls = json.loads(galeria_urls) if galeria_urls else None
+        conexao.execute(cabanas.update().where(cabanas.c.id == id_cabana).values(
+            amenities=", ".join(amenities) if amenities else None,
+            galeria_urls=", ".join(foto["full"] for foto in galeria_urls) if galeria_urls else None,
+        ))
@@ -0,0 +1,44 @@
+"""feeds_ical
+
+Revision ID: e1b7d4c9a362
+Revises: c6f3a8d2b714
+Create Date: 2026-10-18 15:22:47.180354
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1b7d4c9a362'
+down_revision: Union[str, Sequence[str], None] = 'c6f3a8d2b714'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('feeds_ical',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('cabana_id', sa.Integer(), nullable=False),
+    sa.Column('url', sa.String(), nullable=False),
+    sa.Column('etag', sa.String(), nullable=True),
+    sa.Column('last_modified', sa.String(), nullable=True),
+    sa.Column('hash_conteudo', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('erro', sa.Text(), nullable=True),
+    sa.Column('sincronizado_em', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('alterado_em', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['cabana_id'], ['cabanas.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('cabana_id')
+    )
+    op.create_index(op.f('ix_feeds_ical_id'), 'feeds_ical', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_feeds_ical_id'), table_name='feeds_ical')
+    op.drop_table('feeds_ical')
@@ -0,0 +1,102 @@
+"""auditoria_ids_crescentes
+
+Revision ID: e8d4b2f6a913
+Revises: d2a9e4b7c615
+Create Date: 2026-10-19 10:24:18.530617
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8d4b2f6a913'
+down_revision: Union[str, Sequence[str], None] = 'd2a9e4b7c615'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _colunas_arquivo(particionada: bool):
+    return [
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('reserva_id', sa.Integer(), nullable=True),
+        sa.Column('usuario', sa.String(), nullable=True),
+        sa.Column('acao', sa.String(), nullable=True),
+        sa.Column('detalhes', sa.JSON(), nullable=True),
+        # Parte da chave primária na tabela particionada
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=not particionada),
+        sa.Column('arquivado_em', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+    ]
+
+
+def _trocar_arquivo(criar_nova, colunas: str):
+    """Recria `audit_logs_arquivo` (Postgres) com `criar_nova()` e copia as entradas."""
+    op.drop_index('ix_audit_logs_arquivo_created', table_name='audit_logs_arquivo')
+    op.drop_index('ix_audit_logs_arquivo_reserva_created', table_name='audit_logs_arquivo')
+    op.rename_table('audit_logs_arquivo', 'audit_logs_arquivo_antigo')
+    op.execute('ALTER TABLE audit_logs_arquivo_antigo RENAME CONSTRAINT audit_logs_arquivo_pkey '
+               'TO audit_logs_arquivo_antigo_pkey')
+    criar_nova()
+    op.create_index('ix_audit_logs_arquivo_reserva_created', 'audit_logs_arquivo', ['reserva_id', 'created_at'], unique=False)
+    op.create_index('ix_audit_logs_arquivo_created', 'audit_logs_arquivo', ['created_at'], unique=False)
+    op.execute(f'INSERT INTO audit_logs_arquivo ({colunas}) SELECT {colunas} FROM audit_logs_arquivo_antigo')
+    op.drop_table('audit_logs_arquivo_antigo')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_context().dialect.name == 'sqlite':
+        # AUTOINCREMENT: o SQLite não reaproveita o id das entradas já movidas para o arquivo
+        with op.batch_alter_table('audit_logs', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+        op.execute("DELETE FROM sqlite_sequence WHERE name = 'audit_logs'")
+        op.execute("INSERT INTO sqlite_sequence (name, seq) SELECT 'audit_logs', MAX(COALESCE(("
+                   "SELECT MAX(id) FROM audit_logs), 0), COALESCE((SELECT MAX(id) FROM audit_logs_arquivo), 0))")
+        return
+    if op.get_context().dialect.name != 'postgresql':
+        return
+
+    # Postgres: o arquivo vira uma tabela particionada, com uma partição por mês
+    # (audit_logs_arquivo_AAAA_MM), criadas pelo `auditoria_service.arquivar`
+    colunas = 'id, reserva_id, usuario, acao, detalhes, created_at, arquivado_em'
+
+    def criar_particionada():
+        op.create_table('audit_logs_arquivo', *_colunas_arquivo(True),
+                        sa.PrimaryKeyConstraint('id', 'created_at'),
+                        postgresql_partition_by='RANGE (created_at)')
+        op.execute("""
+            DO $$
+            DECLARE mes timestamp;
+            BEGIN
+                FOR mes IN SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC')
+                           FROM audit_logs_arquivo_antigo WHERE created_at IS NOT NULL LOOP
+                    EXECUTE format(
+                        'CREATE TABLE audit_logs_arquivo_%s PARTITION OF audit_logs_arquivo '
+                        'FOR VALUES FROM (%L) TO (%L)',
+                        to_char(mes, 'YYYY_MM'), mes::text || '+00', (mes + interval '1 month')::text || '+00'
+                    );
+                END LOOP;
+            END $$
+        """)
+
+    _trocar_arquivo(criar_particionada, colunas)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_context().dialect.name == 'sqlite':
+        with op.batch_alter_table('audit_logs', recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+            pass
+        return
+    if op.get_context().dialect.name != 'postgresql':
+        return
+
+    colunas = 'id, reserva_id, usuario, acao, detalhes, created_at, arquivado_em'
+
+    def criar_simples():
+        op.create_table('audit_logs_arquivo', *_colunas_arquivo(False), sa.PrimaryKeyConstraint('id'))
+
+    # Apagar a tabela particionada antiga leva junto as partições mensais
+    _trocar_arquivo(criar_simples, colunas)
@@ -0,0 +1,43 @@
+"""agendador_ical
+
+Revision ID: f3c9a1e5d278
+Revises: e1b7d4c9a362
+Create Date: 2026-10-18 16:05:31.642907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c9a1e5d278'
+down_revision: Union[str, Sequence[str], None] = 'e1b7d4c9a362'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('feeds_ical', sa.Column('duracao_ms', sa.Integer(), nullable=True))
+    op.add_column('feeds_ical', sa.Column('intervalo_segundos', sa.Integer(), nullable=True))
+    op.add_column('feeds_ical', sa.Column('falhas_consecutivas', sa.Integer(), server_default='0', nullable=True))
+    op.add_column('feeds_ical', sa.Column('proxima_sincronizacao', sa.DateTime(timezone=True), nullable=True))
+    op.create_table('travas_servico',
+    sa.Column('nome', sa.String(), nullable=False),
+    sa.Column('dono', sa.String(), nullable=False),
+    sa.Column('expira_em', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('ultima_execucao_em', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('ultima_duracao_ms', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('nome')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('travas_servico')
+    op.drop_column('feeds_ical', 'proxima_sincronizacao')
+    op.drop_column('feeds_ical', 'falhas_consecutivas')
+    op.drop_column('feeds_ical', 'intervalo_segundos')
+    op.drop_column('feeds_ical', 'duracao_ms')
@@ -1,22 +1,199 @@
-from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from fastapi import Depends
+from typing import Optional
 import os
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./sql_app.db")
+# Réplica somente leitura (opcional) para as consultas públicas; vazio = tudo no banco principal
+SQLALCHEMY_DATABASE_URL_LEITURA = os.getenv("DATABASE_URL_LEITURA") or None
+# Atraso máximo esperado da réplica; o que ela devolve logo após uma alteração não vai para os caches
+REPLICA_ATRASO_MAX_SEGUNDOS = float(os.getenv("DB_REPLICA_ATRASO_MAX_SEGUNDOS", "5"))
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Pool de conexões (Postgres e demais bancos de servidor)
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT_SEGUNDOS = float(os.getenv("DB_POOL_TIMEOUT_SEGUNDOS", "30"))
+POOL_RECYCLE_SEGUNDOS = int(os.getenv("DB_POOL_RECYCLE_SEGUNDOS", "1800"))
+# Tempo máximo de cada comando no Postgres (0 = sem limite)
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+# PRAGMAs aplicados a cada conexão SQLite
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("DB_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_BYTES = int(os.getenv("DB_SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)))
+SQLITE_WAL = os.getenv("DB_SQLITE_WAL", "1") == "1"
+
+def _configurar_sqlite(engine: Engine, em_memoria: bool):
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL: leitores não bloqueiam o escritor (e vice-versa); com ele, NORMAL
+        # só sincroniza o disco nos checkpoints e continua seguro contra corrupção
+        if SQLITE_WAL and not em_memoria:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        if SQLITE_MMAP_BYTES and not em_memoria:
+            cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_BYTES}")
+        cursor.close()
+
+# Driver assíncrono de cada banco, para o caminho `get_db_async`
+DRIVERS_ASYNC = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def url_async(url: str) -> str:
+    """A mesma URL com o driver assíncrono do banco (ex: sqlite:// -> sqlite+aiosqlite://)."""
+    url_obj = make_url(url)
+    driver = DRIVERS_ASYNC.get(url_obj.get_backend_name(), url_obj.drivername)
+    return url_obj.set(drivername=driver).render_as_string(hide_password=False)
+
+def _opcoes(url: str, assincrono: bool = False) -> dict:
+    url_obj = make_url(url)
+    if url_obj.get_backend_name() == "sqlite":
+        padrao = {"connect_args": {"check_same_thread": False}}
+        if not _sqlite_em_memoria(url):
+            padrao.update(pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW, pool_timeout=POOL_TIMEOUT_SEGUNDOS)
+        return padrao
+
+    padrao = {
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT_SEGUNDOS,
+        "pool_recycle": POOL_RECYCLE_SEGUNDOS,
+        "pool_pre_ping": True,
+    }
+    if url_obj.get_backend_name() == "postgresql" and STATEMENT_TIMEOUT_MS:
+        if assincrono:
+            padrao["connect_args"] = {"server_settings": {"statement_timeout": str(STATEMENT_TIMEOUT_MS)}}
+        else:
+            padrao["connect_args"] = {"options": f"-c statement_timeout={STATEMENT_TIMEOUT_MS}"}
+    return padrao
+
+def _sqlite_em_memoria(url: str) -> bool:
+    return make_url(url).database in (None, "", ":memory:")
+
+_OPCOES_DE_POOL = ("pool_size", "max_overflow", "pool_timeout")
+
+def _juntar_opcoes(padrao: dict, opcoes: dict) -> dict:
+    # Outro `poolclass` (ex: NullPool) não aceita as opções de dimensionamento
+    if "poolclass" in opcoes:
+        padrao = {chave: valor for chave, valor in padrao.items() if chave not in _OPCOES_DE_POOL}
+    return {**padrao, **opcoes}
+
+def criar_engine(url: str, **opcoes) -> Engine:
+    """Engine com as opções adequadas ao banco da URL.
+
+    SQLite: conexões usáveis por várias threads, espera pela trava
+    (`busy_timeout`) em vez de erro imediato, WAL, `synchronous=NORMAL` e
+    mmap. Postgres e outros: pool dimensionado, reciclagem e `pool_pre_ping`
+    para descartar conexões derrubadas pelo servidor, e `statement_timeout`.
+    `opcoes` sobrepõem os padrões.
+    """
+    engine = create_engine(url, **_juntar_opcoes(_opcoes(url), opcoes))
+    if make_url(url).get_backend_name() == "sqlite":
+        _configurar_sqlite(engine, _sqlite_em_memoria(url))
+    return engine
+
+def criar_engine_async(url: str, **opcoes) -> AsyncEngine:
+    """Versão assíncrona de `criar_engine` (aiosqlite/asyncpg), com as mesmas opções e PRAGMAs."""
+    url = url_async(url)
+    engine = create_async_engine(url, **_juntar_opcoes(_opcoes(url, assincrono=True), opcoes))
+    if make_url(url).get_backend_name() == "sqlite":
+        _configurar_sqlite(engine.sync_engine, _sqlite_em_memoria(url))
+    return engine
+
+engine = criar_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+engine_leitura = criar_engine(SQLALCHEMY_DATABASE_URL_LEITURA) if SQLALCHEMY_DATABASE_URL_LEITURA else None
+SessionLeitura = sessionmaker(autocommit=False, autoflush=False, bind=engine_leitura) if engine_leitura else None
+
+# Caminho assíncrono, por enquanto usado pelas rotas públicas (`/api/public/*`). As
+# engines são criadas no primeiro uso: o driver assíncrono do Postgres (asyncpg, extra
+# `postgres-async`) não é necessário para importar o app, nas rotas síncronas nem nas migrações
+engine_async: Optional[AsyncEngine] = None
+AsyncSessionLocal: Optional[async_sessionmaker] = None
+engine_leitura_async: Optional[AsyncEngine] = None
+AsyncSessionLeitura: Optional[async_sessionmaker] = None
+
+def sessoes_async() -> async_sessionmaker:
+    """Fábrica de `AsyncSession` do banco principal, criando a engine assíncrona na primeira chamada."""
+    global engine_async, AsyncSessionLocal
+    if AsyncSessionLocal is None:
+        engine_async = criar_engine_async(SQLALCHEMY_DATABASE_URL)
+        AsyncSessionLocal = async_sessionmaker(engine_async, autoflush=False, expire_on_commit=False)
+    return AsyncSessionLocal
+
+def sessoes_leitura_async() -> Optional[async_sessionmaker]:
+    """Como `sessoes_async`, para a réplica; None sem `DATABASE_URL_LEITURA`."""
+    global engine_leitura_async, AsyncSessionLeitura
+    if AsyncSessionLeitura is None and SQLALCHEMY_DATABASE_URL_LEITURA:
+        engine_leitura_async = criar_engine_async(SQLALCHEMY_DATABASE_URL_LEITURA)
+        AsyncSessionLeitura = async_sessionmaker(engine_leitura_async, autoflush=False, expire_on_commit=False)
+    return AsyncSessionLeitura
+
+async def fechar_engines_async():
+    """Fecha as conexões das engines assíncronas já criadas (fim do lifespan)."""
+    for engine_criada in (engine_async, engine_leitura_async):
+        if engine_criada is not None:
+            await engine_criada.dispose()
+
 Base = declarative_base()
 
+def le_da_replica(db: Session) -> bool:
+    """Se a sessão (síncrona, ou a de `AsyncSession.run_sync`) está ligada à réplica."""
+    bind = db.get_bind()
+    return bind is engine_leitura or (engine_leitura_async is not None and bind is engine_leitura_async.sync_engine)
+
+def replica_defasada(db: Session, alterado_em: Optional[float]) -> bool:
+    """Se `db` lê da réplica e a alteração em `alterado_em` (`time.monotonic`) pode ainda não ter chegado nela.
+
+    Um cache montado com essa leitura guardaria o estado anterior à alteração
+    por todo o TTL; o chamador usa o resultado só na resposta atual.
+    """
+    return (alterado_em is not None and time.monotonic() - alterado_em < REPLICA_ATRASO_MAX_SEGUNDOS
+            and le_da_replica(db))
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def get_db_leitura(db: Session = Depends(get_db)):
+    """Sessão para rotas só de leitura: a réplica, se configurada, ou a mesma de `get_db`.
+
+    A réplica pode estar alguns instantes atrás do principal; não use em
+    rotas que leem o que acabaram de gravar.
+    """
+    if SessionLeitura is None:
+        yield db
+        return
+    leitura = SessionLeitura()
+    try:
+        yield leitura
+    finally:
+        leitura.close()
+
+async def get_db_async():
+    """Como `get_db`, mas com uma AsyncSession: a rota não ocupa uma thread do threadpool enquanto espera o banco.
+
+    Serviços síncronos rodam sobre ela com `await db.run_sync(funcao, ...)`.
+    """
+    async with sessoes_async()() as db:
+        yield db
+
+async def get_db_leitura_async(db: AsyncSession = Depends(get_db_async)):
+    """Como `get_db_leitura`: a réplica, se configurada, ou a mesma sessão de `get_db_async`."""
+    fabrica = sessoes_leitura_async()
+    if fabrica is None:
+        yield db
+        return
+    async with fabrica() as leitura:
+        yield leitura
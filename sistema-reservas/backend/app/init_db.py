@@ -48,6 +48,7 @@ def init_db():
                 nome="Cabana Hobbit", numero=3, 
                 descricao="Arquitetura moderna e conforto premium.", 
                 capacidade=2, preco_base_semana=550.0, preco_base_fds=790.0,
+                hospedes_inclusos=2, valor_hospede_extra=350.0,
                 imagem_url="/assets/cabanas/cabana3.png"
             ),
         ]
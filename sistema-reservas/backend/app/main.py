@@ -1,4 +1,5 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -6,9 +7,11 @@ from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 import os
 import json
-from .routers import clientes, reservas, mensagens, cabanas, auth, usuarios, calendar, public
-from .database import engine, Base
+from .routers import clientes, reservas, mensagens, cabanas, auth, usuarios, calendar, public, tarifas, jobs, auditoria, imagens
+from .database import engine, fechar_engines_async, Base
 from .init_db import init_db
+from .services.disponibilidade_service import ContencaoReserva
+from .services import agendador_service, fluxo_eventos_service, imagens_service, jobs_service
 from contextlib import asynccontextmanager
 
 @asynccontextmanager
@@ -18,7 +21,18 @@ async def lifespan(app: FastAPI):
         init_db()
     except Exception as e:
         print(f"Erro ao inicializar banco: {e}")
+    # Sincronização periódica dos calendários do Airbnb (um único worker executa, via trava no banco)
+    agendador_service.iniciar()
+    # Importações e sincronizações enfileiradas pelos endpoints (tabela `jobs`)
+    jobs_service.iniciar()
+    # Eventos de reserva entre os workers (SSE e descarte dos caches em memória)
+    fluxo_eventos_service.iniciar()
     yield
+    fluxo_eventos_service.parar()
+    jobs_service.parar()
+    agendador_service.parar()
+    imagens_service.parar()
+    await fechar_engines_async()
 
 # Configuração do Rate Limiter
 limiter = Limiter(key_func=get_remote_address)
@@ -34,6 +48,16 @@ app = FastAPI(
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
+# Reserva que não conseguiu a trava da cabana mesmo após as novas tentativas
+async def _contencao_reserva_handler(request: Request, exc: ContencaoReserva):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Muitas reservas simultâneas para esta cabana. Tente novamente."},
+        headers={"Retry-After": "1"}
+    )
+
+app.add_exception_handler(ContencaoReserva, _contencao_reserva_handler)
+
 # Configuração de GZip
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
@@ -70,6 +94,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Proximo-Cursor"],
 )
 
 # Inclusão dos Routers (DEPOIS de definir o app)
@@ -81,6 +106,10 @@ app.include_router(reservas.router)
 app.include_router(cabanas.router)
 app.include_router(calendar.router)
 app.include_router(public.router)
+app.include_router(tarifas.router)
+app.include_router(jobs.router)
+app.include_router(auditoria.router)
+app.include_router(imagens.router)
 
 @app.get("/")
 def read_root():
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Date, Boolean, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Date, Boolean, Text, Index, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -25,16 +25,44 @@ class Cabana(Base):
     capacidade = Column(Integer, default=2)
     preco_base_semana = Column(Float, default=0.0)
     preco_base_fds = Column(Float, default=0.0)
+    hospedes_inclusos = Column(Integer, default=2) # Adultos cobertos pela diária base
+    valor_hospede_extra = Column(Float, default=0.0) # Por adulto excedente, por noite
     imagem_url = Column(String, nullable=True)
     airbnb_ical_url = Column(String, nullable=True)
     full_description = Column(Text, nullable=True)
-    amenities = Column(Text, nullable=True) # Armazenado como string separada por vírgula ou JSON
-    galeria_urls = Column(Text, nullable=True) # Armazenado como string separada por vírgula
+    amenities = Column(JSON, nullable=True) # Lista de comodidades: ["Wi-fi", "Ofurô"]
+    galeria_urls = Column(JSON, nullable=True) # Lista de {"full", "medium", "thumbnail"} (variantes opcionais)
 
     reservas = relationship("Reserva", back_populates="cabana")
 
+class RegraTarifa(Base):
+    __tablename__ = "regras_tarifa"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cabana_id = Column(Integer, ForeignKey("cabanas.id"), nullable=True) # Vazio = vale para todas
+    nome = Column(String, nullable=False)
+    tipo = Column(String, default="temporada") # temporada, feriado
+    data_inicio = Column(Date, nullable=False)
+    data_fim = Column(Date, nullable=False) # Exclusivo, como um check-out
+    preco_semana = Column(Float, nullable=True) # Vazio = mantém o preço base
+    preco_fds = Column(Float, nullable=True)
+    estadia_minima = Column(Integer, nullable=True) # Noites, para check-ins no período
+    prioridade = Column(Integer, default=0) # Maior prevalece nos dias em comum
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    cabana = relationship("Cabana")
+
 class Reserva(Base):
     __tablename__ = "reservas"
+    __table_args__ = (
+        # Atende as checagens de conflito e as consultas por janela de datas
+        Index("ix_reservas_cabana_periodo", "cabana_id", "data_checkout", "data_checkin"),
+        # Ordem estável da paginação por cursor em listar_reservas
+        Index("ix_reservas_checkin_id", "data_checkin", "id"),
+        # Chave das importações do Airbnb (CSV e iCal); vazia nas reservas locais
+        Index("ix_reservas_codigo_externo", "codigo_externo", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     cliente_id = Column(Integer, ForeignKey("clientes.id"))
@@ -48,6 +76,7 @@ class Reserva(Base):
     pago_total = Column(Boolean, default=False)
     status = Column(String, default="pendente") # confirmada, pendente, cancelada, concluída
     origem = Column(String, default="local") # local, airbnb
+    codigo_externo = Column(String, nullable=True) # Código de confirmação do Airbnb (ou UID do iCal)
     observacoes = Column(Text, nullable=True)
     checked_in_at = Column(DateTime(timezone=True), nullable=True)
     checked_out_at = Column(DateTime(timezone=True), nullable=True)
@@ -68,6 +97,24 @@ class Reserva(Base):
     mensagens = relationship("Mensagem", back_populates="reserva")
     pagamentos = relationship("Pagamento", back_populates="reserva")
 
+class ResumoFinanceiro(Base):
+    """Totais por cabana e mês, mantidos a cada escrita de reserva (ver relatorio_service)."""
+    __tablename__ = "resumos_financeiros"
+    __table_args__ = (
+        Index("ix_resumos_cabana_ano_mes", "cabana_id", "ano", "mes", unique=True),
+        Index("ix_resumos_ano_mes", "ano", "mes"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    cabana_id = Column(Integer, ForeignKey("cabanas.id"), nullable=False)
+    ano = Column(Integer, nullable=False)
+    mes = Column(Integer, nullable=False)
+    reservas = Column(Integer, default=0) # Check-ins no mês
+    faturamento = Column(Float, default=0.0) # Valor das reservas com check-in no mês
+    noites_ocupadas = Column(Integer, default=0)
+    receita_diarias = Column(Float, default=0.0) # Valor rateado pelas noites dentro do mês
+    atualizado_em = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class Pagamento(Base):
     __tablename__ = "pagamentos"
 
@@ -92,6 +139,59 @@ class Pagamento(Base):
 
     reserva = relationship("Reserva", back_populates="pagamentos")
 
+class FeedIcal(Base):
+    """Estado da última busca do calendário externo (Airbnb) de cada cabana."""
+    __tablename__ = "feeds_ical"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cabana_id = Column(Integer, ForeignKey("cabanas.id"), unique=True, nullable=False)
+    url = Column(String, nullable=False) # URL a que o estado se refere; se a cabana trocar a URL, o estado é refeito
+    etag = Column(String, nullable=True)
+    last_modified = Column(String, nullable=True) # Cabeçalho como veio do servidor
+    hash_conteudo = Column(String, nullable=True) # sha256 do último conteúdo importado
+    status = Column(String, nullable=True) # atualizado, nao_modificado, sem_alteracao, erro
+    erro = Column(Text, nullable=True)
+    sincronizado_em = Column(DateTime(timezone=True), nullable=True) # Última tentativa
+    alterado_em = Column(DateTime(timezone=True), nullable=True) # Último conteúdo novo importado
+    duracao_ms = Column(Integer, nullable=True) # Tempo do último download
+    intervalo_segundos = Column(Integer, nullable=True) # Vazio = ICAL_SYNC_INTERVALO_SEGUNDOS
+    falhas_consecutivas = Column(Integer, default=0)
+    proxima_sincronizacao = Column(DateTime(timezone=True), nullable=True)
+
+    cabana = relationship("Cabana")
+
+class TravaServico(Base):
+    """Trava com prazo (lease) para tarefas que só um worker deve executar, ex: o agendador do iCal."""
+    __tablename__ = "travas_servico"
+
+    nome = Column(String, primary_key=True)
+    dono = Column(String, nullable=False) # Identificador do processo que detém a trava
+    expira_em = Column(DateTime(timezone=True), nullable=False)
+    ultima_execucao_em = Column(DateTime(timezone=True), nullable=True)
+    ultima_duracao_ms = Column(Integer, nullable=True)
+
+class Job(Base):
+    """Tarefa em segundo plano (importação, sincronização) executada pelos workers de `jobs_service`."""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    tipo = Column(String, nullable=False) # importar_csv_airbnb, sincronizar_calendarios
+    status = Column(String, nullable=False, default="pendente") # pendente, executando, concluido, erro
+    parametros = Column(Text, nullable=True) # JSON
+    progresso = Column(Integer, default=0) # 0 a 100
+    resultado = Column(Text, nullable=True) # JSON
+    erro = Column(Text, nullable=True)
+    tentativas = Column(Integer, default=0)
+    dono = Column(String, nullable=True) # Worker que está executando
+    expira_em = Column(DateTime(timezone=True), nullable=True) # Prazo do worker; vencido, outro retoma
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    iniciado_em = Column(DateTime(timezone=True), nullable=True)
+    concluido_em = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status_id", "status", "id"),
+    )
+
 class WebhookLog(Base):
     __tablename__ = "webhook_logs"
 
@@ -121,9 +221,40 @@ class AuditLog(Base):
     reserva_id = Column(Integer, ForeignKey("reservas.id"), nullable=True)
     usuario = Column(String) # Nome do usuário que fez a ação
     acao = Column(String) # Ex: "Check-in realizado", "Status alterado"
-    detalhes = Column(Text, nullable=True)
+    detalhes = Column(JSON, nullable=True) # Ex: campos alterados {"status": "cancelada"}
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # Histórico de uma reserva, do mais recente para o mais antigo
+        Index("ix_audit_logs_reserva_created", "reserva_id", "created_at"),
+        # Listagem geral e seleção do que passou da retenção
+        Index("ix_audit_logs_created", "created_at"),
+        # Ids nunca reaproveitados no SQLite: a paginação e o arquivo contam com ids sempre crescentes
+        {"sqlite_autoincrement": True},
+    )
+
+class AuditLogArquivo(Base):
+    """Entradas de auditoria mais antigas que a retenção, movidas de `audit_logs` por `auditoria_service.arquivar`.
+
+    No Postgres a tabela é particionada por mês de `created_at`
+    (`audit_logs_arquivo_AAAA_MM`); as partições são criadas ao arquivar.
+    """
+    __tablename__ = "audit_logs_arquivo"
+
+    id = Column(Integer, primary_key=True, autoincrement=False) # Mesmo id da tabela principal
+    reserva_id = Column(Integer, nullable=True) # Sem FK: o arquivo sobrevive à reserva
+    usuario = Column(String)
+    acao = Column(String)
+    detalhes = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), primary_key=True) # Chave da partição
+    arquivado_em = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_audit_logs_arquivo_reserva_created", "reserva_id", "created_at"),
+        Index("ix_audit_logs_arquivo_created", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
 class User(Base):
     __tablename__ = "users"
 
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime
+from ..database import get_db
+from ..schemas import schemas
+from ..services import auditoria_service, jobs_service
+
+router = APIRouter(
+    prefix="/api/auditoria",
+    tags=["auditoria"]
+)
+
+@router.get("/", response_model=List[schemas.AuditLogResponse])
+def listar_auditoria(
+    response: Response,
+    reserva_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Trilha de auditoria (ativa e arquivada), da mais recente à mais antiga, paginada por cursor."""
+    logs, proximo = auditoria_service.listar(db, reserva_id=reserva_id, limite=limit, cursor=cursor)
+    if proximo:
+        response.headers["X-Proximo-Cursor"] = str(proximo)
+    return logs
+
+@router.post("/arquivar", status_code=202)
+def arquivar_auditoria(antes_de: Optional[datetime] = None, db: Session = Depends(get_db)):
+    """Enfileira o arquivamento das entradas anteriores a `antes_de` (padrão: AUDITORIA_RETENCAO_DIAS)."""
+    job = jobs_service.enfileirar(db, "arquivar_auditoria", antes_de=antes_de.isoformat() if antes_de else None)
+    return jobs_service.resposta_enfileirado(job)
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, File, HTTPException, Request, UploadFile
 from sqlalchemy.orm import Session
 from typing import List
 from ..database import get_db
 from ..models import models
 from ..schemas import schemas
+from ..services import cache_service, calendar_service, catalogo_service, imagens_service, tarifario_service
+from ..utils.http_cache import resposta_bytes_com_etag
 
 router = APIRouter(
     prefix="/api/cabanas",
@@ -11,8 +13,12 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=List[schemas.CabanaResponse])
-def listar_cabanas(db: Session = Depends(get_db)):
-    return db.query(models.Cabana).all()
+def listar_cabanas(request: Request, db: Session = Depends(get_db)):
+    em_cache = cache_service.resposta(
+        catalogo_service.NAMESPACE, "lista", lambda: catalogo_service.serializar(db.query(models.Cabana).all())
+    )
+    # Painel: o navegador sempre revalida, e o ETag evita reenviar a lista
+    return resposta_bytes_com_etag(request, em_cache.corpo, em_cache.etag, "private, no-cache")
 
 from datetime import date
 
@@ -34,11 +40,14 @@ def atualizar_cabana(id: int, cabana_data: schemas.CabanaBase, db: Session = Dep
         from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="Cabana não encontrada")
     
-    for key, value in cabana_data.model_dump().items():
+    for key, value in cabana_data.model_dump(exclude_unset=True).items():
         setattr(db_cabana, key, value)
     
     db.commit()
     db.refresh(db_cabana)
+    tarifario_service.invalidar(id)
+    calendar_service.invalidar_ical([id])
+    catalogo_service.invalidar()
     return db_cabana
 
 @router.put("/{id}/precos", response_model=schemas.CabanaResponse)
@@ -52,4 +61,32 @@ def atualizar_precos(id: int, preco_semana: float, preco_fds: float, db: Session
     cabana.preco_base_fds = preco_fds
     db.commit()
     db.refresh(cabana)
+    tarifario_service.invalidar(id)
+    catalogo_service.invalidar()
+    return cabana
+
+@router.post("/{id}/imagens", response_model=schemas.CabanaResponse)
+def enviar_imagem(id: int, file: UploadFile = File(...), capa: bool = False, db: Session = Depends(get_db)):
+    """Gera as variantes WebP/AVIF da foto e a acrescenta à galeria; `capa=true` a usa também em `imagem_url`."""
+    cabana = db.query(models.Cabana).filter(models.Cabana.id == id).first()
+    if not cabana:
+        raise HTTPException(status_code=404, detail="Cabana não encontrada")
+    if not imagens_service.pillow_disponivel():
+        raise HTTPException(status_code=501, detail="Processamento de imagens requer o pacote pillow")
+
+    dados = file.file.read(imagens_service.MAX_BYTES + 1)
+    if len(dados) > imagens_service.MAX_BYTES:
+        raise HTTPException(status_code=413, detail="Imagem maior que o limite permitido")
+    try:
+        foto = imagens_service.processar(dados)
+    except imagens_service.ImagemInvalida:
+        raise HTTPException(status_code=400, detail="O arquivo não é uma imagem válida")
+
+    # Nova lista: a coluna JSON só é regravada quando o valor é substituído
+    cabana.galeria_urls = [*(cabana.galeria_urls or []), schemas.ImagemGaleria(**foto).model_dump()]
+    if capa:
+        cabana.imagem_url = foto["medium"]
+    db.commit()
+    db.refresh(cabana)
+    catalogo_service.invalidar()
     return cabana
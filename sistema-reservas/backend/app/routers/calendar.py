@@ -1,50 +1,116 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, UploadFile, File
 from sqlalchemy.orm import Session
+import shutil
 from ..database import get_db
-from ..services.calendar_service import generate_cabana_ical, sync_airbnb_calendar
-from ..services.airbnb_csv_service import process_airbnb_csv
-from ..models.models import Cabana
+from ..services import calendar_service
+from ..utils.http_cache import data_http, nao_modificado
+from ..services import agendador_service, catalogo_service, jobs_service
+from ..services import airbnb_csv_service # noqa: F401 (registra o job de importação)
+from ..models.models import Cabana, FeedIcal, TravaServico
+from typing import Optional
 
 router = APIRouter(prefix="/calendar", tags=["Calendar"])
 
-@router.post("/upload-csv")
-async def upload_airbnb_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
+@router.post("/upload-csv", status_code=202)
+def upload_airbnb_csv(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """Salva o arquivo e enfileira a importação; acompanhe em `GET /api/jobs/{job_id}`."""
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="O arquivo deve ser um CSV")
-    
-    content = await file.read()
-    # Agora passamos os bytes brutos
-    stats = process_airbnb_csv(db, content)
-    return {"status": "success", "stats": stats}
+
+    # Copiado aos pedaços para o disco: o job sobrevive a um reinício do servidor
+    caminho = jobs_service.caminho_upload(".csv")
+    with open(caminho, "wb") as destino:
+        shutil.copyfileobj(file.file, destino)
+    job = jobs_service.enfileirar(db, "importar_csv_airbnb", arquivo=caminho, nome=file.filename)
+    return jobs_service.resposta_enfileirado(job)
 
 @router.get("/{cabana_id}.ics")
-def get_ical(cabana_id: int, db: Session = Depends(get_db)):
-    ical_content = generate_cabana_ical(db, cabana_id)
-    if not ical_content:
+def get_ical(cabana_id: int, request: Request, db: Session = Depends(get_db)):
+    exportado = calendar_service.ical_da_cabana(db, cabana_id)
+    if not exportado:
         raise HTTPException(status_code=404, detail="Cabana não encontrada")
-    
+
+    headers = {
+        "ETag": exportado.etag,
+        "Last-Modified": data_http(exportado.modificado_em),
+        "Cache-Control": "no-cache"
+    }
+    if nao_modificado(request, exportado.etag, exportado.modificado_em):
+        return Response(status_code=304, headers=headers)
     return Response(
-        content=ical_content,
+        content=exportado.conteudo,
         media_type="text/calendar",
         headers={
+            **headers,
             "Content-Disposition": f"attachment; filename=cabana_{cabana_id}.ics"
         }
     )
 
-@router.post("/sync/{cabana_id}")
+@router.post("/sync", status_code=202)
+def sync_all_calendars(db: Session = Depends(get_db)):
+    """Enfileira a sincronização em paralelo dos calendários de todas as cabanas com URL do Airbnb."""
+    return jobs_service.resposta_enfileirado(jobs_service.enfileirar(db, "sincronizar_calendarios"))
+
+@router.get("/sync/status")
+def sync_status(db: Session = Depends(get_db)):
+    """Estado do agendador e da última sincronização de cada feed."""
+    trava = db.query(TravaServico).filter(TravaServico.nome == agendador_service.NOME_TRAVA).first()
+    feeds = db.query(Cabana.id, Cabana.nome, Cabana.airbnb_ical_url, FeedIcal).outerjoin(
+        FeedIcal, FeedIcal.cabana_id == Cabana.id
+    ).filter(Cabana.airbnb_ical_url.isnot(None), Cabana.airbnb_ical_url != "").order_by(Cabana.id).all()
+    agendador = agendador_service.agendador
+
+    return {
+        "agendador": {
+            "ativo_neste_worker": agendador.ativo,
+            "lider_neste_worker": agendador.lider,
+            "ultima_rodada_neste_worker": agendador.ultima_rodada,
+            "lider": trava.dono if trava else None,
+            "trava_expira_em": trava.expira_em if trava else None,
+            "ultima_execucao_em": trava.ultima_execucao_em if trava else None,
+            "ultima_duracao_ms": trava.ultima_duracao_ms if trava else None,
+        },
+        "feeds": [
+            {
+                "cabana_id": cabana_id,
+                "nome": nome,
+                "url": url,
+                "status": feed.status if feed else None,
+                "erro": feed.erro if feed else None,
+                "sincronizado_em": feed.sincronizado_em if feed else None,
+                "alterado_em": feed.alterado_em if feed else None,
+                "proxima_sincronizacao": feed.proxima_sincronizacao if feed else None,
+                "falhas_consecutivas": feed.falhas_consecutivas if feed else 0,
+                "duracao_ms": feed.duracao_ms if feed else None,
+                "intervalo_segundos": (feed.intervalo_segundos if feed else None) or calendar_service.SYNC_INTERVALO_SEGUNDOS,
+            }
+            for cabana_id, nome, url, feed in feeds
+        ]
+    }
+
+@router.post("/sync/{cabana_id}", status_code=202)
 def sync_calendar(cabana_id: int, db: Session = Depends(get_db)):
-    success, count = sync_airbnb_calendar(db, cabana_id)
-    if not success:
+    cabana = db.query(Cabana).filter(Cabana.id == cabana_id).first()
+    if not cabana or not cabana.airbnb_ical_url:
         raise HTTPException(status_code=400, detail="Erro ao sincronizar com Airbnb")
-    
-    return {"status": "success", "novas_reservas": count}
+
+    return jobs_service.resposta_enfileirado(jobs_service.enfileirar(db, "sincronizar_calendarios", cabana_id=cabana_id))
 
 @router.patch("/set-url/{cabana_id}")
-def set_airbnb_url(cabana_id: int, url: str, db: Session = Depends(get_db)):
+def set_airbnb_url(cabana_id: int, url: str, intervalo_segundos: Optional[int] = None, db: Session = Depends(get_db)):
     cabana = db.query(Cabana).filter(Cabana.id == cabana_id).first()
     if not cabana:
         raise HTTPException(status_code=404, detail="Cabana não encontrada")
-    
+    if intervalo_segundos is not None and intervalo_segundos < 60:
+        raise HTTPException(status_code=400, detail="O intervalo mínimo de sincronização é de 60 segundos")
+
     cabana.airbnb_ical_url = url
+    if intervalo_segundos is not None:
+        feed = db.query(FeedIcal).filter(FeedIcal.cabana_id == cabana_id).first()
+        if not feed:
+            feed = FeedIcal(cabana_id=cabana_id, url=url)
+            db.add(feed)
+        feed.intervalo_segundos = intervalo_segundos
     db.commit()
+    catalogo_service.invalidar()
     return {"status": "success", "message": "URL do Airbnb atualizada"}
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from ..services import imagens_service
+
+router = APIRouter(prefix="/imagens", tags=["Imagens"])
+
+@router.get("/{nome}")
+def obter_imagem(nome: str):
+    """Variante gerada de uma foto; o nome é o hash do conteúdo, então o cache pode ser permanente."""
+    caminho = imagens_service.caminho(nome)
+    if not caminho:
+        raise HTTPException(status_code=404, detail="Imagem não encontrada")
+    return FileResponse(
+        caminho,
+        media_type=imagens_service.TIPOS[nome.rsplit(".", 1)[1]],
+        headers={"Cache-Control": imagens_service.CACHE_CONTROL_IMUTAVEL}
+    )
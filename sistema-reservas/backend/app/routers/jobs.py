@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from ..database import get_db
+from ..models.models import Job
+from ..services import jobs_service
+
+router = APIRouter(
+    prefix="/api/jobs",
+    tags=["jobs"]
+)
+
+@router.get("/{job_id}")
+def obter_job(job_id: int, db: Session = Depends(get_db)):
+    """Status, progresso (0 a 100) e, ao terminar, o resultado ou o erro de um job."""
+    job = db.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return jobs_service.como_dict(job)
@@ -1,75 +1,137 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from datetime import date
-from ..database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+from datetime import date, timedelta
+from ..database import get_db_async, get_db_leitura_async
 from ..models import models
 from ..schemas import schemas
-from sqlalchemy import and_
+from ..services import disponibilidade_service as disponibilidade
+from ..services import cache_service, catalogo_service, fluxo_eventos_service, ocupacao_service
+from ..services import preco_service
+from ..utils.http_cache import gerar_etag, etag_confere, resposta_bytes_com_etag, resposta_json_com_etag
 
+# Rotas assíncronas: o site público recebe muitas consultas simultâneas, e
+# esperar o banco não deve ocupar uma thread do threadpool. Os serviços são
+# síncronos e compartilhados com o painel; rodam com `db.run_sync`.
 router = APIRouter(
     prefix="/api/public",
     tags=["public"]
 )
 
+async def _verificar_cabana(db: AsyncSession, cabana_id: int):
+    if not (await db.execute(select(models.Cabana.id).where(models.Cabana.id == cabana_id))).first():
+        raise HTTPException(status_code=404, detail="Cabana não encontrada")
+
 @router.get("/cabanas", response_model=List[schemas.CabanaResponse])
-def listar_cabanas_publico(db: Session = Depends(get_db)):
-    return db.query(models.Cabana).all()
+async def listar_cabanas_publico(request: Request, db: AsyncSession = Depends(get_db_async)):
+    # A lista vem do cache e só vai ao banco após uma edição; lê do principal
+    # para não guardar por todo o TTL uma réplica ainda sem a edição
+    async def gerar():
+        return catalogo_service.serializar((await db.scalars(select(models.Cabana))).all())
+
+    em_cache = await cache_service.resposta_async(catalogo_service.NAMESPACE, "lista", gerar)
+    return resposta_bytes_com_etag(request, em_cache.corpo, em_cache.etag, catalogo_service.CACHE_CONTROL_PUBLICO)
+
+@router.get("/disponibilidade")
+async def disponibilidade_todas_cabanas(inicio: date, fim: date, db: AsyncSession = Depends(get_db_leitura_async)):
+    if fim <= inicio:
+        raise HTTPException(status_code=400, detail="A data final deve ser após a inicial")
+    return [
+        {"cabana_id": cabana_id, "nome": nome, "disponivel": conflitos == 0}
+        for cabana_id, nome, conflitos in await db.run_sync(disponibilidade.disponibilidade_por_cabana, inicio, fim)
+    ]
 
 @router.get("/disponibilidade/{cabana_id}")
-def verificar_disponibilidade(cabana_id: int, inicio: date, fim: date, db: Session = Depends(get_db)):
-    # ... (existente)
-    return {"disponivel": True}
+async def verificar_disponibilidade(cabana_id: int, inicio: date, fim: date,
+                                    db: AsyncSession = Depends(get_db_leitura_async)):
+    if fim <= inicio:
+        raise HTTPException(status_code=400, detail="A data final deve ser após a inicial")
+    await _verificar_cabana(db, cabana_id)
+    return {"disponivel": await db.run_sync(disponibilidade.cabana_disponivel, cabana_id, inicio, fim)}
 
 @router.get("/ocupacao/{cabana_id}")
-def listar_datas_ocupadas(cabana_id: int, db: Session = Depends(get_db)):
-    from datetime import timedelta
-    reservas = db.query(models.Reserva).filter(
-        models.Reserva.cabana_id == cabana_id,
-        models.Reserva.status != "cancelada"
-    ).all()
-    
-    datas_bloqueadas = []
-    for r in reservas:
-        curr = r.data_checkin
-        while curr < r.data_checkout:
-            datas_bloqueadas.append(curr.isoformat())
-            curr += timedelta(days=1)
-            
-    return datas_bloqueadas
+async def listar_datas_ocupadas(
+    cabana_id: int,
+    request: Request,
+    inicio: Optional[date] = None,
+    fim: Optional[date] = None,
+    formato: Literal["datas", "intervalos"] = "datas",
+    db: AsyncSession = Depends(get_db_leitura_async)
+):
+    """Noites ocupadas da cabana entre `inicio` e `fim` (padrão: de hoje até o fim do horizonte).
+
+    `formato=intervalos` devolve faixas `[{start, end}]` com `end` exclusivo,
+    como um check-out; `datas` mantém a lista de dias ISO.
+    """
+    if inicio and fim and fim <= inicio:
+        raise HTTPException(status_code=400, detail="A data final deve ser após a inicial")
+
+    inicio, fim, bits = await db.run_sync(ocupacao_service.ocupacao, cabana_id, inicio, fim)
+    etag = gerar_etag("ocupacao", cabana_id, inicio, fim, formato, f"{bits:x}")
+    if etag_confere(request, etag):
+        return resposta_json_com_etag(request, None, etag)
+
+    faixas = ocupacao_service.intervalos(bits, inicio)
+    if formato == "intervalos":
+        conteudo = [{"start": a.isoformat(), "end": b.isoformat()} for a, b in faixas]
+    else:
+        conteudo = [
+            (a + timedelta(days=i)).isoformat()
+            for a, b in faixas
+            for i in range((b - a).days)
+        ]
+    return resposta_json_com_etag(request, conteudo, etag)
+
+@router.get("/eventos")
+async def eventos_disponibilidade(request: Request, cabana_id: Optional[List[int]] = Query(None)):
+    """Server-Sent Events `disponibilidade` com a cabana e o período a recarregar, sem dados das reservas."""
+    return StreamingResponse(
+        fluxo_eventos_service.fluxo_sse(request.is_disconnected, set(cabana_id) if cabana_id else None,
+                                        fluxo_eventos_service.evento_publico),
+        media_type="text/event-stream",
+        headers=fluxo_eventos_service.CABECALHOS_SSE
+    )
 
 @router.get("/calcular-preco")
-def calcular_preco_publico(
+async def calcular_preco_publico(
     cabana_id: int, 
     data_checkin: date, 
     data_checkout: date, 
     adultos: int = 2, 
     criancas: int = 0,
-    db: Session = Depends(get_db)
+    detalhado: bool = False,
+    db: AsyncSession = Depends(get_db_leitura_async)
 ):
-    from datetime import timedelta
-    cabana = db.query(models.Cabana).filter(models.Cabana.id == cabana_id).first()
-    if not cabana or data_checkout <= data_checkin:
-        return {"total": 0, "sinal": 0, "diarias": 0}
-
-    total, diarias, current = 0.0, 0, data_checkin
-    while current < data_checkout:
-        # Preço Base
-        valor_dia = cabana.preco_base_fds if current.weekday() in [4, 5] else cabana.preco_base_semana
-        
-        # Lógica de Hóspede Extra (Apenas na Hobbit - ID 3)
-        if cabana_id == 3 and adultos > 2:
-            adultos_extras = adultos - 2
-            valor_dia += (adultos_extras * 350.0)
-            
-        total += valor_dia
-        current += timedelta(days=1)
-        diarias += 1
-        
-    return {"total": total, "sinal": total * 0.5, "diarias": diarias}
+    return await db.run_sync(
+        preco_service.calcular_preco, cabana_id, data_checkin, data_checkout, adultos, criancas, detalhado
+    )
+
+@router.get("/cotacoes")
+async def cotar_todas_cabanas(
+    data_checkin: date,
+    data_checkout: date,
+    adultos: int = 2,
+    criancas: int = 0,
+    db: AsyncSession = Depends(get_db_leitura_async)
+):
+    """Orçamento da mesma estadia em todas as cabanas, para a busca da landing page."""
+    return await db.run_sync(preco_service.cotar_todas_cabanas, data_checkin, data_checkout, adultos, criancas)
 
 from pydantic import BaseModel
 
+class PedidoCotacao(BaseModel):
+    cabana_id: int
+    data_checkin: date
+    data_checkout: date
+    adultos: int = 2
+    criancas: int = 0
+
+@router.post("/cotacoes")
+async def cotar_lote(pedidos: List[PedidoCotacao], db: AsyncSession = Depends(get_db_async)):
+    return await db.run_sync(preco_service.cotar_lote, [p.model_dump() for p in pedidos])
+
 class SolicitacaoReserva(BaseModel):
     nome: str
     telefone: str
@@ -81,52 +143,54 @@ class SolicitacaoReserva(BaseModel):
     criancas: int = 0
 
 @router.post("/reservar")
-def solicitar_reserva(solicitacao: SolicitacaoReserva, db: Session = Depends(get_db)):
-    # 1. Verificar disponibilidade novamente
-    conflito = db.query(models.Reserva).filter(
-        models.Reserva.cabana_id == solicitacao.cabana_id,
-        models.Reserva.status != "cancelada",
-        and_(
-            solicitacao.data_checkin < models.Reserva.data_checkout,
-            solicitacao.data_checkout > models.Reserva.data_checkin
+async def solicitar_reserva(solicitacao: SolicitacaoReserva, db: AsyncSession = Depends(get_db_async)):
+    def registrar(db):
+        # 1. Verificar disponibilidade novamente, já com a cabana travada
+        conflito = disponibilidade.buscar_conflito(
+            db, solicitacao.cabana_id, solicitacao.data_checkin, solicitacao.data_checkout
         )
-    ).first()
-    
-    if conflito:
-        raise HTTPException(status_code=400, detail="Desculpe, estas datas foram reservadas recentemente.")
-
-    # 2. Criar ou buscar cliente
-    cliente = db.query(models.Cliente).filter(models.Cliente.email == solicitacao.email).first()
-    if not cliente:
-        cliente = models.Cliente(nome=solicitacao.nome, telefone=solicitacao.telefone, email=solicitacao.email)
-        db.add(cliente)
-        db.flush()
+        if conflito:
+            raise HTTPException(status_code=400, detail="Desculpe, estas datas foram reservadas recentemente.")
 
-    # 3. Calcular Valor Total com hóspedes
-    from .public import calcular_preco_publico
-    orcamento = calcular_preco_publico(
-        solicitacao.cabana_id, 
-        solicitacao.data_checkin, 
-        solicitacao.data_checkout, 
-        solicitacao.adultos, 
-        solicitacao.criancas, 
-        db
-    )
+        # 2. Criar ou buscar cliente
+        cliente = db.query(models.Cliente).filter(models.Cliente.email == solicitacao.email).first()
+        if not cliente:
+            cliente = models.Cliente(nome=solicitacao.nome, telefone=solicitacao.telefone, email=solicitacao.email)
+            db.add(cliente)
+            db.flush()
 
-    # 4. Criar reserva pendente
-    nova_reserva = models.Reserva(
-        cliente_id=cliente.id,
-        cabana_id=solicitacao.cabana_id,
-        data_checkin=solicitacao.data_checkin,
-        data_checkout=solicitacao.data_checkout,
-        valor_total=orcamento["total"],
-        valor_sinal=0.0,
-        status="pendente",
-        origem="local",
-        observacoes=f"Solicitação via Landing Page. Hóspedes: {solicitacao.adultos} adultos, {solicitacao.criancas} crianças."
-    )
-    db.add(nova_reserva)
-    db.commit()
-    db.refresh(nova_reserva)
+        # 3. Calcular Valor Total com hóspedes
+        orcamento = preco_service.calcular_preco(
+            db,
+            solicitacao.cabana_id, 
+            solicitacao.data_checkin, 
+            solicitacao.data_checkout, 
+            solicitacao.adultos, 
+            solicitacao.criancas
+        )
+        if not orcamento["diarias"]:
+            raise HTTPException(status_code=400, detail="Cabana ou datas inválidas.")
+        if orcamento["diarias"] < orcamento["estadia_minima"]:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Estadia mínima de {orcamento['estadia_minima']} noites para estas datas."
+            )
+
+        # 4. Criar reserva pendente
+        nova_reserva = models.Reserva(
+            cliente_id=cliente.id,
+            cabana_id=solicitacao.cabana_id,
+            data_checkin=solicitacao.data_checkin,
+            data_checkout=solicitacao.data_checkout,
+            valor_total=orcamento["total"],
+            valor_sinal=0.0,
+            status="pendente",
+            origem="local",
+            observacoes=f"Solicitação via Landing Page. Hóspedes: {solicitacao.adultos} adultos, {solicitacao.criancas} crianças."
+        )
+        db.add(nova_reserva)
+        db.flush()
+        return nova_reserva
 
+    nova_reserva = await disponibilidade.executar_com_trava_async(db, solicitacao.cabana_id, registrar)
     return {"status": "success", "reserva_id": nova_reserva.id}
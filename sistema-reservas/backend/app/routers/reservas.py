@@ -1,17 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status, BackgroundTasks
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_, func, extract
-from typing import List, Optional
-from datetime import date, timedelta
-import io
-import csv
+from sqlalchemy.orm import Session, load_only, selectinload
+from sqlalchemy import func, tuple_
+from typing import List, Literal, Optional
+from datetime import date
+import base64
 
 from ..database import get_db
 from ..models import models
 from ..schemas import schemas
 from ..utils import email as email_util
 from ..utils import logging as log_util
+from ..utils.auth import usuario_atual
+from ..services import disponibilidade_service as disponibilidade
+from ..services import preco_service
+from ..services import exportacao_service
+from ..services import relatorio_service
+from ..services import auditoria_service
+from ..services import fluxo_eventos_service
 
 router = APIRouter(
     prefix="/api/reservas",
@@ -19,56 +25,170 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=schemas.ReservaResponse, status_code=status.HTTP_201_CREATED)
-def criar_reserva(reserva: schemas.ReservaCreate, db: Session = Depends(get_db)):
+def criar_reserva(reserva: schemas.ReservaCreate, db: Session = Depends(get_db), usuario: str = Depends(usuario_atual)):
     if reserva.data_checkout <= reserva.data_checkin:
         raise HTTPException(status_code=400, detail="Data de check-out deve ser após o check-in")
 
-    conflito = db.query(models.Reserva).filter(
-        models.Reserva.cabana_id == reserva.cabana_id,
-        models.Reserva.status != "cancelada",
-        and_(
-            reserva.data_checkin < models.Reserva.data_checkout,
-            reserva.data_checkout > models.Reserva.data_checkin
-        )
-    ).first()
-
-    if conflito:
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Cabana não disponível nestas datas. Conflito com reserva #{conflito.id}"
-        )
-
-    db_reserva = models.Reserva(**reserva.model_dump())
-    db.add(db_reserva)
-    db.commit()
+    def inserir():
+        conflito = disponibilidade.buscar_conflito(db, reserva.cabana_id, reserva.data_checkin, reserva.data_checkout)
+        if conflito:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Cabana não disponível nestas datas. Conflito com reserva #{conflito.id}"
+            )
+
+        db_reserva = models.Reserva(**reserva.model_dump())
+        db.add(db_reserva)
+        db.flush()
+        log_util.log_action(db, usuario, "Criação de Reserva", db_reserva.id)
+        return db_reserva
+
+    db_reserva = disponibilidade.executar_com_trava(db, reserva.cabana_id, inserir)
     db.refresh(db_reserva)
-    
-    log_util.log_action(db, "admin", "Criação de Reserva", db_reserva.id)
     return db_reserva
 
-@router.get("/", response_model=List[schemas.ReservaResponse])
+CAMPOS_RESERVA = set(schemas.ReservaResumo.model_fields)
+# Tamanho da página quando só o cursor é informado
+PAGINA_PADRAO = 100
+EXPANSOES = {
+    "cliente": (models.Reserva.cliente, schemas.ClienteResponse),
+    "cabana": (models.Reserva.cabana, schemas.CabanaResponse),
+}
+
+def _codificar_cursor(data_checkin: date, id: int) -> str:
+    return base64.urlsafe_b64encode(f"{data_checkin.isoformat()}|{id}".encode()).decode()
+
+def _decodificar_cursor(cursor: str):
+    try:
+        checkin, id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return date.fromisoformat(checkin), int(id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+def _lista_de_nomes(valor: Optional[str], permitidos, parametro: str) -> Optional[set]:
+    if not valor:
+        return None
+    nomes = {n.strip() for n in valor.split(",") if n.strip()}
+    invalidos = nomes - set(permitidos)
+    if invalidos:
+        raise HTTPException(status_code=400, detail=f"Valores inválidos em {parametro}: {', '.join(sorted(invalidos))}")
+    return nomes
+
+@router.get("/")
 def listar_reservas(
+    response: Response,
     cabana_id: Optional[int] = None, 
     status: Optional[str] = None,
+    desde: Optional[date] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    ordem: Literal["asc", "desc"] = "desc",
+    fields: Optional[str] = None,
+    expand: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
+    """Reservas ordenadas por (data_checkin, id); com `limit` ou `cursor`, paginadas por cursor.
+
+    Sem nenhum dos dois, devolve todas as reservas do filtro. Numa página
+    (`limit`, padrão 100 quando só o cursor vem), o cursor da próxima vem no
+    cabeçalho `X-Proximo-Cursor`. `desde` deixa só as estadias com check-out
+    depois da data. `fields` limita as colunas carregadas e devolvidas;
+    `expand=cliente,cabana` inclui os relacionamentos, carregados com uma
+    consulta extra cada (selectinload).
+    """
+    campos = _lista_de_nomes(fields, CAMPOS_RESERVA, "fields")
+    expansoes = _lista_de_nomes(expand, EXPANSOES, "expand") or set()
+
     query = db.query(models.Reserva)
     if cabana_id:
         query = query.filter(models.Reserva.cabana_id == cabana_id)
     if status:
         query = query.filter(models.Reserva.status == status)
-    return query.all()
+    if desde:
+        query = query.filter(models.Reserva.data_checkout > desde)
+    if campos:
+        # id e data_checkin sempre carregados: compõem o cursor
+        colunas = campos | {"id", "data_checkin"}
+        query = query.options(load_only(*[getattr(models.Reserva, c) for c in colunas]))
+    for nome in expansoes:
+        query = query.options(selectinload(EXPANSOES[nome][0]))
+
+    chave = tuple_(models.Reserva.data_checkin, models.Reserva.id)
+    if cursor:
+        posicao = tuple_(*_decodificar_cursor(cursor))
+        query = query.filter(chave < posicao if ordem == "desc" else chave > posicao)
+    if ordem == "desc":
+        query = query.order_by(models.Reserva.data_checkin.desc(), models.Reserva.id.desc())
+    else:
+        query = query.order_by(models.Reserva.data_checkin, models.Reserva.id)
+
+    if limit is None and cursor is None:
+        reservas = query.all()
+    else:
+        limit = limit or PAGINA_PADRAO
+        reservas = query.limit(limit + 1).all()
+    if limit is not None and len(reservas) > limit:
+        reservas = reservas[:limit]
+        response.headers["X-Proximo-Cursor"] = _codificar_cursor(reservas[-1].data_checkin, reservas[-1].id)
 
-@router.get("/calendario", response_model=List[schemas.ReservaCalendario])
-def dados_calendario(db: Session = Depends(get_db)):
-    reservas = db.query(models.Reserva).filter(models.Reserva.status != "cancelada").all()
     resultado = []
     for r in reservas:
-        cliente_nome = r.cliente.nome if r.cliente else "N/A"
+        if campos:
+            item = {c: getattr(r, c) for c in campos}
+        else:
+            item = schemas.ReservaResumo.model_validate(r).model_dump()
+        for nome in expansoes:
+            relacionado = getattr(r, nome)
+            item[nome] = EXPANSOES[nome][1].model_validate(relacionado).model_dump() if relacionado else None
+        resultado.append(item)
+    return resultado
+
+@router.get("/eventos")
+async def eventos_reservas(request: Request, cabana_id: Optional[List[int]] = Query(None)):
+    """Server-Sent Events com cada reserva criada, atualizada, cancelada ou removida (todas as cabanas, ou as de `cabana_id`)."""
+    return StreamingResponse(
+        fluxo_eventos_service.fluxo_sse(request.is_disconnected, set(cabana_id) if cabana_id else None),
+        media_type="text/event-stream",
+        headers=fluxo_eventos_service.CABECALHOS_SSE
+    )
+
+@router.get("/calendario", response_model=List[schemas.ReservaCalendario])
+def dados_calendario(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    cabana_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Eventos do calendário na janela visível [start, end), numa única consulta com join."""
+    query = db.query(
+        models.Reserva.id,
+        models.Reserva.data_checkin,
+        models.Reserva.data_checkout,
+        models.Reserva.cabana_id,
+        models.Reserva.status,
+        models.Reserva.origem,
+        models.Cliente.nome.label("cliente_nome"),
+        models.Cabana.nome.label("cabana_nome")
+    ).outerjoin(
+        models.Cliente, models.Reserva.cliente_id == models.Cliente.id
+    ).outerjoin(
+        models.Cabana, models.Reserva.cabana_id == models.Cabana.id
+    ).filter(models.Reserva.status != "cancelada")
+
+    if cabana_id:
+        query = query.filter(models.Reserva.cabana_id == cabana_id)
+    if start:
+        query = query.filter(models.Reserva.data_checkout > start)
+    if end:
+        query = query.filter(models.Reserva.data_checkin < end)
+
+    resultado = []
+    for r in query.order_by(models.Reserva.data_checkin):
+        cliente_nome = r.cliente_nome or "N/A"
         # Se for Airbnb e o cliente for o import padrão, melhora o título
-        title = f"{cliente_nome} - {r.cabana.nome}"
+        title = f"{cliente_nome} - {r.cabana_nome}"
         if r.origem == "airbnb" and cliente_nome == "Airbnb Import":
-            title = f"Airbnb - {r.cabana.nome}"
+            title = f"Airbnb - {r.cabana_nome}"
             
         resultado.append({
             "id": r.id,
@@ -76,79 +196,109 @@ def dados_calendario(db: Session = Depends(get_db)):
             "start": r.data_checkin,
             "end": r.data_checkout,
             "cabana_id": r.cabana_id,
-            "status": r.status
+            "status": r.status,
+            "cliente_nome": r.cliente_nome
         })
     return resultado
 
 @router.get("/export")
-def exportar_reservas(db: Session = Depends(get_db)):
-    reservas = db.query(models.Reserva).all()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow(["ID", "Cliente", "Telefone", "Cabana", "Check-in", "Check-out", "Valor", "Status", "Origem"])
-    for r in reservas:
-        writer.writerow([
-            r.id, r.cliente.nome if r.cliente else "N/A", 
-            r.cliente.telefone if r.cliente else "N/A",
-            r.cabana.nome, r.data_checkin, r.data_checkout, 
-            r.valor_total, r.status, r.origem
-        ])
-    output.seek(0)
-    return StreamingResponse(iter([output.getvalue()]), media_type="text/csv", 
-                             headers={"Content-Disposition": "attachment; filename=reservas.csv"})
+def exportar_reservas(
+    inicio: Optional[date] = None,
+    fim: Optional[date] = None,
+    status: Optional[str] = None,
+    origem: Optional[str] = None,
+    formato: Literal["csv", "csv.gz", "parquet"] = "csv",
+    db: Session = Depends(get_db)
+):
+    """Exporta as reservas com check-in entre `inicio` e `fim` (inclusive) em lotes, sem montar o arquivo em memória."""
+    filtros = {"inicio": inicio, "fim": fim, "status": status, "origem": origem}
+    if formato == "parquet":
+        if not exportacao_service.pyarrow_disponivel():
+            raise HTTPException(status_code=501, detail="Exportação Parquet requer o pacote pyarrow")
+        conteudo, media_type = exportacao_service.gerar_parquet(db, **filtros), "application/vnd.apache.parquet"
+    elif formato == "csv.gz":
+        conteudo, media_type = exportacao_service.gerar_csv_gzip(db, **filtros), "application/gzip"
+    else:
+        conteudo, media_type = exportacao_service.gerar_csv(db, **filtros), "text/csv"
+
+    return StreamingResponse(conteudo, media_type=media_type,
+                             headers={"Content-Disposition": f"attachment; filename=reservas.{formato}"})
 
 @router.get("/relatorios")
-def relatorios_financeiros(db: Session = Depends(get_db)):
-    faturamento_mensal = db.query(
-        extract('month', models.Reserva.data_checkin).label('mes'),
-        extract('year', models.Reserva.data_checkin).label('ano'),
-        func.sum(models.Reserva.valor_total).label('total')
-    ).filter(models.Reserva.status.in_(['confirmada', 'concluída'])).group_by('ano', 'mes').all()
-
-    ocupacao_por_cabana = db.query(
-        models.Reserva.cabana_id,
-        func.count(models.Reserva.id).label('total_reservas'),
-        func.sum(models.Reserva.valor_total).label('faturamento')
-    ).filter(models.Reserva.status.in_(['confirmada', 'concluída'])).group_by(models.Reserva.cabana_id).all()
+def relatorios_financeiros(
+    inicio: Optional[date] = None,
+    fim: Optional[date] = None,
+    cabana_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Relatório a partir dos resumos mensais; `inicio`/`fim` filtram pelos meses que tocam."""
+    resumo = models.ResumoFinanceiro
+    query = db.query(
+        resumo.cabana_id, resumo.ano, resumo.mes, resumo.reservas,
+        resumo.faturamento, resumo.noites_ocupadas, resumo.receita_diarias
+    )
+    if inicio:
+        query = query.filter(tuple_(resumo.ano, resumo.mes) >= (inicio.year, inicio.month))
+    if fim:
+        query = query.filter(tuple_(resumo.ano, resumo.mes) <= (fim.year, fim.month))
+    if cabana_id is not None:
+        query = query.filter(resumo.cabana_id == cabana_id)
+    resumos = query.order_by(resumo.ano, resumo.mes, resumo.cabana_id).all()
+
+    mensal, por_cabana = {}, {}
+    for r in resumos:
+        if r.reservas:
+            mes = mensal.setdefault((r.ano, r.mes), {"mes": r.mes, "ano": r.ano, "total": 0.0})
+            mes["total"] += r.faturamento or 0.0
+            cabana = por_cabana.setdefault(r.cabana_id, {"cabana_id": r.cabana_id, "reservas": 0, "faturamento": 0.0})
+            cabana["reservas"] += r.reservas
+            cabana["faturamento"] += r.faturamento or 0.0
 
     return {
-        "mensal": [{"mes": int(f[0]), "ano": int(f[1]), "total": f[2]} for f in faturamento_mensal],
-        "por_cabana": [{"cabana_id": o[0], "reservas": o[1], "faturamento": o[2]} for o in ocupacao_por_cabana]
+        "mensal": list(mensal.values()),
+        "por_cabana": sorted(por_cabana.values(), key=lambda c: c["cabana_id"]),
+        "metricas": [relatorio_service.metricas(r) for r in resumos]
     }
 
+@router.post("/relatorios/reconstruir")
+def reconstruir_relatorios(db: Session = Depends(get_db), usuario: str = Depends(usuario_atual)):
+    linhas = relatorio_service.reconstruir(db)
+    log_util.log_action(db, usuario, f"Resumos financeiros reconstruídos ({linhas} linhas)")
+    db.commit()
+    return {"linhas": linhas}
+
 @router.get("/calcular-preco")
-def calcular_preco_sugerido(cabana_id: int, data_checkin: date, data_checkout: date, db: Session = Depends(get_db)):
-    cabana = db.query(models.Cabana).filter(models.Cabana.id == cabana_id).first()
-    if not cabana or data_checkout <= data_checkin:
-        return {"total": 0, "sinal": 0, "diarias": 0}
-
-    total, diarias, current = 0.0, 0, data_checkin
-    while current < data_checkout:
-        total += cabana.preco_base_fds if current.weekday() in [4, 5] else cabana.preco_base_semana
-        current += timedelta(days=1)
-        diarias += 1
-    return {"total": total, "sinal": total * 0.5, "diarias": diarias}
+def calcular_preco_sugerido(
+    cabana_id: int,
+    data_checkin: date,
+    data_checkout: date,
+    adultos: int = 2,
+    detalhado: bool = False,
+    db: Session = Depends(get_db)
+):
+    return preco_service.calcular_preco(db, cabana_id, data_checkin, data_checkout, adultos, detalhado=detalhado)
 
 @router.post("/{id}/check-in", response_model=schemas.ReservaResponse)
-def registrar_checkin(id: int, db: Session = Depends(get_db)):
+def registrar_checkin(id: int, db: Session = Depends(get_db), usuario: str = Depends(usuario_atual)):
     db_reserva = db.query(models.Reserva).filter(models.Reserva.id == id).first()
     if not db_reserva: raise HTTPException(status_code=404)
     db_reserva.checked_in_at, db_reserva.status = func.now(), "confirmada"
+    log_util.log_action(db, usuario, "Check-in realizado", id)
     db.commit()
-    log_util.log_action(db, "admin", "Check-in realizado", id)
     return db_reserva
 
 @router.post("/{id}/check-out", response_model=schemas.ReservaResponse)
-def registrar_checkout(id: int, db: Session = Depends(get_db)):
+def registrar_checkout(id: int, db: Session = Depends(get_db), usuario: str = Depends(usuario_atual)):
     db_reserva = db.query(models.Reserva).filter(models.Reserva.id == id).first()
     if not db_reserva: raise HTTPException(status_code=404)
     db_reserva.checked_out_at, db_reserva.status = func.now(), "concluída"
+    log_util.log_action(db, usuario, "Check-out realizado", id)
     db.commit()
-    log_util.log_action(db, "admin", "Check-out realizado", id)
     return db_reserva
 
 @router.post("/{id}/enviar-voucher")
-async def enviar_voucher(id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+async def enviar_voucher(id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db),
+                         usuario: str = Depends(usuario_atual)):
     db_reserva = db.query(models.Reserva).filter(models.Reserva.id == id).first()
     if not db_reserva or not db_reserva.cliente.email: raise HTTPException(status_code=400)
     
@@ -159,12 +309,26 @@ async def enviar_voucher(id: int, background_tasks: BackgroundTasks, db: Session
         "pago_sinal": db_reserva.pago_sinal, "pago_total": db_reserva.pago_total
     }
     background_tasks.add_task(email_util.enviar_voucher_email, db_reserva.cliente.email, template_data)
-    log_util.log_action(db, "admin", "Voucher enviado por e-mail", id)
+    log_util.log_action(db, usuario, "Voucher enviado por e-mail", id)
+    db.commit()
     return {"message": "Enviado"}
 
 @router.get("/{id}/logs", response_model=List[schemas.AuditLogResponse])
-def listar_logs_reserva(id: int, db: Session = Depends(get_db)):
-    return db.query(models.AuditLog).filter(models.AuditLog.reserva_id == id).order_by(models.AuditLog.created_at.desc()).all()
+def listar_logs_reserva(
+    id: int,
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Histórico da reserva, do mais recente ao mais antigo, incluindo as entradas já arquivadas.
+
+    O cursor da próxima página vem no cabeçalho `X-Proximo-Cursor`.
+    """
+    logs, proximo = auditoria_service.listar(db, reserva_id=id, limite=limit, cursor=cursor)
+    if proximo:
+        response.headers["X-Proximo-Cursor"] = str(proximo)
+    return logs
 
 @router.get("/{id}", response_model=schemas.ReservaResponse)
 def buscar_reserva(id: int, db: Session = Depends(get_db)):
@@ -173,24 +337,40 @@ def buscar_reserva(id: int, db: Session = Depends(get_db)):
     return res
 
 @router.put("/{id}", response_model=schemas.ReservaResponse)
-def atualizar_reserva(id: int, reserva_update: schemas.ReservaUpdate, db: Session = Depends(get_db)):
+def atualizar_reserva(id: int, reserva_update: schemas.ReservaUpdate, db: Session = Depends(get_db),
+                      usuario: str = Depends(usuario_atual)):
     db_reserva = db.query(models.Reserva).filter(models.Reserva.id == id).first()
     if not db_reserva: raise HTTPException(status_code=404)
     
     update_data = reserva_update.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_reserva, key, value)
-    
-    db.commit()
+
+    def aplicar():
+        checkin = update_data.get("data_checkin", db_reserva.data_checkin)
+        checkout = update_data.get("data_checkout", db_reserva.data_checkout)
+        status_final = update_data.get("status", db_reserva.status)
+        if checkout <= checkin:
+            raise HTTPException(status_code=400, detail="Data de check-out deve ser após o check-in")
+        if status_final != "cancelada":
+            conflito = disponibilidade.buscar_conflito(db, db_reserva.cabana_id, checkin, checkout, ignorar_reserva_id=id)
+            if conflito:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Cabana não disponível nestas datas. Conflito com reserva #{conflito.id}"
+                )
+
+        for key, value in update_data.items():
+            setattr(db_reserva, key, value)
+        log_util.log_action(db, usuario, "Reserva atualizada", id, update_data)
+
+    disponibilidade.executar_com_trava(db, db_reserva.cabana_id, aplicar)
     db.refresh(db_reserva)
-    log_util.log_action(db, "admin", "Reserva atualizada", id, str(update_data))
     return db_reserva
 
 @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
-def cancelar_reserva(id: int, db: Session = Depends(get_db)):
+def cancelar_reserva(id: int, db: Session = Depends(get_db), usuario: str = Depends(usuario_atual)):
     db_reserva = db.query(models.Reserva).filter(models.Reserva.id == id).first()
     if not db_reserva: raise HTTPException(status_code=404)
     db_reserva.status = "cancelada"
+    log_util.log_action(db, usuario, "Reserva cancelada", id)
     db.commit()
-    log_util.log_action(db, "admin", "Reserva cancelada", id)
     return None
\ No newline at end of file
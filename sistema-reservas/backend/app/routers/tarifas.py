@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from ..database import get_db
+from ..models import models
+from ..schemas import schemas
+from ..services import tarifario_service
+
+router = APIRouter(
+    prefix="/api/tarifas",
+    tags=["tarifas"]
+)
+
+def _validar_periodo(regra: schemas.RegraTarifaBase):
+    if regra.data_fim <= regra.data_inicio:
+        raise HTTPException(status_code=400, detail="A data final da regra deve ser após a inicial")
+
+@router.get("/", response_model=List[schemas.RegraTarifaResponse])
+def listar_regras(cabana_id: Optional[int] = None, db: Session = Depends(get_db)):
+    query = db.query(models.RegraTarifa)
+    if cabana_id:
+        query = query.filter(models.RegraTarifa.cabana_id == cabana_id)
+    return query.order_by(models.RegraTarifa.data_inicio).all()
+
+@router.post("/", response_model=schemas.RegraTarifaResponse, status_code=status.HTTP_201_CREATED)
+def criar_regra(regra: schemas.RegraTarifaBase, db: Session = Depends(get_db)):
+    _validar_periodo(regra)
+    db_regra = models.RegraTarifa(**regra.model_dump())
+    db.add(db_regra)
+    db.commit()
+    db.refresh(db_regra)
+    tarifario_service.atualizar_periodo(db, db_regra.cabana_id, db_regra.data_inicio, db_regra.data_fim)
+    return db_regra
+
+@router.put("/{id}", response_model=schemas.RegraTarifaResponse)
+def atualizar_regra(id: int, regra: schemas.RegraTarifaBase, db: Session = Depends(get_db)):
+    db_regra = db.query(models.RegraTarifa).filter(models.RegraTarifa.id == id).first()
+    if not db_regra:
+        raise HTTPException(status_code=404, detail="Regra não encontrada")
+    _validar_periodo(regra)
+
+    anterior = (db_regra.cabana_id, db_regra.data_inicio, db_regra.data_fim)
+    for key, value in regra.model_dump().items():
+        setattr(db_regra, key, value)
+    db.commit()
+    db.refresh(db_regra)
+
+    # Recompila o período antigo e o novo
+    tarifario_service.atualizar_periodo(db, *anterior)
+    tarifario_service.atualizar_periodo(db, db_regra.cabana_id, db_regra.data_inicio, db_regra.data_fim)
+    return db_regra
+
+@router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
+def deletar_regra(id: int, db: Session = Depends(get_db)):
+    db_regra = db.query(models.RegraTarifa).filter(models.RegraTarifa.id == id).first()
+    if not db_regra:
+        raise HTTPException(status_code=404, detail="Regra não encontrada")
+
+    anterior = (db_regra.cabana_id, db_regra.data_inicio, db_regra.data_fim)
+    db.delete(db_regra)
+    db.commit()
+    tarifario_service.atualizar_periodo(db, *anterior)
+    return None
@@ -1,8 +1,43 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, field_validator, model_serializer
 from datetime import datetime, date
-from typing import List, Optional
+from typing import Dict, List, Optional
+import json
 
 # --- SCHEMAS DE CABANA ---
+def _lista_de_texto(valor) -> list:
+    """Aceita o formato antigo (texto separado por vírgula ou lista JSON em texto) além de listas."""
+    if valor is None:
+        return []
+    if isinstance(valor, str):
+        texto = valor.strip()
+        if texto.startswith("["):
+            try:
+                return json.loads(texto)
+            except ValueError:
+                pass
+        return [item.strip() for item in texto.split(",") if item.strip()]
+    return valor
+
+class ImagemGaleria(BaseModel):
+    """Foto da galeria com variantes responsivas; variante ausente = usar `full`.
+
+    As fotos enviadas por `POST /api/cabanas/{id}/imagens` trazem também as
+    variantes em AVIF (`avif`, com as mesmas chaves) e o tamanho original.
+    """
+    full: str
+    medium: Optional[str] = None
+    thumbnail: Optional[str] = None
+    avif: Optional[Dict[str, str]] = None
+    largura: Optional[int] = None
+    altura: Optional[int] = None
+
+    @model_serializer
+    def _sem_variantes_vazias(self) -> dict:
+        return {campo: valor for campo, valor in (
+            ("full", self.full), ("medium", self.medium), ("thumbnail", self.thumbnail),
+            ("avif", self.avif), ("largura", self.largura), ("altura", self.altura),
+        ) if valor}
+
 class CabanaBase(BaseModel):
     nome: str
     numero: int
@@ -10,16 +45,47 @@ class CabanaBase(BaseModel):
     capacidade: int = 2
     preco_base_semana: float = 0.0
     preco_base_fds: float = 0.0
+    hospedes_inclusos: int = 2
+    valor_hospede_extra: float = 0.0
     imagem_url: Optional[str] = None
     full_description: Optional[str] = None
-    amenities: Optional[str] = None
-    galeria_urls: Optional[str] = None
+    amenities: List[str] = []
+    galeria_urls: List[ImagemGaleria] = []
+
+    @field_validator("amenities", mode="before")
+    @classmethod
+    def _amenities(cls, valor):
+        return _lista_de_texto(valor)
+
+    @field_validator("galeria_urls", mode="before")
+    @classmethod
+    def _galeria(cls, valor):
+        # Uma URL solta é a foto original, sem variantes
+        return [{"full": item} if isinstance(item, str) else item for item in _lista_de_texto(valor)]
 
 class CabanaResponse(CabanaBase):
     id: int
     airbnb_ical_url: Optional[str] = None
     model_config = ConfigDict(from_attributes=True)
 
+# --- SCHEMAS DE TARIFÁRIO ---
+class RegraTarifaBase(BaseModel):
+    cabana_id: Optional[int] = None
+    nome: str
+    tipo: str = "temporada"
+    data_inicio: date
+    data_fim: date
+    preco_semana: Optional[float] = None
+    preco_fds: Optional[float] = None
+    estadia_minima: Optional[int] = None
+    prioridade: int = 0
+
+class RegraTarifaResponse(RegraTarifaBase):
+    id: int
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    model_config = ConfigDict(from_attributes=True)
+
 # --- SCHEMAS DE CLIENTE ---
 class ClienteBase(BaseModel):
     nome: str
@@ -60,7 +126,7 @@ class AuditLogResponse(BaseModel):
     reserva_id: Optional[int]
     usuario: str
     acao: str
-    detalhes: Optional[str]
+    detalhes: Optional[dict] = None
     created_at: datetime
     model_config = ConfigDict(from_attributes=True)
 
@@ -94,7 +160,7 @@ class ReservaUpdate(BaseModel):
     nota: Optional[int] = None
     feedback: Optional[str] = None
 
-class ReservaResponse(ReservaBase):
+class ReservaResumo(ReservaBase):
     id: int
     cliente_id: int
     created_at: datetime
@@ -103,7 +169,9 @@ class ReservaResponse(ReservaBase):
     checked_out_at: Optional[datetime] = None
     nota: Optional[int] = None
     feedback: Optional[str] = None
-    
+    model_config = ConfigDict(from_attributes=True)
+
+class ReservaResponse(ReservaResumo):
     # Relacionamentos opcionais
     cliente: Optional[ClienteResponse] = None
     cabana: Optional[CabanaResponse] = None
@@ -118,4 +186,5 @@ class ReservaCalendario(BaseModel):
     end: date
     cabana_id: int
     status: str
+    cliente_nome: Optional[str] = None
     model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
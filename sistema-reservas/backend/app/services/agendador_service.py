@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+from typing import Optional
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..database import SessionLocal
+from ..models.models import TravaServico
+from . import calendar_service
+
+logger = logging.getLogger(__name__)
+
+NOME_TRAVA = "agendador_ical"
+# "0" desliga o agendador (ex: workers que só devem atender requisições)
+ATIVO = os.getenv("ICAL_AGENDADOR_ATIVO", "1") == "1"
+# De quanto em quanto tempo o agendador procura feeds vencidos
+TICK_SEGUNDOS = float(os.getenv("ICAL_AGENDADOR_TICK_SEGUNDOS", "30"))
+# Prazo da trava; renovado a cada rodada, expira sozinho se o worker morrer
+DURACAO_TRAVA_SEGUNDOS = max(TICK_SEGUNDOS * 4, 120)
+
+def adquirir_trava(db: Session, nome: str, dono: str, duracao_segundos: float) -> bool:
+    """Pega (ou renova) a trava `nome` se estiver livre, vencida ou já for de `dono`. Faz commit.
+
+    O UPDATE condicional é atômico no banco, então só um processo vence
+    mesmo com vários workers tentando ao mesmo tempo.
+    """
+    agora = datetime.now()
+    expira_em = agora + timedelta(seconds=duracao_segundos)
+    renovada = db.query(TravaServico).filter(
+        TravaServico.nome == nome,
+        or_(TravaServico.dono == dono, TravaServico.expira_em < agora)
+    ).update({"dono": dono, "expira_em": expira_em}, synchronize_session=False)
+    if renovada:
+        db.commit()
+        return True
+    if db.query(TravaServico.nome).filter(TravaServico.nome == nome).first():
+        db.rollback()
+        return False
+    try:
+        db.add(TravaServico(nome=nome, dono=dono, expira_em=expira_em))
+        db.commit()
+        return True
+    except IntegrityError:
+        # Outro worker criou a trava entre a consulta e o insert
+        db.rollback()
+        return False
+
+def liberar_trava(db: Session, nome: str, dono: str):
+    db.query(TravaServico).filter(TravaServico.nome == nome, TravaServico.dono == dono).update(
+        {"expira_em": datetime.now()}, synchronize_session=False
+    )
+    db.commit()
+
+def executar_rodada(db: Session) -> dict:
+    """Sincroniza os feeds vencidos e registra horário e duração da rodada na trava."""
+    inicio = time.monotonic()
+    pendentes = calendar_service.cabanas_pendentes(db)
+    resultados = calendar_service.sincronizar_cabanas(db, pendentes) if pendentes else []
+    duracao_ms = int((time.monotonic() - inicio) * 1000)
+    db.query(TravaServico).filter(TravaServico.nome == NOME_TRAVA).update(
+        {"ultima_execucao_em": datetime.now(), "ultima_duracao_ms": duracao_ms}, synchronize_session=False
+    )
+    db.commit()
+    return {
+        "cabanas": len(resultados),
+        "erros": sum(1 for r in resultados if r["status"] == "erro"),
+        "duracao_ms": duracao_ms,
+    }
+
+class Agendador:
+    """Thread que sincroniza periodicamente os calendários do Airbnb.
+
+    Todos os workers iniciam a thread, mas só o que detém a trava
+    `NOME_TRAVA` no banco executa as rodadas; os outros só tentam assumi-la
+    quando ela vence.
+    """
+
+    def __init__(self):
+        self.dono = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lider = False
+        self.ultima_rodada: Optional[dict] = None
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ativo(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def iniciar(self):
+        if self.ativo:
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._executar, name="agendador-ical", daemon=True)
+        self._thread.start()
+
+    def parar(self, timeout: float = 5.0):
+        self._parar.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        if self.lider:
+            db = SessionLocal()
+            try:
+                liberar_trava(db, NOME_TRAVA, self.dono)
+            finally:
+                db.close()
+            self.lider = False
+
+    def _executar(self):
+        # Atraso inicial aleatório para os workers não disputarem a trava no mesmo instante
+        if self._parar.wait(random.uniform(0, min(TICK_SEGUNDOS, 5))):
+            return
+        while not self._parar.is_set():
+            self._rodada()
+            self._parar.wait(TICK_SEGUNDOS * random.uniform(0.9, 1.1))
+
+    def _rodada(self):
+        db = SessionLocal()
+        try:
+            self.lider = adquirir_trava(db, NOME_TRAVA, self.dono, DURACAO_TRAVA_SEGUNDOS)
+            if self.lider:
+                self.ultima_rodada = {"em": datetime.now(), **executar_rodada(db)}
+        except Exception:
+            logger.exception("Erro na rodada do agendador de calendários")
+        finally:
+            db.close()
+
+agendador = Agendador()
+
+def iniciar():
+    if ATIVO:
+        agendador.iniciar()
+
+def parar():
+    agendador.parar()
@@ -1,36 +1,260 @@
+import codecs
 import csv
 import io
+import logging
+import os
 import re
 from datetime import datetime
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Union
+from sqlalchemy import func, insert, update
 from sqlalchemy.orm import Session
-from ..models.models import Reserva, Cliente, Cabana
-
-def process_airbnb_csv(db: Session, file_binary_content: bytes):
-    # Encodings comuns
-    encodings = ['utf-8-sig', 'iso-8859-1', 'latin-1', 'utf-8']
-    decoded_content = None
-    
-    for enc in encodings:
-        try:
-            decoded_content = file_binary_content.decode(enc)
-            print(f"Sucesso ao decodificar com {enc}")
-            break
-        except:
-            continue
-            
-    if not decoded_content:
-        return {"atualizados": 0, "ignorados": 0, "erros": 1, "log": "Erro de codificação"}
-
-    f = io.StringIO(decoded_content)
+from ..models.models import Reserva, Cliente
+from .calendar_service import codigo_de_confirmacao
+from .eventos_reserva import registrar_alteracao
+from .jobs_service import registrar_progresso, tarefa
+
+logger = logging.getLogger(__name__)
+
+# Bytes lidos do upload por vez
+TAMANHO_PEDACO = 64 * 1024
+# Linhas acumuladas antes de cada gravação em lote
+TAMANHO_LOTE = 500
+# Limite de linhas detalhadas no relatório de erros (o total continua em "erros")
+MAX_ERROS_DETALHADOS = 200
+
+def detectar_encoding(amostra: bytes) -> str:
+    """Encoding do arquivo a partir do primeiro pedaço: UTF-8 (com ou sem BOM) ou Latin-1."""
+    if amostra.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # final=False: um caractere multibyte cortado no fim da amostra não é erro
+        codecs.getincrementaldecoder("utf-8")().decode(amostra, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+def ler_linhas(arquivo: BinaryIO, tamanho_pedaco: int = TAMANHO_PEDACO) -> Iterator[str]:
+    """Linhas de texto do arquivo, decodificadas aos pedaços, sem carregar o arquivo inteiro."""
+    pedaco = arquivo.read(tamanho_pedaco)
+    decoder = codecs.getincrementaldecoder(detectar_encoding(pedaco))(errors="replace")
+    pendente = ""
+    while pedaco:
+        pendente += decoder.decode(pedaco)
+        partes = pendente.split("\n")
+        pendente = partes.pop()
+        for parte in partes:
+            yield parte + "\n"
+        pedaco = arquivo.read(tamanho_pedaco)
+    pendente += decoder.decode(b"", final=True)
+    if pendente:
+        yield pendente
+
+def _cabana_do_anuncio(anuncio: str) -> Optional[int]:
+    # Mapeamento de cabana (mais preciso para os nomes do usuário)
+    anuncio_lower = anuncio.lower()
+    if "sobre a mata" in anuncio_lower: return 2
+    elif "cabana na mata" in anuncio_lower: return 1
+    elif "hobbit" in anuncio_lower: return 3
+    return None
+
+def _valor(ganhos_str: str) -> Optional[float]:
+    # Tratar valor financeiro (R$2.080,74)
+    valor_clean = re.sub(r'[^\d,]', '', ganhos_str).replace(',', '.')
+    try:
+        return float(valor_clean)
+    except ValueError:
+        return None
+
+class _Importacao:
+    """Estado de uma importação: índices carregados uma vez e escritas pendentes do lote."""
+
+    def __init__(self, db: Session):
+        self.db = db
+        # Estadias do Airbnb já no banco (ou criadas nesta importação): pelo código de confirmação e,
+        # para as que vieram do iCal sem ele (sem código ou só com o UID do evento), pela cabana e datas exatas
+        self.por_codigo: Dict[str, dict] = {}
+        self.sem_codigo: Dict[tuple, dict] = {}
+        for id_reserva, cabana_id, checkin, checkout, cliente_id, valor, pago, codigo in db.query(
+            Reserva.id, Reserva.cabana_id, Reserva.data_checkin, Reserva.data_checkout,
+            Reserva.cliente_id, Reserva.valor_total, Reserva.pago_total, Reserva.codigo_externo
+        ).filter(Reserva.origem == "airbnb").order_by(Reserva.id):
+            self._indexar({
+                "id": id_reserva, "cabana_id": cabana_id, "data_checkin": checkin, "data_checkout": checkout,
+                "cliente_id": cliente_id, "valor_total": valor, "pago_total": pago, "codigo_externo": codigo
+            })
+
+        self.clientes: Dict[str, dict] = {
+            nome: {"id": id_cliente, "telefone": telefone}
+            for id_cliente, nome, telefone in db.query(Cliente.id, Cliente.nome, Cliente.telefone)
+        }
+        self.novos_clientes: List[tuple] = []
+        self.telefones: Dict[int, str] = {}
+        self.inserir: List[dict] = []
+        self.atualizar: Dict[int, dict] = {}
+
+    def _indexar(self, estadia: dict):
+        if estadia["codigo_externo"]:
+            self.por_codigo.setdefault(estadia["codigo_externo"], estadia)
+        if not codigo_de_confirmacao(estadia["codigo_externo"]):
+            self.sem_codigo.setdefault((estadia["cabana_id"], estadia["data_checkin"], estadia["data_checkout"]), estadia)
+
+    def buscar_estadia(self, codigo: Optional[str], cabana_id, checkin, checkout) -> Optional[dict]:
+        if codigo and codigo in self.por_codigo:
+            return self.por_codigo[codigo]
+        return self.sem_codigo.get((cabana_id, checkin, checkout)) if cabana_id else None
+
+    def cliente(self, nome: str, telefone: str, codigo: Optional[str]) -> dict:
+        cliente = self.clientes.get(nome)
+        if cliente is None:
+            objeto = Cliente(nome=nome, telefone=telefone if telefone else "Airbnb", email=f"airbnb_{codigo}@guest.com")
+            cliente = {"id": None, "telefone": objeto.telefone, "objeto": objeto}
+            self.clientes[nome] = cliente
+            self.novos_clientes.append((cliente, objeto))
+        elif telefone and (not cliente["telefone"] or cliente["telefone"] == "Airbnb"):
+            cliente["telefone"] = telefone
+            if cliente["id"] is None:
+                cliente["objeto"].telefone = telefone
+            else:
+                self.telefones[cliente["id"]] = telefone
+        return cliente
+
+    def atualizar_estadia(self, estadia: dict, cliente: dict, cabana_id, codigo, valor) -> bool:
+        """Aplica a linha à estadia; retorna False (e não grava nada) se nada mudou."""
+        campos = {}
+        if cliente["id"] is None or cliente["id"] != estadia["cliente_id"]:
+            campos["cliente"] = cliente
+        if cabana_id and cabana_id != estadia["cabana_id"]:
+            campos["cabana_id"] = cabana_id
+        if valor is not None and (valor != estadia["valor_total"] or not estadia["pago_total"]):
+            campos["valor_total"], campos["pago_total"] = valor, True
+        if codigo and codigo != estadia["codigo_externo"] and not codigo_de_confirmacao(estadia["codigo_externo"]):
+            # Estadia vinda do iCal recebendo o código (no lugar do UID): passa a ser encontrada por ele
+            campos["codigo_externo"] = codigo
+            campos["observacoes"] = f"Sincronizado via reservations.csv ({codigo})"
+            self.sem_codigo.pop((estadia["cabana_id"], estadia["data_checkin"], estadia["data_checkout"]), None)
+            self.por_codigo[codigo] = estadia
+        if not campos:
+            return False
+
+        if estadia["id"] is None:
+            # Criada por uma linha anterior do mesmo arquivo, ainda no lote
+            estadia["linha"].update(campos)
+        else:
+            self.atualizar.setdefault(estadia["id"], {"estadia": dict(estadia)}).update(campos)
+        estadia.update({k: v for k, v in campos.items() if k != "cliente"})
+        if "cliente" in campos:
+            estadia["cliente_id"] = cliente["id"]
+        return True
+
+    def criar_estadia(self, cliente: dict, cabana_id, checkin, checkout, codigo, valor):
+        linha = {
+            "cliente": cliente, "cabana_id": cabana_id,
+            "data_checkin": checkin, "data_checkout": checkout,
+            "status": "confirmada", "origem": "airbnb", "codigo_externo": codigo,
+            "observacoes": f"Criada via reservations.csv ({codigo})"
+        }
+        if valor is not None:
+            linha["valor_total"], linha["pago_total"] = valor, True
+        estadia = {
+            "id": None, "cabana_id": cabana_id, "data_checkin": checkin, "data_checkout": checkout,
+            "cliente_id": cliente["id"], "valor_total": linha.get("valor_total"),
+            "pago_total": linha.get("pago_total", False), "codigo_externo": codigo, "linha": linha
+        }
+        self.inserir.append(estadia)
+        self._indexar(estadia)
+
+    def gravar_lote(self):
+        """Grava as escritas pendentes: clientes novos, telefones, inserts e updates em lote.
+
+        Os inserts vão num único executemany (sem RETURNING, que no SQLite vira
+        um INSERT por linha); os ids gerados são lidos de volta numa consulta.
+        """
+        db = self.db
+        if self.novos_clientes:
+            db.execute(insert(Cliente), [
+                {"nome": objeto.nome, "telefone": objeto.telefone, "email": objeto.email}
+                for _, objeto in self.novos_clientes
+            ])
+            novos = {cliente_objeto.nome: cliente for cliente, cliente_objeto in self.novos_clientes}
+            # O mais recente de cada nome é o recém-inserido
+            for id_cliente, nome in db.query(Cliente.id, Cliente.nome).filter(
+                Cliente.nome.in_(list(novos))
+            ).order_by(Cliente.id):
+                novos[nome]["id"] = id_cliente
+            for cliente in novos.values():
+                del cliente["objeto"]
+            self.novos_clientes = []
+        if self.telefones:
+            db.execute(update(Cliente), [{"id": id_cliente, "telefone": tel} for id_cliente, tel in self.telefones.items()])
+            self.telefones = {}
+
+        if self.inserir:
+            ultimo_id = db.query(func.max(Reserva.id)).scalar() or 0
+            linhas = []
+            for estadia in self.inserir:
+                linha = dict(estadia.pop("linha"))
+                linha["cliente_id"] = estadia["cliente_id"] = linha.pop("cliente")["id"]
+                linhas.append(linha)
+                registrar_alteracao(db, linha["cabana_id"], linha["data_checkin"], linha["data_checkout"])
+            db.execute(insert(Reserva), linhas)
+            pendentes = {
+                (e["codigo_externo"], e["cabana_id"], e["data_checkin"], e["data_checkout"]): e for e in self.inserir
+            }
+            for id_reserva, codigo, cabana_id, checkin, checkout in db.query(
+                Reserva.id, Reserva.codigo_externo, Reserva.cabana_id, Reserva.data_checkin, Reserva.data_checkout
+            ).filter(Reserva.id > ultimo_id, Reserva.origem == "airbnb"):
+                estadia = pendentes.get((codigo, cabana_id, checkin, checkout))
+                if estadia is not None and estadia["id"] is None:
+                    estadia["id"] = id_reserva
+            self.inserir = []
+
+        if self.atualizar:
+            linhas = []
+            for id_reserva, campos in self.atualizar.items():
+                anterior = campos.pop("estadia")
+                if "cliente" in campos:
+                    campos["cliente_id"] = campos.pop("cliente")["id"]
+                linhas.append({"id": id_reserva, **campos})
+                # A cabana pode mudar: avisa a antiga e a nova
+                registrar_alteracao(db, anterior["cabana_id"], anterior["data_checkin"], anterior["data_checkout"])
+                if campos.get("cabana_id"):
+                    registrar_alteracao(db, campos["cabana_id"], anterior["data_checkin"], anterior["data_checkout"])
+            db.execute(update(Reserva), linhas)
+            self.atualizar = {}
+
+    @property
+    def pendentes(self) -> int:
+        return len(self.inserir) + len(self.atualizar)
+
+def process_airbnb_csv(db: Session, arquivo: Union[BinaryIO, bytes], ao_gravar_lote: Optional[Callable[[dict], None]] = None):
+    """Importa o reservations.csv do Airbnb lendo o arquivo aos pedaços.
+
+    Retorna as contagens e, para as linhas com problema, o número da linha e
+    o motivo (até MAX_ERROS_DETALHADOS). `ao_gravar_lote(stats)` é chamado
+    após cada lote gravado, ainda na transação da importação.
+    """
+    if isinstance(arquivo, (bytes, bytearray)):
+        arquivo = io.BytesIO(arquivo)
+
+    importacao = _Importacao(db)
     # reservations.csv geralmente usa vírgula
-    reader = csv.DictReader(f, delimiter=',')
-    stats = {"atualizados": 0, "ignorados": 0, "erros": 0}
-    
+    reader = csv.DictReader(ler_linhas(arquivo), delimiter=',')
+    stats = {"linhas": 0, "atualizados": 0, "criados": 0, "inalterados": 0, "ignorados": 0, "erros": 0,
+             "erros_linhas": []}
+
+    def erro(linha: int, motivo: str, codigo: Optional[str] = None):
+        stats["erros"] += 1
+        if len(stats["erros_linhas"]) < MAX_ERROS_DETALHADOS:
+            stats["erros_linhas"].append({"linha": linha, "codigo": codigo, "erro": motivo})
+
     for row in reader:
+        stats["linhas"] += 1
+        numero_linha = reader.line_num
+        codigo = None
         try:
             # Normalizar nomes de colunas
             row = {k.strip().replace('"', ''): v for k, v in row.items() if k}
-            
+
             # Colunas do arquivo reservations.csv
             status_airbnb = row.get('Status')
             if status_airbnb and status_airbnb.lower() not in ['confirmada', 'concluída', 'confirmado']:
@@ -39,85 +263,67 @@ def process_airbnb_csv(db: Session, file_binary_content: bytes):
             nome_hospede = row.get('Nome do hóspede')
             checkin_str = row.get('Data de início')
             checkout_str = row.get('Data de término')
-            anuncio = row.get('Anúncio', '')
-            codigo = row.get('Código de confirmação')
-            telefone = row.get('Entrar em contato', '')
-            ganhos_str = row.get('Ganhos', '')
+            anuncio = row.get('Anúncio') or ''
+            codigo = row.get('Código de confirmação') or None
+            telefone = row.get('Entrar em contato') or ''
+            ganhos_str = row.get('Ganhos') or ''
 
             if not checkin_str or not nome_hospede:
+                erro(numero_linha, "Linha sem nome do hóspede ou data de início", codigo)
                 continue
 
             # Converter datas (DD/MM/AAAA)
             try:
                 checkin = datetime.strptime(checkin_str, '%d/%m/%Y').date()
-                checkout = datetime.strptime(checkout_str, '%d/%m/%Y').date()
-            except Exception as e:
-                print(f"Erro de data: {checkin_str} -> {e}")
+                checkout = datetime.strptime(checkout_str or '', '%d/%m/%Y').date()
+            except ValueError:
+                erro(numero_linha, f"Data inválida: {checkin_str} - {checkout_str}", codigo)
                 continue
 
-            # Mapeamento de cabana (mais preciso para os nomes do usuário)
-            cabana_id = None
-            anuncio_lower = anuncio.lower()
-            if "sobre a mata" in anuncio_lower: cabana_id = 2
-            elif "cabana na mata" in anuncio_lower: cabana_id = 1
-            elif "hobbit" in anuncio_lower: cabana_id = 3
-
-            # Busca flexível por reserva iCal existente
-            reserva = db.query(Reserva).filter(
-                Reserva.origem == "airbnb",
-                ((Reserva.data_checkin == checkin) | (Reserva.data_checkout == checkout))
-            ).first()
-
-            # Criar/Buscar Cliente
-            cliente = db.query(Cliente).filter(Cliente.nome == nome_hospede).first()
-            if not cliente:
-                cliente = Cliente(
-                    nome=nome_hospede, 
-                    telefone=telefone if telefone else "Airbnb", 
-                    email=f"airbnb_{codigo}@guest.com"
-                )
-                db.add(cliente)
-                db.flush()
-            elif telefone and (not cliente.telefone or cliente.telefone == "Airbnb"):
-                cliente.telefone = telefone
-
-            if reserva:
-                reserva.cliente_id = cliente.id
-                reserva.observacoes = f"Sincronizado via reservations.csv ({codigo})"
-                if cabana_id: reserva.cabana_id = cabana_id
-                
-                # Tratar valor financeiro (R$2.080,74)
-                if ganhos_str:
-                    valor_clean = re.sub(r'[^\d,]', '', ganhos_str).replace(',', '.')
-                    try:
-                        reserva.valor_total = float(valor_clean)
-                        reserva.pago_total = True
-                    except: pass
-                
-                stats["atualizados"] += 1
+            cabana_id = _cabana_do_anuncio(anuncio)
+            valor = _valor(ganhos_str) if ganhos_str else None
+            estadia = importacao.buscar_estadia(codigo, cabana_id, checkin, checkout)
+
+            if estadia:
+                cliente = importacao.cliente(nome_hospede, telefone, codigo)
+                if importacao.atualizar_estadia(estadia, cliente, cabana_id, codigo, valor):
+                    stats["atualizados"] += 1
+                else:
+                    stats["inalterados"] += 1
             elif cabana_id:
                 # Criar nova se não existir via iCal
-                nova = Reserva(
-                    cliente_id=cliente.id, cabana_id=cabana_id,
-                    data_checkin=checkin, data_checkout=checkout,
-                    status="confirmada", origem="airbnb",
-                    observacoes=f"Criada via reservations.csv ({codigo})"
-                )
-                if ganhos_str:
-                    valor_clean = re.sub(r'[^\d,]', '', ganhos_str).replace(',', '.')
-                    try:
-                        nova.valor_total = float(valor_clean)
-                        nova.pago_total = True
-                    except: pass
-                    
-                db.add(nova)
+                cliente = importacao.cliente(nome_hospede, telefone, codigo)
+                importacao.criar_estadia(cliente, cabana_id, checkin, checkout, codigo, valor)
                 stats["atualizados"] += 1
+                stats["criados"] += 1
             else:
                 stats["ignorados"] += 1
-                
         except Exception as e:
-            print(f"Erro processando linha: {e}")
-            stats["erros"] += 1
-            
+            logger.exception("Erro processando a linha %s do reservations.csv", numero_linha)
+            erro(numero_linha, str(e), codigo)
+
+        if importacao.pendentes >= TAMANHO_LOTE:
+            importacao.gravar_lote()
+            if ao_gravar_lote:
+                ao_gravar_lote(stats)
+
+    importacao.gravar_lote()
     db.commit()
-    return stats
\ No newline at end of file
+    return stats
+
+@tarefa("importar_csv_airbnb")
+def importar_arquivo(db: Session, job, parametros: dict) -> dict:
+    """Job da importação de um reservations.csv salvo em disco pelo upload.
+
+    Cada lote é confirmado junto com o progresso (fração do arquivo lida).
+    Se o worker cair no meio, o job recomeça do início: a importação casa as
+    linhas pelo código de confirmação, então os lotes já gravados não se repetem.
+    O arquivo é apagado pela fila quando o job termina (`jobs_service._finalizar`).
+    """
+    caminho = parametros["arquivo"]
+    tamanho = os.path.getsize(caminho) or 1
+    with open(caminho, "rb") as arquivo:
+        stats = process_airbnb_csv(
+            db, arquivo, ao_gravar_lote=lambda _: registrar_progresso(db, job, arquivo.tell() / tamanho)
+        )
+    return stats
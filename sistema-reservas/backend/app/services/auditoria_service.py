@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+import os
+from sqlalchemy import delete, insert, select, text
+from sqlalchemy.orm import Session
+from ..models.models import AuditLog, AuditLogArquivo
+from .jobs_service import registrar_progresso, tarefa
+
+# Entradas mais antigas que isso saem de `audit_logs` para `audit_logs_arquivo`
+RETENCAO_DIAS = int(os.getenv("AUDITORIA_RETENCAO_DIAS", "365"))
+# Entradas movidas por transação
+TAMANHO_LOTE = 1000
+
+_COLUNAS = ("id", "reserva_id", "usuario", "acao", "detalhes", "created_at")
+
+def _criar_particoes(db: Session, ids: List[int]):
+    """No Postgres, cria as partições mensais de `audit_logs_arquivo` que o lote vai ocupar."""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    meses = set()
+    for criado_em, in db.query(AuditLog.created_at).filter(AuditLog.id.in_(ids)):
+        criado_em = criado_em.astimezone(timezone.utc)
+        meses.add((criado_em.year, criado_em.month))
+    for ano, mes in sorted(meses):
+        proximo = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS audit_logs_arquivo_{ano}_{mes:02d} PARTITION OF audit_logs_arquivo "
+            f"FOR VALUES FROM ('{ano}-{mes:02d}-01 00:00:00+00') TO ('{proximo[0]}-{proximo[1]:02d}-01 00:00:00+00')"
+        ))
+
+def arquivar(db: Session, antes_de: Optional[datetime] = None, progresso=None) -> int:
+    """Move as entradas anteriores a `antes_de` (padrão: a retenção) para o arquivo, em lotes. Retorna quantas.
+
+    Cada lote copia e apaga na mesma transação, então uma interrupção no meio
+    não perde nem duplica entradas; basta rodar de novo.
+    """
+    antes_de = antes_de or datetime.now() - timedelta(days=RETENCAO_DIAS)
+    total = db.query(AuditLog.id).filter(AuditLog.created_at < antes_de).count()
+    movidas = 0
+    while True:
+        ids = [id_log for id_log, in db.query(AuditLog.id).filter(
+            AuditLog.created_at < antes_de
+        ).order_by(AuditLog.id).limit(TAMANHO_LOTE)]
+        if not ids:
+            break
+        _criar_particoes(db, ids)
+        colunas = [getattr(AuditLog, c) for c in _COLUNAS]
+        db.execute(insert(AuditLogArquivo).from_select(_COLUNAS, select(*colunas).where(AuditLog.id.in_(ids))))
+        db.execute(delete(AuditLog).where(AuditLog.id.in_(ids)))
+        db.commit()
+        movidas += len(ids)
+        if progresso:
+            progresso(movidas / max(total, movidas))
+    return movidas
+
+def listar(db: Session, reserva_id: Optional[int] = None, limite: int = 50,
+           cursor: Optional[int] = None) -> Tuple[List, Optional[int]]:
+    """Página de entradas, da mais recente para a mais antiga, juntando as ativas e as arquivadas.
+
+    As duas tabelas são consultadas com o mesmo filtro (servido pelos índices
+    de `reserva_id, created_at`) e o resultado é intercalado. Os ids só crescem
+    (no SQLite, `AUTOINCREMENT`: um id que foi para o arquivo não volta a ser
+    usado), então o cursor é o id da última entrada da página.
+    Retorna (entradas, cursor da próxima página ou None).
+    """
+    entradas = []
+    for modelo in (AuditLog, AuditLogArquivo):
+        query = db.query(modelo)
+        if reserva_id is not None:
+            query = query.filter(modelo.reserva_id == reserva_id)
+        if cursor is not None:
+            query = query.filter(modelo.id < cursor)
+        entradas += query.order_by(modelo.created_at.desc(), modelo.id.desc()).limit(limite + 1).all()
+
+    entradas.sort(key=lambda e: e.id, reverse=True)
+    if len(entradas) > limite:
+        return entradas[:limite], entradas[limite - 1].id
+    return entradas, None
+
+@tarefa("arquivar_auditoria")
+def arquivar_em_segundo_plano(db: Session, job, parametros: dict) -> dict:
+    antes_de = datetime.fromisoformat(parametros["antes_de"]) if parametros.get("antes_de") else None
+    return {"arquivadas": arquivar(db, antes_de, progresso=lambda fracao: registrar_progresso(db, job, fracao))}
+
+if __name__ == "__main__":
+    from ..database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(f"Entradas de auditoria arquivadas: {arquivar(db)}")
+    finally:
+        db.close()
@@ -0,0 +1,160 @@
+"""Cache de respostas prontas (bytes) das rotas de catálogo, com TTL, LRU e invalidação explícita.
+
+As entradas ficam agrupadas por namespace (ex: "cabanas"). Invalidar um
+namespace incrementa a versão dele: as chaves antigas deixam de ser lidas e
+somem pelo TTL/LRU. Uma resposta montada antes de uma invalidação concorrente
+é gravada com a versão que foi lida no início, então nunca aparece como atual.
+
+O backend padrão é local ao processo. Com `CACHE_URL=redis://...` (Redis ou
+compatível, requer o pacote `redis`), todos os workers compartilham o cache e
+as invalidações; o LRU fica a cargo do servidor (`maxmemory-policy allkeys-lru`).
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Protocol, Tuple
+import asyncio
+import hashlib
+import os
+import threading
+import time
+
+# Vazio = cache local a cada processo
+CACHE_URL = os.getenv("CACHE_URL", "")
+TTL_SEGUNDOS = int(os.getenv("CACHE_TTL_SEGUNDOS", "300"))
+MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "256"))
+# Prefixo das chaves no backend compartilhado
+PREFIXO = "cabanas:cache:"
+
+class Backend(Protocol):
+    def obter(self, chave: str) -> Optional[bytes]: ...
+    def gravar(self, chave: str, valor: bytes, ttl: int): ...
+    def versao(self, namespace: str) -> int: ...
+    def incrementar_versao(self, namespace: str): ...
+    def limpar(self): ...
+
+class BackendLocal:
+    """Dicionário em memória com TTL por entrada e descarte da menos usada acima de `max_entradas`."""
+
+    def __init__(self, max_entradas: int = MAX_ENTRADAS):
+        self.max_entradas = max_entradas
+        self._entradas: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._versoes: Dict[str, int] = {}
+        self._trava = threading.Lock()
+
+    def obter(self, chave: str) -> Optional[bytes]:
+        with self._trava:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                return None
+            expira_em, valor = entrada
+            if expira_em <= time.monotonic():
+                del self._entradas[chave]
+                return None
+            self._entradas.move_to_end(chave)
+            return valor
+
+    def gravar(self, chave: str, valor: bytes, ttl: int):
+        with self._trava:
+            self._entradas[chave] = (time.monotonic() + ttl, valor)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+
+    def versao(self, namespace: str) -> int:
+        return self._versoes.get(namespace, 0)
+
+    def incrementar_versao(self, namespace: str):
+        with self._trava:
+            self._versoes[namespace] = self._versoes.get(namespace, 0) + 1
+            # As entradas do namespace não serão mais lidas; libera o espaço já
+            prefixo = f"{namespace}:"
+            for chave in [c for c in self._entradas if c.startswith(prefixo)]:
+                del self._entradas[chave]
+
+    def limpar(self):
+        with self._trava:
+            self._entradas.clear()
+            self._versoes.clear()
+
+class BackendRedis:
+    """Backend compartilhado entre workers, sobre um servidor Redis (ou compatível)."""
+
+    # Cada chamada vai à rede: as rotas assíncronas a fazem fora do event loop
+    bloqueante = True
+
+    def __init__(self, url: str):
+        import redis
+
+        self._cliente = redis.Redis.from_url(url)
+
+    def obter(self, chave: str) -> Optional[bytes]:
+        return self._cliente.get(PREFIXO + chave)
+
+    def gravar(self, chave: str, valor: bytes, ttl: int):
+        self._cliente.set(PREFIXO + chave, valor, ex=ttl)
+
+    def versao(self, namespace: str) -> int:
+        return int(self._cliente.get(f"{PREFIXO}versao:{namespace}") or 0)
+
+    def incrementar_versao(self, namespace: str):
+        self._cliente.incr(f"{PREFIXO}versao:{namespace}")
+
+    def limpar(self):
+        for chave in self._cliente.scan_iter(f"{PREFIXO}*"):
+            self._cliente.delete(chave)
+
+def criar_backend(url: str = CACHE_URL) -> Backend:
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return BackendRedis(url)
+    return BackendLocal()
+
+backend: Backend = criar_backend()
+
+@dataclass
+class RespostaEmCache:
+    corpo: bytes
+    etag: str
+
+def _chave(namespace: str) -> str:
+    return f"{namespace}:{backend.versao(namespace)}"
+
+def _empacotar(corpo: bytes) -> Tuple[bytes, RespostaEmCache]:
+    # O ETag é guardado junto do corpo, para não recalcular o hash a cada acerto
+    etag = f'"{hashlib.sha256(corpo).hexdigest()[:32]}"'
+    return etag.encode() + b"\n" + corpo, RespostaEmCache(corpo, etag)
+
+def _desempacotar(valor: bytes) -> RespostaEmCache:
+    etag, corpo = valor.split(b"\n", 1)
+    return RespostaEmCache(corpo, etag.decode())
+
+def resposta(namespace: str, chave: str, gerar: Callable[[], bytes], ttl: int = TTL_SEGUNDOS) -> RespostaEmCache:
+    """Corpo em cache para (namespace, chave), gerado com `gerar()` na falta, e o ETag dele."""
+    chave_completa = f"{_chave(namespace)}:{chave}"
+    valor = backend.obter(chave_completa)
+    if valor is not None:
+        return _desempacotar(valor)
+    valor, em_cache = _empacotar(gerar())
+    backend.gravar(chave_completa, valor, ttl)
+    return em_cache
+
+async def resposta_async(namespace: str, chave: str, gerar: Callable[[], Awaitable[bytes]],
+                         ttl: int = TTL_SEGUNDOS) -> RespostaEmCache:
+    """Como `resposta`, com `gerar` assíncrono (rotas com AsyncSession)."""
+    async def chamar(funcao, *args):
+        if getattr(backend, "bloqueante", False):
+            return await asyncio.to_thread(funcao, *args)
+        return funcao(*args)
+
+    chave_completa = f"{await chamar(_chave, namespace)}:{chave}"
+    valor = await chamar(backend.obter, chave_completa)
+    if valor is not None:
+        return _desempacotar(valor)
+    valor, em_cache = _empacotar(await gerar())
+    await chamar(backend.gravar, chave_completa, valor, ttl)
+    return em_cache
+
+def invalidar(namespace: str):
+    backend.incrementar_versao(namespace)
+
+def limpar_cache():
+    backend.limpar()
@@ -1,104 +1,490 @@
 from icalendar import Calendar, Event
-from datetime import datetime, date
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime, date, timedelta, timezone
+from itertools import chain
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import hashlib
+import logging
+import os
+import random
+import re
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import insert, or_, update
 from sqlalchemy.orm import Session
-from ..models.models import Reserva, Cabana, Cliente
+from ..models.models import Reserva, Cabana, Cliente, FeedIcal
+from .disponibilidade_service import executar_com_trava
+from .eventos_reserva import ao_alterar_reservas, registrar_alteracao
+from .jobs_service import registrar_progresso, tarefa
 import uuid
 
-def generate_cabana_ical(db: Session, cabana_id: int):
+logger = logging.getLogger(__name__)
+
+# Downloads simultâneos na sincronização de todas as cabanas (e tamanho do pool de conexões)
+SYNC_WORKERS = int(os.getenv("ICAL_SYNC_WORKERS", "8"))
+SYNC_TIMEOUT_SEGUNDOS = float(os.getenv("ICAL_SYNC_TIMEOUT_SEGUNDOS", "10"))
+# Dias de estadias já encerradas mantidos no .ics exportado; vazio = todas
+EXPORT_DIAS_PASSADOS = int(os.environ["ICAL_EXPORT_DIAS_PASSADOS"]) if os.getenv("ICAL_EXPORT_DIAS_PASSADOS") else None
+# Limite de idade do .ics em cache; cobre escritas feitas por outros workers
+EXPORT_TTL_SEGUNDOS = float(os.getenv("ICAL_EXPORT_TTL_SEGUNDOS", "60"))
+# Intervalo entre sincronizações automáticas de um feed (sobrescrito por FeedIcal.intervalo_segundos)
+SYNC_INTERVALO_SEGUNDOS = int(os.getenv("ICAL_SYNC_INTERVALO_SEGUNDOS", "900"))
+# Variação aleatória do intervalo, para os feeds não baterem no Airbnb todos ao mesmo tempo
+SYNC_JITTER = 0.1
+# Depois de uma falha, nova tentativa em 1 min, dobrando a cada falha seguida até o limite
+ESPERA_FALHA_SEGUNDOS = 60
+ESPERA_FALHA_MAXIMA_SEGUNDOS = int(os.getenv("ICAL_SYNC_BACKOFF_MAXIMO_SEGUNDOS", "21600"))
+
+def generate_cabana_ical(db: Session, cabana_id: int, dias_passados: Optional[int] = None):
+    """Serializa o .ics da cabana numa única consulta (reservas + nome do hóspede).
+
+    Com `dias_passados`, estadias encerradas há mais que isso ficam de fora.
+    """
     cabana = db.query(Cabana).filter(Cabana.id == cabana_id).first()
     if not cabana:
         return None
 
-    reservas = db.query(Reserva).filter(
+    query = db.query(
+        Reserva.id, Reserva.status, Reserva.data_checkin, Reserva.data_checkout, Cliente.nome
+    ).outerjoin(Cliente, Reserva.cliente_id == Cliente.id).filter(
         Reserva.cabana_id == cabana_id,
         Reserva.status != "cancelada"
-    ).all()
+    )
+    if dias_passados is not None:
+        query = query.filter(Reserva.data_checkout >= date.today() - timedelta(days=dias_passados))
 
     cal = Calendar()
     cal.add('prodid', '-//Gestao de Cabanas//Sincronizacao Airbnb//BR')
     cal.add('version', '2.0')
     cal.add('x-wr-calname', f'Calendário {cabana.nome}')
 
-    for res in reservas:
+    for reserva_id, status, checkin, checkout, cliente_nome in query.order_by(Reserva.data_checkin, Reserva.id):
         event = Event()
-        event.add('summary', f'Reserva {res.id} - {res.status}')
-        event.add('dtstart', res.data_checkin)
-        event.add('dtend', res.data_checkout)
-        event.add('uid', f'reserva-{res.id}@gestaocabanas.com')
-        event.add('description', f'Hóspede: {res.cliente.nome if res.cliente else "N/A"}')
+        event.add('summary', f'Reserva {reserva_id} - {status}')
+        event.add('dtstart', checkin)
+        event.add('dtend', checkout)
+        event.add('uid', f'reserva-{reserva_id}@gestaocabanas.com')
+        event.add('description', f'Hóspede: {cliente_nome or "N/A"}')
         cal.add_component(event)
 
     return cal.to_ical()
 
+@dataclass
+class IcalExportado:
+    conteudo: bytes
+    etag: str
+    modificado_em: datetime # UTC, sem fração de segundo (precisão do Last-Modified)
+    dia: date # O corte de estadias passadas muda a cada dia
+    criado_em: float
+
+_exportados: Dict[int, IcalExportado] = {}
+# Incrementada a cada invalidação; evita guardar um .ics gerado antes de um commit concorrente
+_geracoes_exportados: Dict[int, int] = {}
+_trava_exportados = threading.Lock()
+
+@ao_alterar_reservas
+def invalidar_ical(cabana_ids):
+    with _trava_exportados:
+        for cabana_id in cabana_ids:
+            _exportados.pop(cabana_id, None)
+            _geracoes_exportados[cabana_id] = _geracoes_exportados.get(cabana_id, 0) + 1
+
+def limpar_cache_ical():
+    with _trava_exportados:
+        _exportados.clear()
+        _geracoes_exportados.clear()
+
+def ical_da_cabana(db: Session, cabana_id: int) -> Optional[IcalExportado]:
+    """.ics da cabana em cache, regenerado só quando as reservas dela mudam (ou após o TTL)."""
+    hoje = date.today()
+    anterior = _exportados.get(cabana_id)
+    if anterior and anterior.dia == hoje and time.monotonic() - anterior.criado_em < EXPORT_TTL_SEGUNDOS:
+        return anterior
+
+    geracao = _geracoes_exportados.get(cabana_id, 0)
+    conteudo = generate_cabana_ical(db, cabana_id, EXPORT_DIAS_PASSADOS)
+    if conteudo is None:
+        return None
+    etag = f'"{hashlib.sha256(conteudo).hexdigest()[:32]}"'
+    # Conteúdo igual ao anterior (ex: só expirou o TTL): mantém a data para não invalidar os clientes
+    modificado_em = anterior.modificado_em if anterior and anterior.etag == etag else \
+        datetime.now(timezone.utc).replace(microsecond=0)
+    exportado = IcalExportado(conteudo, etag, modificado_em, hoje, time.monotonic())
+    with _trava_exportados:
+        if _geracoes_exportados.get(cabana_id, 0) == geracao:
+            _exportados[cabana_id] = exportado
+    return exportado
+
+_http: Optional[requests.Session] = None
+_trava_http = threading.Lock()
+
+def _sessao_http() -> requests.Session:
+    """Cliente HTTP compartilhado, com conexões keep-alive reaproveitadas entre as buscas."""
+    global _http
+    with _trava_http:
+        if _http is None:
+            _http = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=SYNC_WORKERS, pool_maxsize=SYNC_WORKERS)
+            _http.mount("http://", adaptador)
+            _http.mount("https://", adaptador)
+        return _http
+
+@dataclass
+class Download:
+    status_code: int
+    conteudo: bytes = b""
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    erro: Optional[str] = None
+    duracao_ms: Optional[int] = None
+
+def baixar_feed(url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> Download:
+    """GET condicional do feed; só rede, sem banco, para rodar em paralelo."""
+    cabecalhos = {}
+    if etag:
+        cabecalhos["If-None-Match"] = etag
+    if last_modified:
+        cabecalhos["If-Modified-Since"] = last_modified
+    inicio = time.monotonic()
+    duracao = lambda: int((time.monotonic() - inicio) * 1000)
+    try:
+        response = _sessao_http().get(url, headers=cabecalhos, timeout=SYNC_TIMEOUT_SEGUNDOS)
+    except requests.RequestException as e:
+        return Download(status_code=0, erro=str(e), duracao_ms=duracao())
+    if response.status_code == 304:
+        return Download(status_code=304, etag=etag, last_modified=last_modified, duracao_ms=duracao())
+    if response.status_code != 200:
+        return Download(status_code=response.status_code, erro=f"HTTP {response.status_code}", duracao_ms=duracao())
+    return Download(
+        status_code=200,
+        conteudo=response.content,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+        duracao_ms=duracao()
+    )
+
+def _cliente_airbnb(db: Session) -> Cliente:
+    airbnb_cliente = db.query(Cliente).filter(Cliente.nome == "Airbnb Import").first()
+    if not airbnb_cliente:
+        airbnb_cliente = Cliente(nome="Airbnb Import", telefone="0", email="airbnb@import.com")
+        db.add(airbnb_cliente)
+        db.flush()
+    return airbnb_cliente
+
+Estadia = Tuple[date, date] # (data_checkin, data_checkout)
+
+# O Airbnb põe o link da reserva na DESCRIPTION: ".../hosting/reservations/details/HMABC123"
+_CODIGO_NA_DESCRICAO = re.compile(r"/details/([A-Z0-9]+)")
+_CODIGO_DE_CONFIRMACAO = re.compile(r"[A-Z0-9]+")
+
+def codigo_de_confirmacao(codigo: Optional[str]) -> bool:
+    """Se o `codigo_externo` é um código de confirmação do Airbnb, e não o UID de um evento do iCal."""
+    return bool(codigo) and _CODIGO_DE_CONFIRMACAO.fullmatch(codigo) is not None
+
+@dataclass
+class EventoFeed:
+    codigo: Optional[str] # Código de confirmação (o mesmo do reservations.csv) ou, na falta dele, o UID
+    data_checkin: date
+    data_checkout: date
+    resumo: str
+
+def ler_estadias(conteudo: bytes) -> Dict[object, EventoFeed]:
+    """Estadias do feed, chaveadas pelo código externo (ou pelo par de datas, sem código)."""
+    gcal = Calendar.from_ical(conteudo)
+    estadias: Dict[object, EventoFeed] = {}
+    for component in gcal.walk("VEVENT"):
+        summary = str(component.get('summary', 'Reserva Airbnb'))
+        # Ignorar bloqueios do Airbnb que não são reservas (ex: "Airbnb (Not available)")
+        if "not available" in summary.lower():
+            continue
+
+        start = component.get('dtstart').dt
+        end = component.get('dtend').dt
+
+        if isinstance(start, datetime):
+            start = start.date()
+        if isinstance(end, datetime):
+            end = end.date()
+
+        codigo = _CODIGO_NA_DESCRICAO.search(str(component.get('description', '')))
+        codigo = codigo.group(1) if codigo else (str(component.get('uid')) if component.get('uid') else None)
+        estadias.setdefault(codigo or (start, end), EventoFeed(codigo, start, end, summary))
+    return estadias
+
+def _periodos(estadias: Iterable[Estadia]) -> List[dict]:
+    return [{"data_checkin": checkin, "data_checkout": checkout} for checkin, checkout in sorted(estadias)]
+
+def _casar_pelas_datas(candidatas: Optional[List[tuple]], codigo: Optional[str]):
+    """Tira de `candidatas` (mesmas datas) a primeira reserva que pode ser a estadia de código `codigo`.
+
+    Dois códigos de confirmação diferentes são estadias diferentes, mesmo nas mesmas datas.
+    """
+    for i, reserva in enumerate(candidatas or []):
+        if not (codigo_de_confirmacao(codigo) and codigo_de_confirmacao(reserva.codigo_externo)):
+            return candidatas.pop(i)
+    return None
+
+def aplicar_diferenca(db: Session, cabana_id: int, feed: Dict[object, EventoFeed], hoje: Optional[date] = None) -> dict:
+    """Sincroniza as reservas do Airbnb da cabana com as estadias do feed. Não faz commit.
+
+    Compara pelo código externo com as reservas já importadas (carregadas numa
+    única consulta). As demais casam pelo par de datas: as ainda sem código
+    recebem o do feed, e as que já têm o código de confirmação (vindo do
+    reservations.csv) continuam casando com o evento que só traz o UID. As novas entram num insert em lote, as remarcadas têm
+    as datas atualizadas e as que sumiram do feed são canceladas num único
+    UPDATE, mas só as que ainda não começaram, já que o Airbnb tira do feed as
+    estadias antigas. Estadias que já existem, inclusive canceladas à mão, não
+    são recriadas; as que não mudaram não são regravadas.
+    """
+    hoje = hoje or date.today()
+    por_codigo: Dict[str, tuple] = {}
+    sem_codigo: Dict[Estadia, List[tuple]] = {}
+    codigos_no_feed = {evento.codigo for evento in feed.values() if evento.codigo}
+    for reserva in db.query(
+        Reserva.id, Reserva.data_checkin, Reserva.data_checkout, Reserva.status, Reserva.codigo_externo
+    ).filter(Reserva.cabana_id == cabana_id, Reserva.origem == "airbnb"):
+        if reserva.codigo_externo in codigos_no_feed:
+            por_codigo[reserva.codigo_externo] = reserva
+        else:
+            # Sem código, ou com um que o feed não traz (ex: o do CSV, para um evento só com UID)
+            sem_codigo.setdefault((reserva.data_checkin, reserva.data_checkout), []).append(reserva)
+
+    adicionadas: List[EventoFeed] = []
+    inalteradas: List[Estadia] = []
+    alteradas: List[tuple] = [] # (reserva, evento)
+    vinculos: List[dict] = []
+    vistas = set()
+    for evento in feed.values():
+        periodo = (evento.data_checkin, evento.data_checkout)
+        reserva = por_codigo.get(evento.codigo) if evento.codigo else None
+        if reserva is not None:
+            vistas.add(reserva.id)
+            if (reserva.data_checkin, reserva.data_checkout) == periodo:
+                inalteradas.append(periodo)
+            else:
+                alteradas.append((reserva, evento))
+        elif (reserva := _casar_pelas_datas(sem_codigo.get(periodo), evento.codigo)) is not None:
+            vistas.add(reserva.id)
+            inalteradas.append(periodo)
+            if evento.codigo and not codigo_de_confirmacao(reserva.codigo_externo):
+                vinculos.append({"id": reserva.id, "codigo_externo": evento.codigo})
+        else:
+            adicionadas.append(evento)
+
+    removidas = [
+        reserva for reserva in chain(por_codigo.values(), *sem_codigo.values())
+        if reserva.id not in vistas and reserva.status != "cancelada" and reserva.data_checkin >= hoje
+    ]
+
+    if adicionadas:
+        airbnb_cliente = _cliente_airbnb(db)
+        db.execute(insert(Reserva), [
+            {
+                "cliente_id": airbnb_cliente.id,
+                "cabana_id": cabana_id,
+                "data_checkin": evento.data_checkin,
+                "data_checkout": evento.data_checkout,
+                "status": "confirmada",
+                "origem": "airbnb",
+                "codigo_externo": evento.codigo,
+                "valor_total": 0.0,
+                "observacoes": f"Importado: {evento.resumo}"
+            }
+            for evento in adicionadas
+        ])
+    if alteradas or vinculos:
+        db.execute(update(Reserva), vinculos + [
+            {"id": reserva.id, "data_checkin": evento.data_checkin, "data_checkout": evento.data_checkout}
+            for reserva, evento in alteradas
+        ])
+    if removidas:
+        db.query(Reserva).filter(Reserva.id.in_([r.id for r in removidas])).update(
+            {"status": "cancelada"}, synchronize_session=False
+        )
+
+    # Escritas em lote não passam pelo flush do ORM: avisa caches e resumos
+    periodos_tocados = chain(
+        ((e.data_checkin, e.data_checkout) for e in adicionadas),
+        ((r.data_checkin, r.data_checkout) for r in removidas),
+        ((r.data_checkin, r.data_checkout) for r, _ in alteradas),
+        ((e.data_checkin, e.data_checkout) for _, e in alteradas),
+    )
+    for checkin, checkout in periodos_tocados:
+        registrar_alteracao(db, cabana_id, checkin, checkout)
+
+    return {
+        "adicionadas": _periodos((e.data_checkin, e.data_checkout) for e in adicionadas),
+        "removidas": _periodos((r.data_checkin, r.data_checkout) for r in removidas),
+        "alteradas": _periodos((e.data_checkin, e.data_checkout) for _, e in alteradas),
+        "inalteradas": _periodos(inalteradas),
+    }
+
+def _estado_do_feed(db: Session, cabana: Cabana, feed: Optional[FeedIcal] = None) -> FeedIcal:
+    if feed is None:
+        feed = db.query(FeedIcal).filter(FeedIcal.cabana_id == cabana.id).first()
+    if feed is None:
+        feed = FeedIcal(cabana_id=cabana.id, url=cabana.airbnb_ical_url)
+        db.add(feed)
+    elif feed.url != cabana.airbnb_ical_url:
+        # URL nova: o ETag e o hash da antiga não valem mais
+        feed.url, feed.etag, feed.last_modified, feed.hash_conteudo = cabana.airbnb_ical_url, None, None, None
+    return feed
+
+def _registrar_resultado(feed: FeedIcal, status: str, erro: Optional[str], duracao_ms: Optional[int]):
+    """Grava o resultado da tentativa e agenda a próxima, com jitter e espera exponencial nas falhas."""
+    agora = datetime.now()
+    feed.sincronizado_em, feed.status, feed.erro, feed.duracao_ms = agora, status, erro, duracao_ms
+    if status == "erro":
+        feed.falhas_consecutivas = (feed.falhas_consecutivas or 0) + 1
+        espera = min(ESPERA_FALHA_MAXIMA_SEGUNDOS, ESPERA_FALHA_SEGUNDOS * 2 ** (feed.falhas_consecutivas - 1))
+    else:
+        feed.falhas_consecutivas = 0
+        espera = feed.intervalo_segundos or SYNC_INTERVALO_SEGUNDOS
+    espera *= random.uniform(1 - SYNC_JITTER, 1 + SYNC_JITTER)
+    feed.proxima_sincronizacao = agora + timedelta(seconds=espera)
+
+def _aplicar_download(db: Session, cabana: Cabana, feed: FeedIcal, download: Download) -> dict:
+    """Importa o resultado de um download e grava o estado do feed (com commit)."""
+    resultado = {"cabana_id": cabana.id, "novas_reservas": 0, "removidas": 0, "erro": None,
+                 "duracao_ms": download.duracao_ms}
+
+    if download.erro:
+        resultado["status"] = "erro"
+        resultado["erro"] = download.erro
+    elif download.status_code == 304:
+        resultado["status"] = "nao_modificado"
+    else:
+        hash_conteudo = hashlib.sha256(download.conteudo).hexdigest()
+        if hash_conteudo == feed.hash_conteudo:
+            # Servidor sem suporte a GET condicional, mas o conteúdo é o mesmo: não precisa reprocessar
+            resultado["status"] = "sem_alteracao"
+        else:
+            def importar():
+                # Diferença e estado do feed na mesma transação, com a cabana travada
+                relatorio = aplicar_diferenca(db, cabana.id, ler_estadias(download.conteudo))
+                # Numa nova tentativa, um estado recém-criado já saiu da sessão com o rollback
+                estado = feed if feed in db else _estado_do_feed(db, cabana)
+                _registrar_resultado(estado, "atualizado", None, download.duracao_ms)
+                estado.alterado_em = estado.sincronizado_em
+                estado.hash_conteudo = hash_conteudo
+                estado.etag, estado.last_modified = download.etag, download.last_modified
+                return relatorio
+
+            try:
+                relatorio = executar_com_trava(db, cabana.id, importar)
+                resultado.update(
+                    status="atualizado",
+                    novas_reservas=len(relatorio["adicionadas"]),
+                    removidas=len(relatorio["removidas"]),
+                    relatorio=relatorio
+                )
+                return resultado
+            except Exception as e:
+                logger.exception("Erro ao importar o calendário da cabana %s", cabana.id)
+                feed = feed if feed in db else _estado_do_feed(db, cabana)
+                resultado["status"] = "erro"
+                resultado["erro"] = str(e)
+        if resultado["status"] != "erro":
+            feed.etag, feed.last_modified = download.etag, download.last_modified
+
+    _registrar_resultado(feed, resultado["status"], resultado["erro"], download.duracao_ms)
+    db.commit()
+    return resultado
+
+def sincronizar_cabanas(db: Session, cabana_ids: Optional[Iterable[int]] = None,
+                       ao_concluir_cabana: Optional[Callable[[int, int], None]] = None) -> List[dict]:
+    """Sincroniza os calendários externos das cabanas (todas com URL, por padrão).
+
+    Os downloads rodam em paralelo num pool de threads; a importação e a
+    gravação no banco ficam na sessão `db`, uma cabana por vez, na ordem em
+    que os downloads terminam. `ao_concluir_cabana(feitas, total)` é chamado
+    após cada uma.
+    """
+    query = db.query(Cabana).filter(Cabana.airbnb_ical_url.isnot(None), Cabana.airbnb_ical_url != "")
+    if cabana_ids is not None:
+        query = query.filter(Cabana.id.in_(list(cabana_ids)))
+    cabanas = query.order_by(Cabana.id).all()
+    if not cabanas:
+        return []
+
+    feeds: Dict[int, FeedIcal] = {f.cabana_id: f for f in db.query(FeedIcal).filter(
+        FeedIcal.cabana_id.in_([c.id for c in cabanas])
+    )}
+    pedidos = []
+    for cabana in cabanas:
+        feed = feeds.get(cabana.id)
+        mesmo_feed = feed is not None and feed.url == cabana.airbnb_ical_url
+        pedidos.append((
+            cabana.id, cabana.airbnb_ical_url,
+            feed.etag if mesmo_feed else None,
+            feed.last_modified if mesmo_feed else None
+        ))
+
+    resultados: Dict[int, dict] = {}
+    with ThreadPoolExecutor(max_workers=min(SYNC_WORKERS, len(pedidos))) as executor:
+        futuros = {executor.submit(baixar_feed, url, etag, modificado): cabana_id
+                   for cabana_id, url, etag, modificado in pedidos}
+        for futuro in as_completed(futuros):
+            cabana_id = futuros[futuro]
+            cabana = db.get(Cabana, cabana_id)
+            feed = _estado_do_feed(db, cabana, feeds.get(cabana_id))
+            resultados[cabana_id] = _aplicar_download(db, cabana, feed, futuro.result())
+            if ao_concluir_cabana:
+                ao_concluir_cabana(len(resultados), len(pedidos))
+    return [resultados[c.id] for c in cabanas]
+
+def cabanas_pendentes(db: Session, agora: Optional[datetime] = None) -> List[int]:
+    """Cabanas com URL do Airbnb cujo feed nunca foi sincronizado ou já passou da hora."""
+    agora = agora or datetime.now()
+    linhas = db.query(Cabana.id).outerjoin(FeedIcal, FeedIcal.cabana_id == Cabana.id).filter(
+        Cabana.airbnb_ical_url.isnot(None),
+        Cabana.airbnb_ical_url != "",
+        or_(
+            FeedIcal.id.is_(None),
+            FeedIcal.proxima_sincronizacao.is_(None),
+            FeedIcal.proxima_sincronizacao <= agora,
+            FeedIcal.url != Cabana.airbnb_ical_url
+        )
+    ).order_by(Cabana.id)
+    return [cabana_id for cabana_id, in linhas]
+
 def sync_airbnb_calendar(db: Session, cabana_id: int):
+    """Sincroniza uma cabana; retorna (sucesso, resultado da sincronização)."""
     cabana = db.query(Cabana).filter(Cabana.id == cabana_id).first()
     if not cabana:
-        print(f"Erro: Cabana {cabana_id} não encontrada")
-        return False, 0
+        logger.warning("Cabana %s não encontrada", cabana_id)
+        return False, None
     if not cabana.airbnb_ical_url:
-        print(f"Erro: Cabana {cabana_id} não possui URL iCal configurada")
-        return False, 0
+        logger.warning("Cabana %s não possui URL iCal configurada", cabana_id)
+        return False, None
 
-    try:
-        print(f"Buscando calendário em: {cabana.airbnb_ical_url}")
-        response = requests.get(cabana.airbnb_ical_url, timeout=10)
-        if response.status_code != 200:
-            print(f"Erro HTTP {response.status_code} ao buscar calendário")
-            return False, 0
-        
-        print("Calendário recebido, processando iCal...")
-        gcal = Calendar.from_ical(response.content)
-        
-        airbnb_cliente = db.query(Cliente).filter(Cliente.nome == "Airbnb Import").first()
-        if not airbnb_cliente:
-            airbnb_cliente = Cliente(nome="Airbnb Import", telefone="0", email="airbnb@import.com")
-            db.add(airbnb_cliente)
-            db.commit()
-            db.refresh(airbnb_cliente)
-
-        count = 0
-        for component in gcal.walk():
-            if component.name == "VEVENT":
-                summary = component.get('summary', 'Reserva Airbnb')
-                # Ignorar bloqueios do Airbnb que não são reservas (ex: "Airbnb (Not available)")
-                if "not available" in summary.lower():
-                    continue
-
-                start = component.get('dtstart').dt
-                end = component.get('dtend').dt
-                
-                if isinstance(start, datetime):
-                    start = start.date()
-                if isinstance(end, datetime):
-                    end = end.date()
-
-                exists = db.query(Reserva).filter(
-                    Reserva.cabana_id == cabana_id,
-                    Reserva.data_checkin == start,
-                    Reserva.data_checkout == end,
-                    Reserva.origem == "airbnb"
-                ).first()
-
-                if not exists:
-                    nova_reserva = Reserva(
-                        cliente_id=airbnb_cliente.id,
-                        cabana_id=cabana_id,
-                        data_checkin=start,
-                        data_checkout=end,
-                        status="confirmada",
-                        origem="airbnb",
-                        valor_total=0.0,
-                        observacoes=f"Importado: {summary}"
-                    )
-                    db.add(nova_reserva)
-                    count += 1
-        
-        db.commit()
-        print(f"Sincronização concluída: {count} novas reservas.")
-        return True, count
-    except Exception as e:
-        import traceback
-        print(f"Erro fatal na sincronização: {e}")
-        print(traceback.format_exc())
-        return False, 0
+    resultado = sincronizar_cabanas(db, [cabana_id])[0]
+    if resultado["status"] == "erro":
+        logger.error("Erro ao sincronizar a cabana %s: %s", cabana_id, resultado["erro"])
+        return False, resultado
+    return True, resultado
+
+@tarefa("sincronizar_calendarios")
+def sincronizar_em_segundo_plano(db: Session, job, parametros: dict) -> dict:
+    """Job de `POST /calendar/sync` (todas as cabanas) e `POST /calendar/sync/{id}` (`cabana_id`)."""
+    cabana_id = parametros.get("cabana_id")
+    progresso = lambda feitas, total: registrar_progresso(db, job, feitas / total)
+    if cabana_id is None:
+        resultados = sincronizar_cabanas(db, ao_concluir_cabana=progresso)
+        return {
+            "novas_reservas": sum(r["novas_reservas"] for r in resultados),
+            "erros": sum(1 for r in resultados if r["status"] == "erro"),
+            "cabanas": resultados
+        }
+
+    success, resultado = sync_airbnb_calendar(db, cabana_id)
+    if not success:
+        raise RuntimeError((resultado or {}).get("erro") or "Erro ao sincronizar com Airbnb")
+    return {
+        "novas_reservas": resultado["novas_reservas"],
+        "removidas": resultado["removidas"],
+        "relatorio": resultado.get("relatorio")
+    }
@@ -0,0 +1,21 @@
+from typing import List
+import os
+from pydantic import TypeAdapter
+from ..schemas import schemas
+from . import cache_service
+
+# Namespace das listagens de cabanas no cache de respostas
+NAMESPACE = "cabanas"
+# Quanto tempo o navegador/CDN pode servir a lista pública sem revalidar
+MAX_AGE_PUBLICO_SEGUNDOS = int(os.getenv("CATALOGO_MAX_AGE_SEGUNDOS", "60"))
+CACHE_CONTROL_PUBLICO = f"public, max-age={MAX_AGE_PUBLICO_SEGUNDOS}, stale-while-revalidate={MAX_AGE_PUBLICO_SEGUNDOS * 5}"
+
+_lista_de_cabanas = TypeAdapter(List[schemas.CabanaResponse])
+
+def serializar(cabanas) -> bytes:
+    """JSON da lista de cabanas, no formato de `CabanaResponse`, pronto para o cache."""
+    return _lista_de_cabanas.dump_json(_lista_de_cabanas.validate_python(cabanas, from_attributes=True))
+
+def invalidar():
+    """Descarta as listagens em cache; chamar depois do commit de qualquer escrita em `cabanas`."""
+    cache_service.invalidar(NAMESPACE)
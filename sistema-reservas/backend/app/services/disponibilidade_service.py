@@ -0,0 +1,146 @@
+from datetime import date
+from typing import Callable, Optional, TypeVar
+import asyncio
+import random
+import time
+from sqlalchemy import and_, func, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from ..models.models import Reserva, Cabana
+
+T = TypeVar("T")
+
+MAX_TENTATIVAS = 5
+ESPERA_BASE_SEGUNDOS = 0.05
+# Primeira chave das advisory locks do Postgres, separa as travas de cabana de outros usos
+NAMESPACE_TRAVA_CABANA = 4201
+
+class ContencaoReserva(Exception):
+    """A cabana continuou travada por outras escritas após todas as tentativas."""
+
+def filtro_periodo(inicio: date, fim: date):
+    """Condição de sobreposição com o período [inicio, fim).
+
+    A comparação em `data_checkout` vem primeiro para casar com o índice
+    `ix_reservas_cabana_periodo` (cabana_id, data_checkout, data_checkin):
+    o banco salta direto para as estadias que terminam depois de `inicio`
+    e ignora todo o histórico anterior.
+    """
+    return and_(
+        Reserva.data_checkout > inicio,
+        Reserva.data_checkin < fim
+    )
+
+def buscar_conflito(
+    db: Session,
+    cabana_id: int,
+    data_checkin: date,
+    data_checkout: date,
+    ignorar_reserva_id: Optional[int] = None
+) -> Optional[Reserva]:
+    """Retorna a primeira reserva ativa que ocupa a cabana no período, se houver."""
+    query = db.query(Reserva).filter(
+        Reserva.cabana_id == cabana_id,
+        filtro_periodo(data_checkin, data_checkout),
+        Reserva.status != "cancelada"
+    )
+    if ignorar_reserva_id is not None:
+        query = query.filter(Reserva.id != ignorar_reserva_id)
+    return query.order_by(Reserva.data_checkout).first()
+
+def cabana_disponivel(db: Session, cabana_id: int, data_checkin: date, data_checkout: date) -> bool:
+    return buscar_conflito(db, cabana_id, data_checkin, data_checkout) is None
+
+def travar_cabana(db: Session, cabana_id: int):
+    """Serializa as escritas de reserva da cabana até o fim da transação atual."""
+    dialeto = db.get_bind().dialect.name
+    if dialeto == "sqlite":
+        # O SQLite só trava o banco inteiro; BEGIN IMMEDIATE pega a trava de escrita
+        # já na abertura da transação. Se o driver já abriu uma transação, houve
+        # escrita antes e a trava de escrita já está conosco.
+        conexao = db.connection().connection.driver_connection
+        if not conexao.in_transaction:
+            db.execute(text("BEGIN IMMEDIATE"))
+    elif dialeto == "postgresql":
+        db.execute(
+            text("SELECT pg_advisory_xact_lock(:namespace, :cabana_id)"),
+            {"namespace": NAMESPACE_TRAVA_CABANA, "cabana_id": cabana_id}
+        )
+    else:
+        db.query(Cabana.id).filter(Cabana.id == cabana_id).with_for_update().first()
+
+def _erro_de_contencao(erro: DBAPIError) -> bool:
+    codigo = getattr(erro.orig, "pgcode", None) or getattr(erro.orig, "sqlstate", None)
+    # 40001: serialization_failure, 40P01: deadlock_detected, 55P03: lock_not_available,
+    # 57014: query_canceled (o statement_timeout venceu esperando a trava)
+    return codigo in ("40001", "40P01", "55P03", "57014") or "database is locked" in str(erro.orig)
+
+def _tentar_com_trava(db: Session, cabana_id: int, operacao: Callable[[], T]) -> T:
+    try:
+        travar_cabana(db, cabana_id)
+        resultado = operacao()
+        db.commit()
+        return resultado
+    except Exception:
+        db.rollback()
+        raise
+
+def _espera_apos_contencao(erro: DBAPIError, cabana_id: int, tentativa: int, tentativas: int) -> float:
+    """Segundos até a próxima tentativa (espera exponencial com jitter), ou relança o erro."""
+    if not _erro_de_contencao(erro):
+        raise erro
+    if tentativa == tentativas:
+        raise ContencaoReserva(f"Cabana {cabana_id} ocupada por outras escritas") from erro
+    espera = ESPERA_BASE_SEGUNDOS * 2 ** (tentativa - 1)
+    return espera + random.uniform(0, espera)
+
+def executar_com_trava(
+    db: Session,
+    cabana_id: int,
+    operacao: Callable[[], T],
+    tentativas: int = MAX_TENTATIVAS
+) -> T:
+    """Executa `operacao` com a cabana travada e faz o commit.
+
+    A checagem de conflito deve ficar dentro de `operacao`, assim ela e a
+    escrita são atômicas mesmo com vários workers no mesmo banco. Em caso de
+    contenção a transação é desfeita e refeita com espera exponencial.
+    """
+    for tentativa in range(1, tentativas + 1):
+        try:
+            return _tentar_com_trava(db, cabana_id, operacao)
+        except DBAPIError as erro:
+            time.sleep(_espera_apos_contencao(erro, cabana_id, tentativa, tentativas))
+
+async def executar_com_trava_async(
+    db: AsyncSession,
+    cabana_id: int,
+    operacao: Callable[[Session], T],
+    tentativas: int = MAX_TENTATIVAS
+) -> T:
+    """Como `executar_com_trava`, para rotas assíncronas; `operacao` recebe a sessão síncrona.
+
+    Cada tentativa roda num `run_sync`, e a espera entre elas é um
+    `asyncio.sleep`, que não segura o event loop durante a contenção.
+    """
+    for tentativa in range(1, tentativas + 1):
+        try:
+            return await db.run_sync(lambda sessao: _tentar_com_trava(sessao, cabana_id, lambda: operacao(sessao)))
+        except DBAPIError as erro:
+            await asyncio.sleep(_espera_apos_contencao(erro, cabana_id, tentativa, tentativas))
+
+def disponibilidade_por_cabana(db: Session, inicio: date, fim: date):
+    """Uma linha (cabana_id, nome, conflitos) por cabana, numa única consulta agrupada."""
+    return db.query(
+        Cabana.id,
+        Cabana.nome,
+        func.count(Reserva.id).label("conflitos")
+    ).outerjoin(
+        Reserva,
+        and_(
+            Reserva.cabana_id == Cabana.id,
+            filtro_periodo(inicio, fim),
+            Reserva.status != "cancelada"
+        )
+    ).group_by(Cabana.id, Cabana.nome).order_by(Cabana.id).all()
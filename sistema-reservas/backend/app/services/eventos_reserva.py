@@ -0,0 +1,136 @@
+from datetime import date
+from itertools import chain
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from ..models.models import Reserva
+
+# (cabana_id, data_checkin, data_checkout) de cada estado de reserva tocado na transação;
+# datas vazias significam "qualquer período da cabana"
+Alteracao = Tuple[int, Optional[date], Optional[date]]
+
+# Chave em `Session.info` com as alterações da transação corrente
+_CHAVE_ALTERACOES = "reservas_alteradas"
+# E com os eventos (criada, atualizada, cancelada, removida, periodo) na ordem em que ocorreram
+_CHAVE_EVENTOS = "reservas_eventos"
+
+_ouvintes_commit: List[Callable[[Set[int]], None]] = []
+_ouvintes_transacao: List[Callable[[Session, Set[Alteracao]], None]] = []
+_ouvintes_eventos: List[Callable[[List[Dict]], None]] = []
+
+def ao_alterar_reservas(ouvinte: Callable[[Set[int]], None]):
+    """Registra `ouvinte(cabana_ids)`, chamado após cada commit que mexeu em reservas."""
+    _ouvintes_commit.append(ouvinte)
+    return ouvinte
+
+def antes_do_commit(ouvinte: Callable[[Session, Set[Alteracao]], None]):
+    """Registra `ouvinte(db, alteracoes)`, chamado dentro da transação, antes do commit.
+
+    Serve para manter dados derivados (ex: resumos) na mesma transação da reserva.
+    """
+    _ouvintes_transacao.append(ouvinte)
+    return ouvinte
+
+def ao_confirmar_eventos(ouvinte: Callable[[List[Dict]], None]):
+    """Registra `ouvinte(eventos)`, chamado após cada commit com um evento por reserva tocada.
+
+    Cada evento traz `tipo`, `cabana_id`, `reserva_id`, `data_checkin`,
+    `data_checkout` e `status`, e `anterior` com as datas e o status de antes
+    quando uma reserva atualizada os mudou. Escritas
+    em lote chegam como `tipo="periodo"`, só com a cabana e o período.
+    """
+    _ouvintes_eventos.append(ouvinte)
+    return ouvinte
+
+def notificar_alteracao_externa(cabana_ids: Set[int]):
+    """Avisa os ouvintes de `ao_alterar_reservas` de um commit feito por outro processo."""
+    for ouvinte in _ouvintes_commit:
+        ouvinte(cabana_ids)
+
+def _marcar(db: Session, cabana_id: int, data_checkin: Optional[date], data_checkout: Optional[date]):
+    if cabana_id is not None:
+        db.info.setdefault(_CHAVE_ALTERACOES, set()).add((cabana_id, data_checkin, data_checkout))
+
+def _evento(db: Session, tipo: str, cabana_id: int, data_checkin: Optional[date], data_checkout: Optional[date],
+            reserva_id: Optional[int] = None, status: Optional[str] = None, anterior: Optional[Dict] = None):
+    evento = {"tipo": tipo, "cabana_id": cabana_id, "reserva_id": reserva_id,
+              "data_checkin": data_checkin, "data_checkout": data_checkout, "status": status}
+    if anterior:
+        evento["anterior"] = anterior
+    db.info.setdefault(_CHAVE_EVENTOS, []).append(evento)
+
+def registrar_alteracao(db: Session, cabana_id: int, data_checkin: Optional[date] = None,
+                        data_checkout: Optional[date] = None):
+    """Marca a cabana (e o período) como alterada em escritas que não passam pelo flush do ORM (bulk)."""
+    if cabana_id is not None:
+        _marcar(db, cabana_id, data_checkin, data_checkout)
+        _evento(db, "periodo", cabana_id, data_checkin, data_checkout)
+
+def _anterior(estado, atributo: str):
+    historico = estado.attrs[atributo].history
+    return historico.deleted[0] if historico.deleted else getattr(estado.obj(), atributo)
+
+@event.listens_for(Session, "after_flush")
+def _coletar_alteracoes(session, flush_context):
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, Reserva):
+            continue
+        _marcar(session, obj.cabana_id, obj.data_checkin, obj.data_checkout)
+        # Estado anterior: a reserva pode ter mudado de cabana ou de datas
+        estado = inspect(obj)
+        cabana_anterior = _anterior(estado, "cabana_id")
+        checkin_anterior = _anterior(estado, "data_checkin")
+        checkout_anterior = _anterior(estado, "data_checkout")
+        _marcar(session, cabana_anterior, checkin_anterior, checkout_anterior)
+        _coletar_evento(session, obj, estado, cabana_anterior, checkin_anterior, checkout_anterior)
+
+def _coletar_evento(session, obj, estado, cabana_anterior, checkin_anterior, checkout_anterior):
+    if obj in session.new:
+        tipo = "criada"
+    elif obj in session.deleted:
+        tipo = "removida"
+    elif obj.status == "cancelada" and _anterior(estado, "status") != "cancelada":
+        tipo = "cancelada"
+    else:
+        tipo = "atualizada"
+    anterior = {}
+    if tipo == "atualizada":
+        if (checkin_anterior, checkout_anterior) != (obj.data_checkin, obj.data_checkout):
+            anterior.update(data_checkin=checkin_anterior, data_checkout=checkout_anterior)
+        if _anterior(estado, "status") != obj.status:
+            anterior["status"] = _anterior(estado, "status")
+    if cabana_anterior is not None and cabana_anterior != obj.cabana_id:
+        # Mudou de cabana: para a antiga, a reserva saiu
+        _evento(session, "removida", cabana_anterior, checkin_anterior, checkout_anterior, obj.id, obj.status)
+        anterior = {}
+    _evento(session, tipo, obj.cabana_id, obj.data_checkin, obj.data_checkout, obj.id, obj.status, anterior)
+
+@event.listens_for(Session, "before_commit")
+def _atualizar_derivados(session):
+    if not _ouvintes_transacao:
+        return
+    # Registra as alterações pendentes e deixa as reservas visíveis às consultas dos ouvintes
+    session.flush()
+    if not session.info.get(_CHAVE_ALTERACOES):
+        return
+    alteracoes = set(session.info[_CHAVE_ALTERACOES])
+    for ouvinte in _ouvintes_transacao:
+        ouvinte(session, alteracoes)
+
+@event.listens_for(Session, "after_commit")
+def _notificar(session):
+    alteracoes = session.info.pop(_CHAVE_ALTERACOES, None)
+    eventos = session.info.pop(_CHAVE_EVENTOS, None)
+    if not alteracoes:
+        return
+    cabanas = {cabana_id for cabana_id, _, _ in alteracoes}
+    for ouvinte in _ouvintes_commit:
+        ouvinte(cabanas)
+    if eventos:
+        for ouvinte in _ouvintes_eventos:
+            ouvinte(eventos)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _descartar(session, previous_transaction):
+    session.info.pop(_CHAVE_ALTERACOES, None)
+    session.info.pop(_CHAVE_EVENTOS, None)
@@ -0,0 +1,122 @@
+import csv
+import io
+import zlib
+from datetime import date
+from typing import Iterator, Optional
+from sqlalchemy.orm import Session
+from ..models.models import Reserva, Cliente, Cabana
+
+# Linhas buscadas do cursor (e escritas na resposta) por vez
+TAMANHO_LOTE = 1000
+
+CABECALHO = ["ID", "Cliente", "Telefone", "Cabana", "Check-in", "Check-out", "Valor", "Status", "Origem"]
+
+def _consulta(db: Session, inicio: Optional[date], fim: Optional[date], status: Optional[str], origem: Optional[str]):
+    query = db.query(
+        Reserva.id,
+        Cliente.nome,
+        Cliente.telefone,
+        Cabana.nome,
+        Reserva.data_checkin,
+        Reserva.data_checkout,
+        Reserva.valor_total,
+        Reserva.status,
+        Reserva.origem
+    ).outerjoin(Cliente, Reserva.cliente_id == Cliente.id).outerjoin(Cabana, Reserva.cabana_id == Cabana.id)
+
+    if inicio:
+        query = query.filter(Reserva.data_checkin >= inicio)
+    if fim:
+        query = query.filter(Reserva.data_checkin <= fim)
+    if status:
+        query = query.filter(Reserva.status == status)
+    if origem:
+        query = query.filter(Reserva.origem == origem)
+    return query.order_by(Reserva.id).execution_options(yield_per=TAMANHO_LOTE)
+
+def lotes(db: Session, inicio=None, fim=None, status=None, origem=None) -> Iterator[list]:
+    """Lotes de até TAMANHO_LOTE linhas lidas do cursor do servidor.
+
+    Usa uma sessão própria no mesmo banco de `db`: o gerador é consumido pela
+    StreamingResponse depois que a sessão da requisição já pode ter sido fechada.
+    """
+    sessao = Session(bind=db.get_bind())
+    try:
+        lote = []
+        for r in _consulta(sessao, inicio, fim, status, origem):
+            lote.append([
+                r[0], r[1] or "N/A", r[2] or "N/A", r[3] or "N/A",
+                r[4], r[5], r[6], r[7], r[8]
+            ])
+            if len(lote) == TAMANHO_LOTE:
+                yield lote
+                lote = []
+        if lote:
+            yield lote
+    finally:
+        sessao.close()
+
+def gerar_csv(db: Session, **filtros) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CABECALHO)
+    yield buffer.getvalue()
+    for lote in lotes(db, **filtros):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(lote)
+        yield buffer.getvalue()
+
+def gerar_csv_gzip(db: Session, **filtros) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=31) # 31 = cabeçalho e rodapé gzip
+    for pedaco in gerar_csv(db, **filtros):
+        dados = compressor.compress(pedaco.encode("utf-8"))
+        if dados:
+            yield dados
+    yield compressor.flush()
+
+def pyarrow_disponivel() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+class _Coletor(io.RawIOBase):
+    """Arquivo de escrita que só acumula bytes até serem drenados pela resposta."""
+
+    def __init__(self):
+        self.partes = []
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        return len(dados)
+
+    def drenar(self) -> bytes:
+        dados = b"".join(self.partes)
+        self.partes = []
+        return dados
+
+def gerar_parquet(db: Session, **filtros) -> Iterator[bytes]:
+    """Parquet com um row group por lote; requer o pacote opcional `pyarrow`."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()), ("cliente", pa.string()), ("telefone", pa.string()), ("cabana", pa.string()),
+        ("data_checkin", pa.date32()), ("data_checkout", pa.date32()), ("valor_total", pa.float64()),
+        ("status", pa.string()), ("origem", pa.string()),
+    ])
+    coletor = _Coletor()
+    with pq.ParquetWriter(coletor, schema) as writer:
+        for lote in lotes(db, **filtros):
+            colunas = list(zip(*lote))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(valores, type=campo.type) for valores, campo in zip(colunas, schema)],
+                schema=schema
+            ))
+            yield coletor.drenar()
+    yield coletor.drenar()
@@ -0,0 +1,207 @@
+"""Eventos de reserva em tempo real para o painel e o site (Server-Sent Events).
+
+Os eventos saem de `eventos_reserva` depois de cada commit (rotas de
+reservas, reserva pública, sincronização do Airbnb e importação de CSV) e são
+entregues às conexões abertas em `GET /api/reservas/eventos` e
+`GET /api/public/eventos`.
+
+O backend padrão entrega só às conexões do próprio processo. Com
+`EVENTOS_URL=redis://...` (Redis ou compatível, requer o pacote `redis`), cada
+processo publica num canal comum e entrega o que recebe dele: as conexões de
+todos os workers veem os eventos de todos, e os caches em memória (ocupação,
+.ics) de um worker são descartados quando outro grava uma reserva.
+"""
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import AsyncIterator, Callable, Dict, List, Optional, Protocol, Set
+import asyncio
+import json
+import logging
+import os
+import threading
+import uuid
+
+from . import eventos_reserva
+
+logger = logging.getLogger(__name__)
+
+# Vazio = eventos entregues só dentro de cada processo
+EVENTOS_URL = os.getenv("EVENTOS_URL", "")
+CANAL = "cabanas:eventos"
+# Comentário enviado a cada tanto para manter a conexão aberta em proxies
+HEARTBEAT_SEGUNDOS = float(os.getenv("EVENTOS_HEARTBEAT_SEGUNDOS", "15"))
+# Eventos pendentes por conexão; uma conexão que não acompanha recebe "ressincronizar"
+MAX_PENDENTES = 100
+# Espera do EventSource antes de reconectar, em ms
+RETRY_MS = 1000
+# Sem cache nem buffer em proxies (nginx), para cada evento sair na hora
+CABECALHOS_SSE = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# Identifica os eventos publicados por este processo no canal compartilhado
+_ORIGEM = uuid.uuid4().hex
+
+class Backend(Protocol):
+    def publicar(self, mensagem: Dict): ...
+    def iniciar(self, entregar: Callable[[Dict], None]): ...
+    def parar(self): ...
+
+class BackendLocal:
+    """Entrega direta às conexões do próprio processo."""
+
+    def __init__(self):
+        self._entregar: Optional[Callable[[Dict], None]] = None
+
+    def publicar(self, mensagem: Dict):
+        if self._entregar:
+            self._entregar(mensagem)
+
+    def iniciar(self, entregar: Callable[[Dict], None]):
+        self._entregar = entregar
+
+    def parar(self):
+        self._entregar = None
+
+class BackendRedis:
+    """Canal pub/sub num servidor Redis (ou compatível), lido por uma thread em cada processo."""
+
+    def __init__(self, url: str):
+        import redis
+
+        self._cliente = redis.Redis.from_url(url)
+        self._thread = None
+
+    def publicar(self, mensagem: Dict):
+        self._cliente.publish(CANAL, json.dumps(mensagem, default=str))
+
+    def iniciar(self, entregar: Callable[[Dict], None]):
+        assinatura = self._cliente.pubsub(ignore_subscribe_messages=True)
+
+        def receber(mensagem):
+            try:
+                entregar(json.loads(mensagem["data"]))
+            except Exception:
+                logger.exception("Evento inválido no canal %s", CANAL)
+
+        assinatura.subscribe(**{CANAL: receber})
+        self._thread = assinatura.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def parar(self):
+        if self._thread:
+            self._thread.stop()
+            self._thread = None
+
+def criar_backend(url: str = EVENTOS_URL) -> Backend:
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return BackendRedis(url)
+    return BackendLocal()
+
+backend: Backend = criar_backend()
+
+class _Assinante:
+    def __init__(self, cabanas: Optional[Set[int]]):
+        self.cabanas = cabanas
+        self.loop = asyncio.get_running_loop()
+        self.fila: "asyncio.Queue[Dict]" = asyncio.Queue(MAX_PENDENTES)
+
+    def colocar(self, evento: Dict):
+        # Roda no loop do assinante (via call_soon_threadsafe)
+        try:
+            self.fila.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Atrasado demais: descarta o que ficou para trás e pede uma recarga completa
+            while not self.fila.empty():
+                self.fila.get_nowait()
+            self.fila.put_nowait({"tipo": "ressincronizar"})
+
+_assinantes: Set[_Assinante] = set()
+_trava = threading.Lock()
+_iniciado = False
+
+def _entregar(mensagem: Dict):
+    """Distribui uma mensagem do backend às conexões deste processo."""
+    if mensagem.get("origem") != _ORIGEM:
+        # Commit de outro worker: os caches em memória deste ficaram velhos
+        eventos_reserva.notificar_alteracao_externa({e["cabana_id"] for e in mensagem["eventos"]})
+    with _trava:
+        assinantes = list(_assinantes)
+    for assinante in assinantes:
+        for evento in mensagem["eventos"]:
+            if assinante.cabanas is None or evento["cabana_id"] in assinante.cabanas:
+                try:
+                    assinante.loop.call_soon_threadsafe(assinante.colocar, evento)
+                except RuntimeError:
+                    # Loop já encerrado: a conexão caiu sem sair do `assinar`
+                    with _trava:
+                        _assinantes.discard(assinante)
+                    break
+
+def iniciar():
+    global _iniciado
+    with _trava:
+        if _iniciado:
+            return
+        _iniciado = True
+    backend.iniciar(_entregar)
+
+def parar():
+    global _iniciado
+    with _trava:
+        _iniciado = False
+    backend.parar()
+
+def _serializavel(evento: Dict) -> Dict:
+    return {
+        chave: (valor.isoformat() if isinstance(valor, date) else _serializavel(valor) if isinstance(valor, dict) else valor)
+        for chave, valor in evento.items()
+    }
+
+@eventos_reserva.ao_confirmar_eventos
+def publicar(eventos: List[Dict]):
+    try:
+        backend.publicar({"origem": _ORIGEM, "eventos": [_serializavel(e) for e in eventos]})
+    except Exception:
+        # A reserva já foi gravada; quem perder o evento recarrega ao reconectar
+        logger.exception("Falha ao publicar %d eventos de reserva", len(eventos))
+
+@asynccontextmanager
+async def assinar(cabanas: Optional[Set[int]] = None) -> AsyncIterator["asyncio.Queue[Dict]"]:
+    """Fila com os eventos das `cabanas` (todas, se None) enquanto o bloco estiver aberto."""
+    iniciar()
+    assinante = _Assinante(cabanas)
+    with _trava:
+        _assinantes.add(assinante)
+    try:
+        yield assinante.fila
+    finally:
+        with _trava:
+            _assinantes.discard(assinante)
+
+def evento_publico(evento: Dict) -> Optional[Dict]:
+    """Só a cabana e o período cuja disponibilidade mudou, sem dados da reserva; None se nada mudou."""
+    if evento["tipo"] == "ressincronizar":
+        return evento
+    if evento["tipo"] == "atualizada" and "anterior" not in evento:
+        return None
+    anterior = evento.get("anterior", {})
+    datas = [d for d in (evento["data_checkin"], evento["data_checkout"],
+                         anterior.get("data_checkin"), anterior.get("data_checkout")) if d]
+    return {"tipo": "disponibilidade", "cabana_id": evento["cabana_id"],
+            "inicio": min(datas) if datas else None, "fim": max(datas) if datas else None}
+
+def _sse(evento: Dict) -> str:
+    return f"event: {evento['tipo']}\ndata: {json.dumps(evento)}\n\n"
+
+async def fluxo_sse(desconectado: Callable, cabanas: Optional[Set[int]] = None,
+                    converter: Callable[[Dict], Optional[Dict]] = lambda e: e) -> AsyncIterator[str]:
+    """Corpo de uma resposta `text/event-stream`, até `await desconectado()` ser verdadeiro."""
+    async with assinar(cabanas) as fila:
+        yield f"retry: {RETRY_MS}\n\n"
+        while not await desconectado():
+            try:
+                evento = await asyncio.wait_for(fila.get(), HEARTBEAT_SEGUNDOS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            evento = converter(evento)
+            if evento is not None:
+                yield _sse(evento)
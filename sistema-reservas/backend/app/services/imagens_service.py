@@ -0,0 +1,135 @@
+"""Fotos das cabanas: variantes redimensionadas em WebP/AVIF, geradas num pool de processos.
+
+Cada upload vira até três larguras (thumbnail, medium, full) em cada formato
+suportado. Os arquivos são nomeados pelo hash do conteúdo, então uma URL nunca
+muda de conteúdo: `GET /imagens/{nome}` os serve com cache imutável de um ano,
+e reenviar a mesma foto reaproveita os arquivos já gravados.
+
+Requer o pacote opcional `pillow` (extra `imagens`).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+
+IMAGENS_DIR = os.getenv("IMAGENS_DIR", "imagens")
+# Prefixo das URLs gravadas nas cabanas; em produção, a URL pública da API ou da CDN
+URL_BASE = os.getenv("IMAGENS_URL_BASE", "/imagens").rstrip("/")
+WORKERS = int(os.getenv("IMAGENS_WORKERS", str(min(4, os.cpu_count() or 1))))
+MAX_BYTES = int(os.getenv("IMAGENS_MAX_BYTES", str(20 * 1024 * 1024)))
+# Formatos na ordem de preferência; os que o Pillow instalado não codifica são ignorados
+FORMATOS = [f.strip() for f in os.getenv("IMAGENS_FORMATOS", "avif,webp").split(",") if f.strip()]
+# Largura máxima de cada variante; imagens menores não são ampliadas
+LARGURAS = {"thumbnail": 320, "medium": 960, "full": 1920}
+QUALIDADE = {"avif": 55, "webp": 80}
+CACHE_CONTROL_IMUTAVEL = "public, max-age=31536000, immutable"
+TIPOS = {"avif": "image/avif", "webp": "image/webp"}
+
+_NOME_VALIDO = re.compile(r"^[0-9a-f]{32}-\d+\.(avif|webp)$")
+
+class ImagemInvalida(ValueError):
+    """O arquivo enviado não é uma imagem que o Pillow consiga abrir."""
+
+def pillow_disponivel() -> bool:
+    try:
+        import PIL  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def formatos_suportados() -> list:
+    from PIL import features
+
+    return [formato for formato in FORMATOS if formato in QUALIDADE and features.check(formato)]
+
+def _gravar(diretorio: str, nome: str, conteudo: bytes):
+    caminho = os.path.join(diretorio, nome)
+    if os.path.exists(caminho):
+        return
+    # Escrita atômica: um GET concorrente nunca vê o arquivo pela metade
+    descritor, temporario = tempfile.mkstemp(dir=diretorio, suffix=".tmp")
+    with os.fdopen(descritor, "wb") as destino:
+        destino.write(conteudo)
+    os.replace(temporario, caminho)
+
+def _gerar_variantes(dados: bytes, diretorio: str, formatos: list) -> dict:
+    """Roda no pool de processos: decodifica, redimensiona, codifica e grava; devolve os nomes dos arquivos."""
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(io.BytesIO(dados)) as original:
+            original.load()
+            imagem = ImageOps.exif_transpose(original)
+    except (OSError, Image.DecompressionBombError) as erro:
+        raise ImagemInvalida(str(erro)) from None
+    imagem = imagem.convert("RGBA" if "A" in imagem.getbands() or "transparency" in imagem.info else "RGB")
+
+    largura, altura = imagem.size
+    arquivos: Dict[str, Dict[str, str]] = {formato: {} for formato in formatos}
+    for variante, largura_max in LARGURAS.items():
+        if largura > largura_max:
+            redimensionada = imagem.resize((largura_max, max(1, round(altura * largura_max / largura))),
+                                           Image.Resampling.LANCZOS)
+        else:
+            redimensionada = imagem
+        for formato in formatos:
+            buffer = io.BytesIO()
+            redimensionada.save(buffer, format=formato.upper(), quality=QUALIDADE[formato])
+            conteudo = buffer.getvalue()
+            nome = f"{hashlib.sha256(conteudo).hexdigest()[:32]}-{redimensionada.width}.{formato}"
+            _gravar(diretorio, nome, conteudo)
+            arquivos[formato][variante] = nome
+    return {"largura": largura, "altura": altura, "arquivos": arquivos}
+
+_executor: Optional[ProcessPoolExecutor] = None
+_trava = threading.Lock()
+
+def _pool() -> ProcessPoolExecutor:
+    global _executor
+    with _trava:
+        if _executor is None:
+            # spawn: o processo do servidor tem threads (jobs, agendador) que não devem ser copiadas por fork
+            _executor = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+def parar():
+    global _executor
+    with _trava:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+def processar(dados: bytes) -> dict:
+    """Gera as variantes no pool e devolve a foto no formato de `galeria_urls`.
+
+    `full`/`medium`/`thumbnail` apontam para o WebP (suportado por todos os
+    navegadores atuais); `avif` traz as mesmas variantes em AVIF, para um
+    `<picture>` com `<source type="image/avif">`.
+    """
+    formatos = formatos_suportados()
+    if not formatos:
+        raise RuntimeError("O Pillow instalado não codifica nenhum dos formatos em IMAGENS_FORMATOS")
+    os.makedirs(IMAGENS_DIR, exist_ok=True)
+    gerado = _pool().submit(_gerar_variantes, dados, IMAGENS_DIR, formatos).result()
+
+    urls = {formato: {variante: f"{URL_BASE}/{nome}" for variante, nome in nomes.items()}
+            for formato, nomes in gerado["arquivos"].items()}
+    principal = urls["webp"] if "webp" in urls else urls[formatos[0]]
+    return {
+        **principal,
+        "avif": urls["avif"] if "avif" in urls and principal is not urls["avif"] else None,
+        "largura": gerado["largura"],
+        "altura": gerado["altura"],
+    }
+
+def caminho(nome: str) -> Optional[str]:
+    """Arquivo de uma variante já gerada, ou None (nome fora do padrão ou inexistente)."""
+    if not _NOME_VALIDO.match(nome):
+        return None
+    caminho_arquivo = os.path.join(IMAGENS_DIR, nome)
+    return caminho_arquivo if os.path.isfile(caminho_arquivo) else None
@@ -0,0 +1,220 @@
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from ..database import SessionLocal
+from ..models.models import Job
+
+logger = logging.getLogger(__name__)
+
+# "0" desliga os workers neste processo (os jobs ficam na fila para outro worker)
+ATIVO = os.getenv("JOBS_ATIVO", "1") == "1"
+# Threads que executam jobs em cada processo
+WORKERS = int(os.getenv("JOBS_WORKERS", "2"))
+# Intervalo máximo entre consultas à fila (um job novo deste processo acorda os workers na hora)
+TICK_SEGUNDOS = float(os.getenv("JOBS_TICK_SEGUNDOS", "2"))
+# Prazo de um job em execução; renovado a cada progresso. Vencido (worker morreu), outro worker retoma
+PRAZO_SEGUNDOS = int(os.getenv("JOBS_PRAZO_SEGUNDOS", "300"))
+# Vezes que um job é retomado após a queda do worker antes de ser dado como erro
+MAX_TENTATIVAS = 3
+# Onde os arquivos enviados ficam até o job terminar
+DIRETORIO_UPLOADS = os.getenv("JOBS_UPLOAD_DIR", "uploads")
+
+Tarefa = Callable[[Session, Job, dict], dict]
+
+_tarefas: Dict[str, Tarefa] = {}
+# Acorda os workers deste processo quando um job é enfileirado
+_novo_job = threading.Event()
+
+def tarefa(tipo: str):
+    """Registra `funcao(db, job, parametros) -> resultado` como executora dos jobs de `tipo`."""
+    def registrar(funcao: Tarefa):
+        _tarefas[tipo] = funcao
+        return funcao
+    return registrar
+
+def enfileirar(db: Session, tipo: str, **parametros) -> Job:
+    """Grava o job na fila e retorna já com o id. Faz commit."""
+    if tipo not in _tarefas:
+        raise ValueError(f"Tipo de job desconhecido: {tipo}")
+    job = Job(tipo=tipo, status="pendente", parametros=json.dumps(parametros), progresso=0, tentativas=0)
+    db.add(job)
+    db.commit()
+    _novo_job.set()
+    return job
+
+def caminho_upload(extensao: str = "") -> str:
+    """Caminho novo e único no diretório de uploads para um arquivo que um job vai processar.
+
+    Passado ao job no parâmetro `arquivo`, é apagado quando o job termina, com
+    sucesso ou erro (inclusive desistindo após `MAX_TENTATIVAS`); enquanto o job
+    pode ser retomado, o arquivo fica.
+    """
+    os.makedirs(DIRETORIO_UPLOADS, exist_ok=True)
+    return os.path.join(DIRETORIO_UPLOADS, f"{uuid.uuid4().hex}{extensao}")
+
+def _disponivel(agora: datetime):
+    return or_(
+        Job.status == "pendente",
+        and_(Job.status == "executando", Job.expira_em < agora)
+    )
+
+def reservar(db: Session, dono: str) -> Optional[Job]:
+    """Pega o job mais antigo da fila (ou um abandonado por um worker que caiu). Faz commit.
+
+    O UPDATE condicional é atômico no banco, então dois workers nunca pegam
+    o mesmo job; quem perde a disputa tenta o próximo.
+    """
+    while True:
+        agora = datetime.now()
+        candidato = db.query(Job.id).filter(_disponivel(agora)).order_by(Job.id).first()
+        if not candidato:
+            db.rollback()
+            return None
+        reservado = db.query(Job).filter(Job.id == candidato.id, _disponivel(agora)).update({
+            "status": "executando",
+            "dono": dono,
+            "expira_em": agora + timedelta(seconds=PRAZO_SEGUNDOS),
+            "iniciado_em": agora,
+            "tentativas": Job.tentativas + 1,
+        }, synchronize_session=False)
+        db.commit()
+        if reservado:
+            return db.get(Job, candidato.id)
+
+def registrar_progresso(db: Session, job: Job, fracao: float):
+    """Atualiza o progresso (0 a 1) e renova o prazo do job. Faz commit, junto com o que a tarefa já gravou."""
+    job.progresso = max(0, min(100, int(fracao * 100)))
+    job.expira_em = datetime.now() + timedelta(seconds=PRAZO_SEGUNDOS)
+    db.commit()
+
+def _remover_upload(job: Job):
+    arquivo = json.loads(job.parametros or "{}").get("arquivo")
+    if arquivo:
+        try:
+            os.remove(arquivo)
+        except FileNotFoundError:
+            pass
+
+def _finalizar(db: Session, job: Job, status: str, resultado: Optional[dict] = None, erro: Optional[str] = None):
+    job.status = status
+    job.resultado = json.dumps(resultado, default=str) if resultado is not None else None
+    job.erro = erro
+    job.dono = None
+    job.expira_em = None
+    job.concluido_em = datetime.now()
+    if status == "concluido":
+        job.progresso = 100
+    db.commit()
+    _remover_upload(job)
+
+def executar(db: Session, job: Job):
+    """Executa um job já reservado e grava o resultado ou o erro."""
+    funcao = _tarefas.get(job.tipo)
+    if funcao is None:
+        _finalizar(db, job, "erro", erro=f"Tipo de job desconhecido: {job.tipo}")
+        return
+    if job.tentativas > MAX_TENTATIVAS:
+        _finalizar(db, job, "erro", erro="O worker parou durante a execução em todas as tentativas")
+        return
+    try:
+        resultado = funcao(db, job, json.loads(job.parametros or "{}"))
+    except Exception as e:
+        logger.exception("Erro no job %s (%s)", job.id, job.tipo)
+        db.rollback()
+        _finalizar(db, job, "erro", erro=str(e))
+        return
+    _finalizar(db, job, "concluido", resultado=resultado)
+
+def executar_pendentes(db: Session, dono: Optional[str] = None, limite: Optional[int] = None) -> int:
+    """Executa jobs da fila até ela esvaziar (ou até `limite`). Retorna quantos foram executados."""
+    dono = dono or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    executados = 0
+    while limite is None or executados < limite:
+        job = reservar(db, dono)
+        if job is None:
+            break
+        executar(db, job)
+        executados += 1
+    return executados
+
+def como_dict(job: Job) -> dict:
+    return {
+        "id": job.id,
+        "tipo": job.tipo,
+        "status": job.status,
+        "progresso": job.progresso or 0,
+        "resultado": json.loads(job.resultado) if job.resultado else None,
+        "erro": job.erro,
+        "tentativas": job.tentativas or 0,
+        "created_at": job.created_at,
+        "iniciado_em": job.iniciado_em,
+        "concluido_em": job.concluido_em,
+    }
+
+def resposta_enfileirado(job: Job) -> dict:
+    """Corpo do 202 das rotas que enfileiram um job."""
+    return {"status": "queued", "job_id": job.id, "url": f"/api/jobs/{job.id}"}
+
+class Trabalhadores:
+    """Threads que consomem a fila de jobs do banco.
+
+    Cada processo (worker do uvicorn) roda as suas; a reserva atômica do job
+    garante que cada um é executado uma vez. Jobs pendentes sobrevivem a um
+    reinício, e os que estavam em execução são retomados quando o prazo vence.
+    """
+
+    def __init__(self, quantidade: int = WORKERS):
+        self.quantidade = quantidade
+        self.dono = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._parar = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def ativo(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def iniciar(self):
+        if self.ativo:
+            return
+        self._parar.clear()
+        self._threads = [
+            threading.Thread(target=self._executar, args=(f"{self.dono}:{n}",), name=f"jobs-{n}", daemon=True)
+            for n in range(self.quantidade)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def parar(self, timeout: float = 5.0):
+        self._parar.set()
+        _novo_job.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _executar(self, dono: str):
+        while not self._parar.is_set():
+            db = SessionLocal()
+            try:
+                executar_pendentes(db, dono)
+            except Exception:
+                logger.exception("Erro no worker de jobs")
+            finally:
+                db.close()
+            if _novo_job.wait(TICK_SEGUNDOS):
+                _novo_job.clear()
+
+trabalhadores = Trabalhadores()
+
+def iniciar():
+    if ATIVO:
+        trabalhadores.iniciar()
+
+def parar():
+    trabalhadores.parar()
@@ -0,0 +1,129 @@
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+import os
+import threading
+import time
+from sqlalchemy.orm import Session
+from ..database import replica_defasada
+from ..models.models import Reserva
+from .disponibilidade_service import filtro_periodo
+from .eventos_reserva import ao_alterar_reservas
+
+# Quantos dias à frente o bitmap em memória cobre a partir de hoje
+HORIZONTE_DIAS = int(os.getenv("OCUPACAO_HORIZONTE_DIAS", "730"))
+# Limite de idade do bitmap; cobre escritas feitas por outros workers
+TTL_SEGUNDOS = float(os.getenv("OCUPACAO_TTL_SEGUNDOS", "60"))
+
+class MapaOcupacao:
+    """Bitmap de ocupação de uma cabana: o bit `i` marca a noite de `origem + i`."""
+
+    __slots__ = ("origem", "dias", "bits", "criado_em")
+
+    def __init__(self, origem: date, dias: int, bits: int = 0):
+        self.origem = origem
+        self.dias = dias
+        self.bits = bits
+        self.criado_em = time.monotonic()
+
+    @property
+    def fim(self) -> date:
+        return self.origem + timedelta(days=self.dias)
+
+    def cobre(self, inicio: date, fim: date) -> bool:
+        return self.origem <= inicio and fim <= self.fim
+
+    def marcar(self, inicio: date, fim: date):
+        inicio, fim = max(inicio, self.origem), min(fim, self.fim)
+        if fim <= inicio:
+            return
+        noites = (fim - inicio).days
+        self.bits |= ((1 << noites) - 1) << (inicio - self.origem).days
+
+    def fatia(self, inicio: date, fim: date) -> int:
+        """Bits das noites de [inicio, fim), com o bit 0 correspondendo a `inicio`."""
+        noites = (fim - inicio).days
+        if noites <= 0:
+            return 0
+        deslocamento = (inicio - self.origem).days
+        bits = self.bits >> deslocamento if deslocamento >= 0 else self.bits << -deslocamento
+        return bits & ((1 << noites) - 1)
+
+def intervalos(bits: int, origem: date) -> List[Tuple[date, date]]:
+    """Converte um bitmap em intervalos contínuos [inicio, fim) de noites ocupadas."""
+    resultado = []
+    posicao = 0
+    while bits:
+        livres = (bits & -bits).bit_length() - 1
+        bits >>= livres
+        posicao += livres
+        ocupadas = (~bits & (bits + 1)).bit_length() - 1
+        resultado.append((origem + timedelta(days=posicao), origem + timedelta(days=posicao + ocupadas)))
+        bits >>= ocupadas
+        posicao += ocupadas
+    return resultado
+
+def _construir(db: Session, cabana_id: int, origem: date, dias: int) -> MapaOcupacao:
+    mapa = MapaOcupacao(origem, dias)
+    estadias = db.query(Reserva.data_checkin, Reserva.data_checkout).filter(
+        Reserva.cabana_id == cabana_id,
+        filtro_periodo(mapa.origem, mapa.fim),
+        Reserva.status != "cancelada"
+    ).all()
+    for checkin, checkout in estadias:
+        mapa.marcar(checkin, checkout)
+    return mapa
+
+_mapas: Dict[int, MapaOcupacao] = {}
+# Incrementada a cada invalidação; evita guardar um mapa montado antes de um commit concorrente
+_geracoes: Dict[int, int] = {}
+# Momento (time.monotonic) da última invalidação de cada cabana
+_invalidado_em: Dict[int, float] = {}
+_trava = threading.Lock()
+
+@ao_alterar_reservas
+def invalidar(cabana_ids):
+    with _trava:
+        for cabana_id in cabana_ids:
+            _mapas.pop(cabana_id, None)
+            _geracoes[cabana_id] = _geracoes.get(cabana_id, 0) + 1
+            _invalidado_em[cabana_id] = time.monotonic()
+
+def limpar_cache():
+    with _trava:
+        _mapas.clear()
+        _geracoes.clear()
+        _invalidado_em.clear()
+
+def mapa_da_cabana(db: Session, cabana_id: int) -> MapaOcupacao:
+    """Bitmap em cache cobrindo [hoje, hoje + HORIZONTE_DIAS)."""
+    hoje = date.today()
+    mapa = _mapas.get(cabana_id)
+    if mapa and mapa.origem == hoje and time.monotonic() - mapa.criado_em < TTL_SEGUNDOS:
+        return mapa
+
+    geracao = _geracoes.get(cabana_id, 0)
+    mapa = _construir(db, cabana_id, hoje, HORIZONTE_DIAS)
+    with _trava:
+        if _geracoes.get(cabana_id, 0) == geracao and not replica_defasada(db, _invalidado_em.get(cabana_id)):
+            _mapas[cabana_id] = mapa
+    return mapa
+
+def periodo(inicio: Optional[date] = None, fim: Optional[date] = None) -> Tuple[date, date]:
+    """Completa o período com o padrão: de hoje até o fim do horizonte."""
+    hoje = date.today()
+    return inicio or hoje, fim or hoje + timedelta(days=HORIZONTE_DIAS)
+
+def ocupacao(db: Session, cabana_id: int, inicio: Optional[date] = None, fim: Optional[date] = None) -> Tuple[date, date, int]:
+    """Retorna (inicio, fim, bits) com as noites ocupadas da cabana no período.
+
+    Períodos dentro do horizonte saem de uma fatia do bitmap em cache; fora
+    dele (ex: histórico) o bitmap é montado só para a consulta.
+    """
+    inicio, fim = periodo(inicio, fim)
+    if fim <= inicio:
+        # Só um dos limites informado, e fora do padrão (ex: início depois do horizonte): nenhuma noite
+        return inicio, fim, 0
+    mapa = mapa_da_cabana(db, cabana_id)
+    if not mapa.cobre(inicio, fim):
+        mapa = _construir(db, cabana_id, inicio, (fim - inicio).days)
+    return inicio, fim, mapa.fatia(inicio, fim)
@@ -0,0 +1,149 @@
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from ..models.models import Cabana
+from . import tarifario_service
+from .tarifario_service import DIAS_FDS, TabelaPrecos
+
+PERCENTUAL_SINAL = 0.5
+HOSPEDES_INCLUSOS_PADRAO = 2
+
+ORCAMENTO_VAZIO = {"total": 0, "sinal": 0, "diarias": 0}
+
+def contar_noites(data_checkin: date, data_checkout: date) -> Tuple[int, int]:
+    """Retorna (noites de semana, noites de fim de semana) sem percorrer dia a dia.
+
+    Cada semana cheia tem exatamente len(DIAS_FDS) noites de fim de semana;
+    só o resto (no máximo 6 noites) depende do dia da semana do check-in.
+    """
+    noites = (data_checkout - data_checkin).days
+    semanas, resto = divmod(noites, 7)
+    primeiro = data_checkin.weekday()
+    fds = semanas * len(DIAS_FDS) + sum(1 for i in range(resto) if (primeiro + i) % 7 in DIAS_FDS)
+    return noites - fds, fds
+
+def hospedes_extras(cabana: Cabana, adultos: int) -> int:
+    inclusos = cabana.hospedes_inclusos if cabana.hospedes_inclusos is not None else HOSPEDES_INCLUSOS_PADRAO
+    return max(0, adultos - inclusos)
+
+def _valor_diarias(cabana: Cabana, tabela: Optional[TabelaPrecos], data_checkin: date, data_checkout: date) -> Tuple[float, float]:
+    """(valor das noites de semana, valor das noites de fds) da estadia.
+
+    O trecho dentro do horizonte da tabela sai das somas acumuladas; o que
+    ficar fora dela (passado ou além do horizonte) usa os preços base.
+    """
+    preco_semana = cabana.preco_base_semana or 0.0
+    preco_fds = cabana.preco_base_fds or 0.0
+
+    def base(inicio: date, fim: date) -> Tuple[float, float]:
+        if fim <= inicio:
+            return 0.0, 0.0
+        semana, fds = contar_noites(inicio, fim)
+        return semana * preco_semana, fds * preco_fds
+
+    if tabela is None:
+        return base(data_checkin, data_checkout)
+
+    a, b = max(data_checkin, tabela.origem), min(data_checkout, tabela.fim)
+    if b <= a:
+        return base(data_checkin, data_checkout)
+
+    total, fds = tabela.soma(a, b)
+    antes_semana, antes_fds = base(data_checkin, a)
+    depois_semana, depois_fds = base(b, data_checkout)
+    return total - fds + antes_semana + depois_semana, fds + antes_fds + depois_fds
+
+def _preco_da_noite(cabana: Cabana, tabela: Optional[TabelaPrecos], dia: date) -> float:
+    if tabela is not None and tabela.origem <= dia < tabela.fim:
+        return tabela.precos[tabela.indice(dia)]
+    return (cabana.preco_base_fds if dia.weekday() in DIAS_FDS else cabana.preco_base_semana) or 0.0
+
+def calcular_orcamento(
+    cabana: Optional[Cabana],
+    data_checkin: date,
+    data_checkout: date,
+    adultos: int = 2,
+    criancas: int = 0,
+    detalhado: bool = False,
+    tabela: Optional[TabelaPrecos] = None
+) -> dict:
+    """Orçamento da estadia com o detalhamento por tipo de noite.
+
+    Com a `tabela` do tarifário, temporadas, feriados e estadia mínima entram
+    no cálculo sem custo por noite. Com `detalhado=True` inclui também a
+    lista de noites com o valor de cada uma.
+    """
+    if not cabana or data_checkout <= data_checkin:
+        return dict(ORCAMENTO_VAZIO)
+
+    noites_semana, noites_fds = contar_noites(data_checkin, data_checkout)
+    diarias = noites_semana + noites_fds
+    extras = hospedes_extras(cabana, adultos)
+    valor_extra_noite = extras * (cabana.valor_hospede_extra or 0.0)
+    valor_semana, valor_fds = _valor_diarias(cabana, tabela, data_checkin, data_checkout)
+
+    estadia_minima = 1
+    if tabela is not None and tabela.origem <= data_checkin < tabela.fim:
+        estadia_minima = tabela.estadia_minima[tabela.indice(data_checkin)]
+
+    total = valor_semana + valor_fds + diarias * valor_extra_noite
+    orcamento = {
+        "total": total,
+        "sinal": total * PERCENTUAL_SINAL,
+        "diarias": diarias,
+        "estadia_minima": estadia_minima,
+        "detalhamento": {
+            "noites_semana": noites_semana,
+            "noites_fds": noites_fds,
+            "valor_semana": valor_semana,
+            "valor_fds": valor_fds,
+            "hospedes_extras": extras,
+            "valor_hospedes_extras": diarias * valor_extra_noite,
+        }
+    }
+    if detalhado:
+        orcamento["noites"] = [
+            {"data": dia.isoformat(), "valor": _preco_da_noite(cabana, tabela, dia) + valor_extra_noite}
+            for dia in (data_checkin + timedelta(days=i) for i in range(diarias))
+        ]
+    return orcamento
+
+def _orcar(db: Session, cabana: Optional[Cabana], data_checkin: date, data_checkout: date,
+           adultos: int = 2, criancas: int = 0, detalhado: bool = False) -> dict:
+    tabela = tarifario_service.tabela_da_cabana(db, cabana) if cabana else None
+    return calcular_orcamento(cabana, data_checkin, data_checkout, adultos, criancas, detalhado, tabela)
+
+def calcular_preco(db: Session, cabana_id: int, data_checkin: date, data_checkout: date,
+                   adultos: int = 2, criancas: int = 0, detalhado: bool = False) -> dict:
+    cabana = db.query(Cabana).filter(Cabana.id == cabana_id).first()
+    return _orcar(db, cabana, data_checkin, data_checkout, adultos, criancas, detalhado)
+
+def cotar_lote(db: Session, pedidos: Iterable[dict]) -> List[dict]:
+    """Orça várias estadias (de qualquer cabana) carregando as cabanas numa única consulta.
+
+    Cada pedido tem `cabana_id`, `data_checkin`, `data_checkout` e,
+    opcionalmente, `adultos` e `criancas`.
+    """
+    pedidos = list(pedidos)
+    ids = {p["cabana_id"] for p in pedidos}
+    cabanas: Dict[int, Cabana] = {c.id: c for c in db.query(Cabana).filter(Cabana.id.in_(ids))}
+    return [
+        {
+            "cabana_id": p["cabana_id"],
+            "data_checkin": p["data_checkin"],
+            "data_checkout": p["data_checkout"],
+            **_orcar(
+                db, cabanas.get(p["cabana_id"]), p["data_checkin"], p["data_checkout"],
+                p.get("adultos", 2), p.get("criancas", 0)
+            )
+        }
+        for p in pedidos
+    ]
+
+def cotar_todas_cabanas(db: Session, data_checkin: date, data_checkout: date,
+                        adultos: int = 2, criancas: int = 0) -> List[dict]:
+    return [
+        {"cabana_id": cabana.id, "nome": cabana.nome,
+         **_orcar(db, cabana, data_checkin, data_checkout, adultos, criancas)}
+        for cabana in db.query(Cabana).order_by(Cabana.id)
+    ]
@@ -0,0 +1,146 @@
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterator, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from ..models.models import Reserva, ResumoFinanceiro
+from .disponibilidade_service import filtro_periodo, travar_cabana
+from .eventos_reserva import Alteracao, antes_do_commit
+
+# Status que contam como receita
+STATUS_FATURADOS = ("confirmada", "concluída")
+
+Chave = Tuple[int, int, int] # (cabana_id, ano, mes)
+
+def _inicio_mes(ano: int, mes: int) -> date:
+    return date(ano, mes, 1)
+
+def _proximo_mes(ano: int, mes: int) -> date:
+    return date(ano + mes // 12, mes % 12 + 1, 1)
+
+def meses_do_periodo(inicio: date, fim: date) -> Iterator[Tuple[int, int]]:
+    """(ano, mes) de cada mês com pelo menos uma noite em [inicio, fim)."""
+    ano, mes = inicio.year, inicio.month
+    while _inicio_mes(ano, mes) < fim:
+        yield ano, mes
+        ano, mes = (ano + 1, 1) if mes == 12 else (ano, mes + 1)
+
+def _acumular(resumos: Dict[Chave, dict], cabana_id: int, checkin: date, checkout: date, valor: Optional[float],
+              apenas: Optional[Chave] = None):
+    """Soma a estadia nos resumos dos meses que ela toca.
+
+    A reserva e o faturamento contam no mês do check-in (como no relatório
+    antigo); as noites e a receita das diárias (rateada por noite) contam no
+    mês em que cada noite acontece, base da ocupação, ADR e RevPAR.
+    """
+    valor = valor or 0.0
+    total_noites = (checkout - checkin).days
+    for ano, mes in meses_do_periodo(checkin, checkout):
+        chave = (cabana_id, ano, mes)
+        if apenas and chave != apenas:
+            continue
+        noites = (min(checkout, _proximo_mes(ano, mes)) - max(checkin, _inicio_mes(ano, mes))).days
+        resumo = resumos[chave]
+        resumo["noites_ocupadas"] += noites
+        resumo["receita_diarias"] += valor * noites / total_noites
+        if (checkin.year, checkin.month) == (ano, mes):
+            resumo["reservas"] += 1
+            resumo["faturamento"] += valor
+
+def _novo_resumo() -> dict:
+    return {"reservas": 0, "faturamento": 0.0, "noites_ocupadas": 0, "receita_diarias": 0.0}
+
+def recalcular_mes(db: Session, cabana_id: int, ano: int, mes: int):
+    """Refaz o resumo de uma cabana em um mês a partir das reservas que tocam o mês."""
+    chave = (cabana_id, ano, mes)
+    estadias = db.query(Reserva.data_checkin, Reserva.data_checkout, Reserva.valor_total).filter(
+        Reserva.cabana_id == cabana_id,
+        filtro_periodo(_inicio_mes(ano, mes), _proximo_mes(ano, mes)),
+        Reserva.status.in_(STATUS_FATURADOS)
+    ).all()
+
+    resumos: Dict[Chave, dict] = defaultdict(_novo_resumo)
+    for checkin, checkout, valor in estadias:
+        _acumular(resumos, cabana_id, checkin, checkout, valor, apenas=chave)
+
+    existente = db.query(ResumoFinanceiro).filter(
+        ResumoFinanceiro.cabana_id == cabana_id,
+        ResumoFinanceiro.ano == ano,
+        ResumoFinanceiro.mes == mes
+    ).first()
+    valores = resumos.get(chave)
+    if not valores:
+        if existente:
+            db.delete(existente)
+        return
+    if not existente:
+        existente = ResumoFinanceiro(cabana_id=cabana_id, ano=ano, mes=mes)
+        db.add(existente)
+    for campo, valor in valores.items():
+        setattr(existente, campo, valor)
+
+@antes_do_commit
+def atualizar_resumos(db: Session, alteracoes: Set[Alteracao]):
+    """Mantém os resumos dos meses tocados pelas reservas alteradas na transação."""
+    chaves: Set[Chave] = set()
+    for cabana_id, checkin, checkout in alteracoes:
+        if checkin is None or checkout is None:
+            # Escrita em lote sem período conhecido: refaz todos os meses da cabana
+            meses = db.query(ResumoFinanceiro.ano, ResumoFinanceiro.mes).filter(ResumoFinanceiro.cabana_id == cabana_id)
+            chaves.update((cabana_id, ano, mes) for ano, mes in meses)
+            periodos = db.query(Reserva.data_checkin, Reserva.data_checkout).filter(Reserva.cabana_id == cabana_id)
+            for inicio, fim in periodos:
+                chaves.update((cabana_id, ano, mes) for ano, mes in meses_do_periodo(inicio, fim))
+        elif checkout > checkin:
+            chaves.update((cabana_id, ano, mes) for ano, mes in meses_do_periodo(checkin, checkout))
+    # Nem toda escrita chega aqui com a cabana travada (cancelamento, check-in/out);
+    # sem a trava, duas transações poderiam inserir o mesmo (cabana, ano, mês) ou
+    # sobrescrever o resumo uma da outra. Em ordem de id, para não haver deadlock.
+    for cabana_id in sorted({cabana_id for cabana_id, _, _ in chaves}):
+        travar_cabana(db, cabana_id)
+    for cabana_id, ano, mes in sorted(chaves):
+        recalcular_mes(db, cabana_id, ano, mes)
+
+def reconstruir(db: Session) -> int:
+    """Apaga e recalcula todos os resumos numa única passada pelas reservas. Retorna o total de linhas."""
+    resumos: Dict[Chave, dict] = defaultdict(_novo_resumo)
+    estadias = db.query(Reserva.cabana_id, Reserva.data_checkin, Reserva.data_checkout, Reserva.valor_total).filter(
+        Reserva.status.in_(STATUS_FATURADOS),
+        Reserva.data_checkout > Reserva.data_checkin
+    ).execution_options(yield_per=1000)
+    for cabana_id, checkin, checkout, valor in estadias:
+        _acumular(resumos, cabana_id, checkin, checkout, valor)
+
+    db.query(ResumoFinanceiro).delete()
+    db.bulk_insert_mappings(ResumoFinanceiro, [
+        {"cabana_id": cabana_id, "ano": ano, "mes": mes, **valores}
+        for (cabana_id, ano, mes), valores in resumos.items()
+    ])
+    db.commit()
+    return len(resumos)
+
+def metricas(resumo) -> dict:
+    """Indicadores do mês a partir de um resumo (modelo ou linha com as mesmas colunas)."""
+    dias = monthrange(resumo.ano, resumo.mes)[1]
+    noites = resumo.noites_ocupadas or 0
+    receita = resumo.receita_diarias or 0.0
+    return {
+        "cabana_id": resumo.cabana_id,
+        "ano": resumo.ano,
+        "mes": resumo.mes,
+        "reservas": resumo.reservas,
+        "faturamento": resumo.faturamento,
+        "noites_ocupadas": noites,
+        "taxa_ocupacao": noites / dias,
+        "adr": receita / noites if noites else 0.0,
+        "revpar": receita / dias,
+    }
+
+if __name__ == "__main__":
+    from ..database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        print(f"Resumos financeiros reconstruídos: {reconstruir(db)} linhas")
+    finally:
+        db.close()
@@ -0,0 +1,171 @@
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+import os
+import threading
+import time
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from ..database import replica_defasada
+from ..models.models import Cabana, RegraTarifa
+
+# Noites de sexta e sábado usam o preço de fim de semana
+DIAS_FDS = (4, 5)
+# Cerca de 18 meses de diárias pré-calculadas a partir de hoje
+HORIZONTE_DIAS = int(os.getenv("TARIFARIO_HORIZONTE_DIAS", "548"))
+# Limite de idade da tabela; cobre alterações feitas por outros workers
+TTL_SEGUNDOS = float(os.getenv("TARIFARIO_TTL_SEGUNDOS", "300"))
+
+class TabelaPrecos:
+    """Diárias de uma cabana dia a dia, com somas acumuladas para orçar em O(1).
+
+    `acumulado[i]` é a soma das diárias de `origem` até `origem + i` (exclusivo);
+    `acumulado_fds` faz o mesmo só com as noites de fim de semana.
+    """
+
+    __slots__ = ("origem", "dias", "precos", "estadia_minima", "acumulado", "acumulado_fds", "criado_em")
+
+    def __init__(self, origem: date, dias: int):
+        self.origem = origem
+        self.dias = dias
+        self.precos: List[float] = [0.0] * dias
+        self.estadia_minima: List[int] = [1] * dias
+        self.acumulado: List[float] = [0.0] * (dias + 1)
+        self.acumulado_fds: List[float] = [0.0] * (dias + 1)
+        self.criado_em = time.monotonic()
+
+    @property
+    def fim(self) -> date:
+        return self.origem + timedelta(days=self.dias)
+
+    def indice(self, dia: date) -> int:
+        return (dia - self.origem).days
+
+    def fds(self, i: int) -> bool:
+        return (self.origem.weekday() + i) % 7 in DIAS_FDS
+
+    def copiar(self) -> "TabelaPrecos":
+        nova = TabelaPrecos.__new__(TabelaPrecos)
+        nova.origem, nova.dias, nova.criado_em = self.origem, self.dias, self.criado_em
+        nova.precos = list(self.precos)
+        nova.estadia_minima = list(self.estadia_minima)
+        nova.acumulado = list(self.acumulado)
+        nova.acumulado_fds = list(self.acumulado_fds)
+        return nova
+
+    def compilar(self, cabana: Cabana, regras: List[RegraTarifa], inicio: int = 0, fim: Optional[int] = None):
+        """Recalcula os dias [inicio, fim) a partir dos preços base e das regras.
+
+        As regras vêm ordenadas por prioridade; as posteriores sobrescrevem as
+        anteriores nos dias que têm em comum.
+        """
+        fim = self.dias if fim is None else fim
+        for i in range(inicio, fim):
+            self.precos[i] = (cabana.preco_base_fds if self.fds(i) else cabana.preco_base_semana) or 0.0
+            self.estadia_minima[i] = 1
+
+        for regra in regras:
+            a = max(inicio, self.indice(regra.data_inicio))
+            b = min(fim, self.indice(regra.data_fim))
+            for i in range(a, b):
+                preco = regra.preco_fds if self.fds(i) else regra.preco_semana
+                if preco is not None:
+                    self.precos[i] = preco
+                if regra.estadia_minima:
+                    self.estadia_minima[i] = regra.estadia_minima
+
+        self._acumular(inicio)
+
+    def _acumular(self, inicio: int):
+        for i in range(inicio, self.dias):
+            preco = self.precos[i]
+            self.acumulado[i + 1] = self.acumulado[i] + preco
+            self.acumulado_fds[i + 1] = self.acumulado_fds[i] + (preco if self.fds(i) else 0.0)
+
+    def soma(self, inicio: date, fim: date) -> Tuple[float, float]:
+        """(valor total, valor das noites de fim de semana) de [inicio, fim) dentro da tabela."""
+        i, j = self.indice(inicio), self.indice(fim)
+        return (
+            self.acumulado[j] - self.acumulado[i],
+            self.acumulado_fds[j] - self.acumulado_fds[i]
+        )
+
+def regras_no_periodo(db: Session, cabana_id: int, inicio: date, fim: date) -> List[RegraTarifa]:
+    """Regras da cabana (e as gerais, sem cabana) que tocam [inicio, fim), em ordem de aplicação."""
+    return db.query(RegraTarifa).filter(
+        or_(RegraTarifa.cabana_id == cabana_id, RegraTarifa.cabana_id.is_(None)),
+        RegraTarifa.data_inicio < fim,
+        RegraTarifa.data_fim > inicio
+    ).order_by(RegraTarifa.prioridade, RegraTarifa.id).all()
+
+_tabelas: Dict[int, TabelaPrecos] = {}
+# Incrementada a cada alteração de regra ou preço base da cabana (None = todas as cabanas);
+# uma tabela compilada durante uma alteração não entra no cache
+_geracoes: Dict[Optional[int], int] = {}
+# Momento (time.monotonic) da última alteração de cada cabana (None = todas)
+_alterado_em: Dict[Optional[int], float] = {}
+_trava = threading.Lock()
+
+def _geracao(cabana_id: int) -> Tuple[int, int]:
+    return _geracoes.get(None, 0), _geracoes.get(cabana_id, 0)
+
+def _nova_geracao(cabana_id: Optional[int]):
+    _geracoes[cabana_id] = _geracoes.get(cabana_id, 0) + 1
+    _alterado_em[cabana_id] = time.monotonic()
+
+def _ultima_alteracao(cabana_id: int) -> Optional[float]:
+    return max((_alterado_em[chave] for chave in (None, cabana_id) if chave in _alterado_em), default=None)
+
+def tabela_da_cabana(db: Session, cabana: Cabana) -> TabelaPrecos:
+    """Tabela em cache cobrindo [hoje, hoje + HORIZONTE_DIAS), compilada sob demanda."""
+    hoje = date.today()
+    tabela = _tabelas.get(cabana.id)
+    if tabela and tabela.origem == hoje and time.monotonic() - tabela.criado_em < TTL_SEGUNDOS:
+        return tabela
+
+    geracao = _geracao(cabana.id)
+    tabela = TabelaPrecos(hoje, HORIZONTE_DIAS)
+    tabela.compilar(cabana, regras_no_periodo(db, cabana.id, tabela.origem, tabela.fim))
+    with _trava:
+        if _geracao(cabana.id) == geracao and not replica_defasada(db, _ultima_alteracao(cabana.id)):
+            _tabelas[cabana.id] = tabela
+    return tabela
+
+def atualizar_periodo(db: Session, cabana_id: Optional[int], inicio: date, fim: date):
+    """Recompila só os dias [inicio, fim) das tabelas em cache afetadas por uma regra.
+
+    `cabana_id=None` (regra geral) atinge todas as cabanas em cache. As
+    consultas e a compilação ficam fora da trava, que as rotas públicas
+    também pegam; ela só protege a foto do cache e a troca no fim.
+    """
+    with _trava:
+        _nova_geracao(cabana_id)
+        alvos = {alvo: (tabela, _geracao(alvo)) for alvo, tabela in _tabelas.items()
+                 if cabana_id is None or alvo == cabana_id}
+    for alvo, (tabela, geracao) in alvos.items():
+        a, b = max(inicio, tabela.origem), min(fim, tabela.fim)
+        if b <= a:
+            continue
+        cabana = db.get(Cabana, alvo)
+        nova = None
+        if cabana:
+            # Recompila numa cópia para que leituras concorrentes nunca vejam a tabela pela metade
+            nova = tabela.copiar()
+            nova.compilar(cabana, regras_no_periodo(db, alvo, a, b), nova.indice(a), nova.indice(b))
+        with _trava:
+            if nova is None or _geracao(alvo) != geracao:
+                # Cabana removida, ou outra alteração no meio: a próxima leitura monta a tabela do zero
+                _tabelas.pop(alvo, None)
+            elif _tabelas.get(alvo) is tabela:
+                _tabelas[alvo] = nova
+
+def invalidar(cabana_id: Optional[int] = None):
+    """Descarta a tabela da cabana (ou todas), ex: quando os preços base mudam."""
+    with _trava:
+        _nova_geracao(cabana_id)
+        if cabana_id is None:
+            _tabelas.clear()
+        else:
+            _tabelas.pop(cabana_id, None)
+
+def limpar_cache():
+    invalidar()
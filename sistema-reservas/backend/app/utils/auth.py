@@ -1,5 +1,7 @@
 from datetime import datetime, timedelta
 from typing import Optional
+from fastapi import Depends
+from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import os
@@ -14,6 +16,12 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 # 24 horas
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# auto_error=False: as rotas ainda não exigem login; o token, quando vem, identifica o usuário
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
+
+# Autor registrado na auditoria quando a requisição não traz um token válido
+USUARIO_ANONIMO = "anônimo"
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -29,3 +37,13 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+def usuario_atual(token: Optional[str] = Depends(oauth2_scheme)) -> str:
+    """Username do token JWT da requisição (sem consulta ao banco), ou USUARIO_ANONIMO."""
+    if not token:
+        return USUARIO_ANONIMO
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return USUARIO_ANONIMO
+    return payload.get("sub") or USUARIO_ANONIMO
@@ -0,0 +1,48 @@
+import hashlib
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+def gerar_etag(*partes) -> str:
+    digest = hashlib.sha1("|".join(str(p) for p in partes).encode()).hexdigest()
+    return f'"{digest}"'
+
+def etag_confere(request: Request, etag: str) -> bool:
+    """Verifica se o `If-None-Match` da requisição já contém o ETag atual."""
+    cabecalho = request.headers.get("if-none-match")
+    if not cabecalho:
+        return False
+    candidatos = [c.strip() for c in cabecalho.split(",")]
+    # Comparação fraca: o prefixo W/ (adicionado por proxies/CDN) não importa
+    return "*" in candidatos or etag in [c.removeprefix("W/") for c in candidatos]
+
+def nao_modificado(request: Request, etag: str, modificado_em: Optional[datetime] = None) -> bool:
+    """Decide o 304: `If-None-Match` tem precedência; sem ele, vale o `If-Modified-Since`."""
+    if request.headers.get("if-none-match"):
+        return etag_confere(request, etag)
+    cabecalho = request.headers.get("if-modified-since")
+    if not cabecalho or modificado_em is None:
+        return False
+    try:
+        return modificado_em <= parsedate_to_datetime(cabecalho)
+    except (TypeError, ValueError):
+        return False
+
+def data_http(momento: datetime) -> str:
+    return format_datetime(momento, usegmt=True)
+
+def resposta_json_com_etag(request: Request, conteudo, etag: str, cache_control: str = "no-cache") -> Response:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_confere(request, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=conteudo, headers=headers)
+
+def resposta_bytes_com_etag(request: Request, corpo: bytes, etag: str, cache_control: str = "no-cache",
+                            media_type: str = "application/json") -> Response:
+    """Como `resposta_json_com_etag`, para um corpo já serializado (ex: vindo do cache)."""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_confere(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=corpo, media_type=media_type, headers=headers)
@@ -1,12 +1,16 @@
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 from ..models import models
 
-def log_action(db: Session, usuario: str, acao: str, reserva_id: int = None, detalhes: str = None):
+def log_action(db: Session, usuario: str, acao: str, reserva_id: int = None, detalhes: dict = None):
+    """Adiciona a entrada de auditoria à sessão; ela é gravada no commit da própria alteração.
+
+    `detalhes` é gravado como JSON (datas viram texto ISO).
+    """
     new_log = models.AuditLog(
         usuario=usuario,
         acao=acao,
         reserva_id=reserva_id,
-        detalhes=detalhes
+        detalhes=jsonable_encoder(detalhes) if detalhes is not None else None
     )
     db.add(new_log)
-    db.commit()
@@ -0,0 +1 @@
+# Este arquivo torna a pasta um pacote Python
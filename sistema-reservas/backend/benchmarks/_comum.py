@@ -0,0 +1,120 @@
+"""Utilitários compartilhados pelos benchmarks: banco temporário, carga de dados e medição.
+
+Os benchmarks rodam a partir de `backend/`, ex: `python -m benchmarks.bench_disponibilidade`.
+"""
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.database import Base, get_db, get_db_leitura, get_db_async, get_db_leitura_async, criar_engine_async
+from app.models.models import Cabana, Cliente, Reserva
+
+def criar_banco(nome: str = "benchmark.db"):
+    """Cria um SQLite vazio num diretório temporário e devolve (engine, SessionLocal)."""
+    caminho = os.path.join(tempfile.mkdtemp(prefix="cabanas-bench-"), nome)
+    engine = create_engine(f"sqlite:///{caminho}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+def popular(SessionLocal, cabanas: int = 3, anos: int = 10, semente: int = 7) -> int:
+    """Gera `anos` de histórico de estadias sem sobreposição por cabana, terminando no futuro.
+
+    Cerca de 5% das estadias ficam canceladas. Retorna o total de reservas criadas.
+    """
+    sorteio = random.Random(semente)
+    db = SessionLocal()
+    try:
+        for numero in range(1, cabanas + 1):
+            db.add(Cabana(
+                id=numero, nome=f"Cabana {numero}", numero=numero, capacidade=2,
+                preco_base_semana=500.0, preco_base_fds=700.0
+            ))
+        cliente = Cliente(nome="Hóspede Benchmark", telefone="0", email="bench@teste.com")
+        db.add(cliente)
+        db.flush()
+
+        fim_historico = date.today() + timedelta(days=365)
+        linhas = []
+        for numero in range(1, cabanas + 1):
+            dia = fim_historico - timedelta(days=365 * anos)
+            while dia < fim_historico:
+                noites = sorteio.randint(1, 5)
+                linhas.append({
+                    "cliente_id": cliente.id, "cabana_id": numero,
+                    "data_checkin": dia, "data_checkout": dia + timedelta(days=noites),
+                    "valor_total": 600.0 * noites, "origem": sorteio.choice(["local", "airbnb"]),
+                    "status": "cancelada" if sorteio.random() < 0.05 else "confirmada"
+                })
+                dia += timedelta(days=noites + sorteio.randint(0, 2))
+        db.bulk_insert_mappings(Reserva, linhas)
+        db.commit()
+        return len(linhas)
+    finally:
+        db.close()
+
+def sessoes_async(SessionLocal):
+    """async_sessionmaker no mesmo arquivo de `SessionLocal`, para as rotas assíncronas."""
+    # Sem pool e já conectado uma vez: cada chamada do TestClient roda num event
+    # loop próprio, e nem as conexões aiosqlite nem a trava da primeira conexão
+    # do engine podem passar de um loop para outro
+    engine = criar_engine_async(str(SessionLocal.kw["bind"].url), poolclass=NullPool)
+    async def conectar():
+        async with engine.connect():
+            pass
+    asyncio.run(conectar())
+    return async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+def cliente_http(SessionLocal) -> TestClient:
+    """TestClient da API apontando para o banco do benchmark, nos caminhos síncrono e assíncrono."""
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    AsyncSessionLocal = sessoes_async(SessionLocal)
+    async def override_get_db_async():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    # As de leitura também, para não irem a uma réplica de DATABASE_URL_LEITURA
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_db_leitura] = override_get_db
+    app.dependency_overrides[get_db_async] = override_get_db_async
+    app.dependency_overrides[get_db_leitura_async] = override_get_db_async
+    return TestClient(app)
+
+def medir(funcao, repeticoes: int = 200, aquecimento: int = 10) -> dict:
+    for _ in range(aquecimento):
+        funcao()
+    tempos = []
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        funcao()
+        tempos.append((time.perf_counter() - t0) * 1000)
+    total = time.perf_counter() - inicio
+    tempos.sort()
+    return {
+        "media_ms": statistics.fmean(tempos),
+        "p50_ms": tempos[len(tempos) // 2],
+        "p99_ms": tempos[min(len(tempos) - 1, int(len(tempos) * 0.99))],
+        "req_s": repeticoes / total,
+    }
+
+def imprimir(nome: str, resultado: dict):
+    print(
+        f"{nome:<45} média {resultado['media_ms']:7.2f} ms | p50 {resultado['p50_ms']:7.2f} ms"
+        f" | p99 {resultado['p99_ms']:7.2f} ms | {resultado['req_s']:8.1f} req/s"
+    )
@@ -0,0 +1,159 @@
+"""Vazão e p99 das rotas públicas sob carga simultânea: rotas síncronas (threadpool) x assíncronas (AsyncSession).
+
+Cada variante roda num processo uvicorn próprio sobre o mesmo banco; o
+cliente (httpx assíncrono) mantém `concorrencia` requisições em andamento
+por `segundos`, alternando disponibilidade em lote, por cabana e cotações.
+A variante síncrona reproduz as rotas públicas como eram antes do caminho
+assíncrono (`def` com `get_db`).
+
+Uso: python -m benchmarks.bench_async [concorrencia] [segundos]
+"""
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.database import criar_engine, criar_engine_async, get_db_async, get_db_leitura_async
+from app.routers import public
+from app.services import disponibilidade_service as disponibilidade
+from app.services import preco_service
+from ._comum import criar_banco, popular
+
+def app_sincrono(url: str) -> FastAPI:
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=criar_engine(url))
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app = FastAPI()
+
+    @app.get("/api/public/disponibilidade")
+    def disponibilidade_todas_cabanas(inicio: date, fim: date, db: Session = Depends(get_db)):
+        return [
+            {"cabana_id": cabana_id, "nome": nome, "disponivel": conflitos == 0}
+            for cabana_id, nome, conflitos in disponibilidade.disponibilidade_por_cabana(db, inicio, fim)
+        ]
+
+    @app.get("/api/public/disponibilidade/{cabana_id}")
+    def verificar_disponibilidade(cabana_id: int, inicio: date, fim: date, db: Session = Depends(get_db)):
+        return {"disponivel": disponibilidade.cabana_disponivel(db, cabana_id, inicio, fim)}
+
+    @app.get("/api/public/cotacoes")
+    def cotar_todas_cabanas(data_checkin: date, data_checkout: date, adultos: int = 2, criancas: int = 0,
+                            db: Session = Depends(get_db)):
+        return preco_service.cotar_todas_cabanas(db, data_checkin, data_checkout, adultos, criancas)
+
+    return app
+
+def app_assincrono(url: str) -> FastAPI:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    AsyncSessionLocal = async_sessionmaker(criar_engine_async(url), autoflush=False, expire_on_commit=False)
+
+    async def get_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(public.router)
+    app.dependency_overrides[get_db_async] = get_db
+    app.dependency_overrides[get_db_leitura_async] = get_db
+    return app
+
+def _servir(variante: str, url: str, porta: int):
+    import uvicorn
+
+    app = app_sincrono(url) if variante == "sincrono" else app_assincrono(url)
+    uvicorn.run(app, host="127.0.0.1", port=porta, log_level="warning")
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _iniciar_servidor(variante: str, url: str) -> tuple:
+    porta = _porta_livre()
+    processo = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.bench_async", "--servir", variante, url, str(porta)],
+        env={**os.environ, "ICAL_AGENDADOR_ATIVO": "0", "JOBS_ATIVO": "0"}
+    )
+    for _ in range(100):
+        try:
+            with socket.create_connection(("127.0.0.1", porta), timeout=0.1):
+                return processo, f"http://127.0.0.1:{porta}"
+        except OSError:
+            time.sleep(0.1)
+    processo.kill()
+    raise RuntimeError(f"Servidor {variante} não subiu")
+
+async def _carga(base: str, concorrencia: int, segundos: float) -> dict:
+    inicio = date.today() + timedelta(days=30)
+    consultas = itertools.cycle([
+        ("/api/public/disponibilidade", {"inicio": inicio.isoformat(), "fim": (inicio + timedelta(days=3)).isoformat()}),
+        ("/api/public/disponibilidade/1", {"inicio": inicio.isoformat(), "fim": (inicio + timedelta(days=3)).isoformat()}),
+        ("/api/public/cotacoes", {"data_checkin": inicio.isoformat(),
+                                  "data_checkout": (inicio + timedelta(days=2)).isoformat()}),
+    ])
+    tempos, erros = [], 0
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+    async with httpx.AsyncClient(base_url=base, limits=limites, timeout=30) as client:
+        # Aquecimento: caches de tarifário e conexões do pool
+        for _ in range(10):
+            caminho, params = next(consultas)
+            await client.get(caminho, params=params)
+
+        fim = time.monotonic() + segundos
+
+        async def usuario():
+            nonlocal erros
+            while time.monotonic() < fim:
+                caminho, params = next(consultas)
+                t0 = time.perf_counter()
+                resposta = await client.get(caminho, params=params)
+                tempos.append((time.perf_counter() - t0) * 1000)
+                if resposta.status_code != 200:
+                    erros += 1
+
+        await asyncio.gather(*(usuario() for _ in range(concorrencia)))
+
+    tempos.sort()
+    return {
+        "req_s": len(tempos) / segundos,
+        "p50_ms": tempos[len(tempos) // 2],
+        "p99_ms": tempos[min(len(tempos) - 1, int(len(tempos) * 0.99))],
+        "erros": erros,
+    }
+
+def main(concorrencia: int = 16, segundos: float = 10):
+    engine, SessionLocal = criar_banco("async.db")
+    popular(SessionLocal, anos=5)
+    url = str(engine.url)
+    print(f"{concorrencia} requisições simultâneas, {segundos:.0f} s por variante\n")
+    for nome, variante in (("rotas síncronas (def + threadpool)", "sincrono"),
+                           ("rotas assíncronas (AsyncSession)", "assincrono")):
+        processo, base = _iniciar_servidor(variante, url)
+        try:
+            r = asyncio.run(_carga(base, concorrencia, segundos))
+        finally:
+            processo.terminate()
+            processo.wait()
+        print(f"{nome:<38} {r['req_s']:8.1f} req/s | p50 {r['p50_ms']:7.2f} ms | p99 {r['p99_ms']:7.2f} ms"
+              f" | erros {r['erros']}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--servir":
+        _servir(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 16, float(sys.argv[2]) if len(sys.argv) > 2 else 10)
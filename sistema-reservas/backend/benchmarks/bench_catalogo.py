@@ -0,0 +1,25 @@
+"""Latência das listagens de cabanas com o cache de respostas frio (limpo a cada chamada) e quente.
+
+Uso: python -m benchmarks.bench_catalogo [repeticoes]
+"""
+import sys
+from app.services import cache_service
+from ._comum import criar_banco, popular, cliente_http, medir, imprimir
+
+def main(repeticoes: int = 500):
+    _, SessionLocal = criar_banco()
+    popular(SessionLocal, cabanas=12, anos=1)
+    client = cliente_http(SessionLocal)
+
+    for rota in ("/api/public/cabanas", "/api/cabanas/"):
+        def frio():
+            cache_service.limpar_cache()
+            return client.get(rota)
+        imprimir(f"GET {rota} (sem cache)", medir(frio, repeticoes=repeticoes))
+        imprimir(f"GET {rota} (em cache)", medir(lambda: client.get(rota), repeticoes=repeticoes))
+        etag = client.get(rota).headers["etag"]
+        imprimir(f"GET {rota} (If-None-Match, 304)",
+                 medir(lambda: client.get(rota, headers={"If-None-Match": etag}), repeticoes=repeticoes))
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
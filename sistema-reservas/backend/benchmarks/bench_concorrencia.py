@@ -0,0 +1,98 @@
+"""Vazão com leituras e escritas simultâneas: engine sem ajustes x `criar_engine` (WAL, NORMAL, mmap).
+
+Cada thread faz consultas de disponibilidade e, a cada `1/fracao_escritas`
+operações, grava uma reserva com a cabana travada, como o `POST /reservar`.
+
+Uso: python -m benchmarks.bench_concorrencia [threads] [segundos]
+"""
+import itertools
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, criar_engine
+from app.models.models import Reserva
+from app.services import disponibilidade_service as disponibilidade
+from ._comum import popular
+
+def _banco(engine_factory):
+    caminho = os.path.join(tempfile.mkdtemp(prefix="cabanas-bench-"), "concorrencia.db")
+    engine = engine_factory(f"sqlite:///{caminho}")
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    popular(SessionLocal, anos=5)
+    return SessionLocal
+
+def _carga(SessionLocal, threads: int, segundos: float, fracao_escritas: float = 0.1) -> dict:
+    dias = itertools.count()
+    inicio = date.today() + timedelta(days=800)
+    trava = threading.Lock()
+    tempos, erros = [], []
+    fim = time.monotonic() + segundos
+    a_cada = max(1, round(1 / fracao_escritas))
+
+    def trabalhador(numero: int):
+        db = SessionLocal()
+        locais = []
+        try:
+            for operacao in itertools.count():
+                if time.monotonic() >= fim:
+                    break
+                t0 = time.perf_counter()
+                try:
+                    if operacao % a_cada == numero % a_cada:
+                        with trava:
+                            checkin = inicio + timedelta(days=next(dias))
+                        def inserir():
+                            if not disponibilidade.buscar_conflito(db, 1, checkin, checkin + timedelta(days=1)):
+                                db.add(Reserva(cliente_id=1, cabana_id=1, data_checkin=checkin,
+                                               data_checkout=checkin + timedelta(days=1), status="pendente"))
+                        disponibilidade.executar_com_trava(db, 1, inserir)
+                    else:
+                        dia = inicio - timedelta(days=operacao % 365)
+                        disponibilidade.disponibilidade_por_cabana(db, dia, dia + timedelta(days=3))
+                        db.rollback()
+                except Exception as erro:
+                    erros.append(erro)
+                    db.rollback()
+                locais.append((time.perf_counter() - t0) * 1000)
+        finally:
+            db.close()
+            with trava:
+                tempos.extend(locais)
+
+    grupo = [threading.Thread(target=trabalhador, args=(n,)) for n in range(threads)]
+    for thread in grupo:
+        thread.start()
+    for thread in grupo:
+        thread.join()
+
+    tempos.sort()
+    return {
+        "ops_s": len(tempos) / segundos,
+        "p50_ms": tempos[len(tempos) // 2],
+        "p99_ms": tempos[min(len(tempos) - 1, int(len(tempos) * 0.99))],
+        "media_ms": statistics.fmean(tempos),
+        "erros": len(erros),
+    }
+
+def main(threads: int = 8, segundos: float = 10):
+    variantes = [
+        ("engine sem ajustes (rollback journal, FULL)",
+         lambda url: create_engine(url, connect_args={"check_same_thread": False})),
+        ("criar_engine (WAL, NORMAL, mmap, busy_timeout)", criar_engine),
+    ]
+    print(f"{threads} threads, {segundos:.0f} s por variante, 10% de escritas\n")
+    for nome, fabrica in variantes:
+        r = _carga(_banco(fabrica), threads, segundos)
+        print(f"{nome:<48} {r['ops_s']:8.1f} ops/s | p50 {r['p50_ms']:6.2f} ms | p99 {r['p99_ms']:7.2f} ms"
+              f" | erros {r['erros']}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 8, float(sys.argv[2]) if len(sys.argv) > 2 else 10)
@@ -0,0 +1,29 @@
+"""Latência das consultas de disponibilidade com anos de histórico armazenado.
+
+Uso: python -m benchmarks.bench_disponibilidade [anos]
+"""
+import sys
+from datetime import date, timedelta
+from ._comum import criar_banco, popular, cliente_http, medir, imprimir
+
+def main(anos: int = 10):
+    _, SessionLocal = criar_banco()
+    total = popular(SessionLocal, anos=anos)
+    client = cliente_http(SessionLocal)
+    print(f"{total} reservas armazenadas ({anos} anos, 3 cabanas)\n")
+
+    inicio = date.today() + timedelta(days=30)
+    params = {"inicio": inicio.isoformat(), "fim": (inicio + timedelta(days=3)).isoformat()}
+
+    def uma_por_cabana():
+        for cabana_id in (1, 2, 3):
+            client.get(f"/api/public/disponibilidade/{cabana_id}", params=params)
+
+    imprimir("GET /disponibilidade/{id} (1 cabana)",
+             medir(lambda: client.get("/api/public/disponibilidade/1", params=params)))
+    imprimir("GET /disponibilidade/{id} x3 (uma chamada por cabana)", medir(uma_por_cabana))
+    imprimir("GET /disponibilidade (lote, todas)",
+             medir(lambda: client.get("/api/public/disponibilidade", params=params)))
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
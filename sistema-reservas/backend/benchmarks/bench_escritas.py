@@ -0,0 +1,47 @@
+"""Latência dos endpoints de escrita de reservas, que gravam também a trilha de auditoria.
+
+Uso: python -m benchmarks.bench_escritas [repeticoes]
+"""
+import itertools
+import sys
+from datetime import date, timedelta
+from sqlalchemy import event
+from ._comum import criar_banco, popular, cliente_http, medir, imprimir
+
+def main(repeticoes: int = 200):
+    engine, SessionLocal = criar_banco()
+    popular(SessionLocal, anos=1)
+    client = cliente_http(SessionLocal)
+    # Cada commit no SQLite é um fsync: conta quantos cada requisição faz
+    commits = []
+    event.listen(engine, "commit", lambda conn: commits.append(1))
+
+    def medir_escrita(nome, funcao, chamadas_por_repeticao=1):
+        antes = len(commits)
+        resultado = medir(funcao, repeticoes=repeticoes)
+        imprimir(nome, resultado)
+        total = repeticoes + 10 # medir() faz 10 chamadas de aquecimento
+        print(f"{'':<45} {(len(commits) - antes) / total / chamadas_por_repeticao:.1f} commits por requisição")
+
+    # Estadias novas, uma por dia, bem depois do histórico gerado
+    dias = itertools.count()
+    inicio = date.today() + timedelta(days=800)
+    def criar():
+        checkin = inicio + timedelta(days=next(dias))
+        return client.post("/api/reservas/", json={
+            "cliente_id": 1, "cabana_id": 1, "valor_total": 500.0,
+            "data_checkin": checkin.isoformat(), "data_checkout": (checkin + timedelta(days=1)).isoformat()
+        })
+
+    medir_escrita("POST /reservas", criar)
+    reserva_id = criar().json()["id"]
+    medir_escrita("PUT /reservas/{id}",
+                  lambda: client.put(f"/api/reservas/{reserva_id}", json={"observacoes": "benchmark"}))
+    medir_escrita("POST /reservas/{id}/check-in", lambda: client.post(f"/api/reservas/{reserva_id}/check-in"))
+    medir_escrita("POST /reservas/{id}/check-out", lambda: client.post(f"/api/reservas/{reserva_id}/check-out"))
+    # Cada repetição cria e cancela uma reserva
+    medir_escrita("POST /reservas + DELETE /reservas/{id}",
+                  lambda: client.delete(f"/api/reservas/{criar().json()['id']}"), chamadas_por_repeticao=2)
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
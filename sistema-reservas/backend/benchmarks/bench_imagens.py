@@ -0,0 +1,55 @@
+"""Bytes transferidos pelas fotos da landing page (originais x variantes) e tempo para gerar as variantes.
+
+Usa as fotos de `landing-page/public/assets/cabanas` (ou as passadas na linha
+de comando). O tempo compara a geração foto a foto no próprio processo com o
+envio de todas ao pool de processos do `imagens_service`.
+
+Uso: python -m benchmarks.bench_imagens [fotos...]
+"""
+import glob
+import os
+import sys
+import tempfile
+import time
+
+from app.services import imagens_service
+
+PASTA_LANDING = os.path.join(os.path.dirname(__file__), "..", "..", "..", "landing-page", "public", "assets", "cabanas")
+
+def _kb(n: int) -> str:
+    return f"{n / 1024:9.0f} KB"
+
+def main(fotos: list):
+    if not fotos:
+        fotos = sorted(glob.glob(os.path.join(PASTA_LANDING, "*.png")) + glob.glob(os.path.join(PASTA_LANDING, "*.jpg")))
+    dados = [open(foto, "rb").read() for foto in fotos]
+    formatos = imagens_service.formatos_suportados()
+    print(f"{len(fotos)} fotos, formatos: {', '.join(formatos)}, {imagens_service.WORKERS} processos\n")
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        t0 = time.perf_counter()
+        gerados = [imagens_service._gerar_variantes(d, diretorio, formatos) for d in dados]
+        sequencial = time.perf_counter() - t0
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        pool = imagens_service._pool()
+        # Sobe os processos antes de medir (o spawn custa só uma vez por worker)
+        list(pool.map(imagens_service._gerar_variantes, dados[:imagens_service.WORKERS],
+                      [diretorio] * imagens_service.WORKERS, [formatos] * imagens_service.WORKERS))
+        t0 = time.perf_counter()
+        list(pool.map(imagens_service._gerar_variantes, dados, [diretorio] * len(dados), [formatos] * len(dados)))
+        paralelo = time.perf_counter() - t0
+        imagens_service.parar()
+
+        tamanho = lambda nome: os.path.getsize(os.path.join(diretorio, nome))
+        print(f"{'originais':<26}{_kb(sum(map(len, dados)))}")
+        for formato in formatos:
+            for variante in imagens_service.LARGURAS:
+                total = sum(tamanho(g["arquivos"][formato][variante]) for g in gerados)
+                print(f"{formato + ' ' + variante:<26}{_kb(total)}  ({total / sum(map(len, dados)):6.1%})")
+
+    print(f"\ngeração no processo          {sequencial * 1000:9.0f} ms")
+    print(f"geração no pool de processos {paralelo * 1000:9.0f} ms")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,31 @@
+"""Latência do relatório financeiro lido dos resumos mensais, com anos de histórico.
+
+Uso: python -m benchmarks.bench_relatorios [anos]
+"""
+import sys
+from datetime import date
+from app.services import relatorio_service
+from ._comum import criar_banco, popular, cliente_http, medir, imprimir
+
+def main(anos: int = 10):
+    _, SessionLocal = criar_banco()
+    total = popular(SessionLocal, anos=anos)
+    db = SessionLocal()
+    try:
+        linhas = relatorio_service.reconstruir(db)
+    finally:
+        db.close()
+    client = cliente_http(SessionLocal)
+    print(f"{total} reservas armazenadas ({anos} anos, 3 cabanas), {linhas} resumos mensais\n")
+
+    ano = date.today().year
+    imprimir("GET /relatorios (histórico inteiro)",
+             medir(lambda: client.get("/api/reservas/relatorios")))
+    imprimir("GET /relatorios (um ano)",
+             medir(lambda: client.get("/api/reservas/relatorios",
+                                      params={"inicio": f"{ano}-01-01", "fim": f"{ano}-12-31"})))
+    imprimir("POST /relatorios/reconstruir",
+             medir(lambda: client.post("/api/reservas/relatorios/reconstruir"), repeticoes=5, aquecimento=1))
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
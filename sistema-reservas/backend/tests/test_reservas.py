@@ -1,9 +1,12 @@
+import asyncio
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from app.main import app
-from app.database import Base, get_db
+from app.database import Base, get_db, get_db_async
 
 # Configuração de um banco de dados em memória para testes
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -17,12 +20,37 @@ def override_get_db():
     finally:
         db.close()
 
+# As rotas públicas usam o caminho assíncrono, no mesmo arquivo. Sem pool: cada
+# chamada do TestClient roda num event loop próprio, e uma conexão aiosqlite
+# não pode passar de um loop para outro
+engine_async = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(engine_async, autoflush=False, expire_on_commit=False)
+
+async def _conectar_uma_vez():
+    # A primeira conexão do engine roda a inicialização do dialeto sob uma trava
+    # asyncio, presa ao loop de quem conectou; feita aqui, as chamadas simultâneas
+    # do TestClient (cada uma no seu loop) não a disputam
+    async with engine_async.connect():
+        pass
+
+asyncio.run(_conectar_uma_vez())
+
+async def override_get_db_async():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_db_async] = override_get_db_async
 
 client = TestClient(app)
 
 @pytest.fixture(autouse=True)
 def setup_db():
+    from app.services import cache_service, calendar_service, ocupacao_service, tarifario_service
+    cache_service.limpar_cache()
+    ocupacao_service.limpar_cache()
+    tarifario_service.limpar_cache()
+    calendar_service.limpar_cache_ical()
     Base.metadata.create_all(bind=engine)
     # Popular dados iniciais necessários
     db = TestingSessionLocal()
@@ -78,3 +106,1172 @@ def test_conflito_de_reservas():
     )
     assert response.status_code == 400
     assert "Cabana não disponível" in response.json()["detail"]
+
+def test_atualizar_reserva_para_datas_em_conflito():
+    client.post(
+        "/api/reservas/",
+        json={"cliente_id": 1, "cabana_id": 1, "data_checkin": "2026-07-01", "data_checkout": "2026-07-05"}
+    )
+    segunda = client.post(
+        "/api/reservas/",
+        json={"cliente_id": 1, "cabana_id": 1, "data_checkin": "2026-07-10", "data_checkout": "2026-07-12"}
+    ).json()
+
+    # Mover a própria reserva dentro do seu período não é conflito
+    response = client.put(f"/api/reservas/{segunda['id']}", json={"data_checkout": "2026-07-13"})
+    assert response.status_code == 200
+
+    response = client.put(f"/api/reservas/{segunda['id']}", json={"data_checkin": "2026-07-04"})
+    assert response.status_code == 400
+    assert "Cabana não disponível" in response.json()["detail"]
+
+def test_checagem_de_conflito_usa_indice_de_periodo():
+    from datetime import date
+    from sqlalchemy import event
+    from app.services.disponibilidade_service import buscar_conflito
+
+    capturado = []
+    def capturar(conn, cursor, statement, parameters, context, executemany):
+        capturado.append((statement, parameters))
+
+    db = TestingSessionLocal()
+    try:
+        event.listen(engine, "before_cursor_execute", capturar)
+        buscar_conflito(db, 1, date(2026, 8, 1), date(2026, 8, 3))
+        event.remove(engine, "before_cursor_execute", capturar)
+
+        statement, parameters = capturado[-1]
+        plano = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        assert any("ix_reservas_cabana_periodo" in linha[-1] for linha in plano)
+    finally:
+        db.close()
+
+def test_reservas_publicas_simultaneas_nao_se_sobrepoem():
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+    from datetime import date, timedelta
+    from app.models.models import Reserva
+
+    sorteio = random.Random(42)
+    inicio = date(2027, 7, 1)
+    pedidos = []
+    for i in range(300):
+        checkin = inicio + timedelta(days=sorteio.randrange(60))
+        pedidos.append({
+            "nome": f"Hóspede {i}", "telefone": "11999999999", "email": f"hospede{i}@teste.com",
+            "cabana_id": 1,
+            "data_checkin": checkin.isoformat(),
+            "data_checkout": (checkin + timedelta(days=sorteio.randint(1, 4))).isoformat()
+        })
+
+    with ThreadPoolExecutor(max_workers=12) as executor:
+        respostas = list(executor.map(lambda p: client.post("/api/public/reservar", json=p), pedidos))
+
+    codigos = [r.status_code for r in respostas]
+    assert set(codigos) <= {200, 400}
+    assert codigos.count(200) > 0 and codigos.count(400) > 0
+
+    db = TestingSessionLocal()
+    try:
+        reservas = db.query(Reserva).filter(Reserva.cabana_id == 1).order_by(Reserva.data_checkin).all()
+    finally:
+        db.close()
+    assert len(reservas) == codigos.count(200)
+    for anterior, seguinte in zip(reservas, reservas[1:]):
+        assert anterior.data_checkout <= seguinte.data_checkin
+
+def test_ocupacao_em_intervalos_com_etag():
+    from datetime import date, timedelta
+    hoje = date.today()
+    dia = lambda n: (hoje + timedelta(days=n)).isoformat()
+
+    assert client.get("/api/public/ocupacao/1").json() == []
+    for checkin, checkout in [(3, 5), (5, 6), (10, 12)]:
+        client.post("/api/reservas/", json={
+            "cliente_id": 1, "cabana_id": 1, "data_checkin": dia(checkin), "data_checkout": dia(checkout)
+        })
+
+    response = client.get("/api/public/ocupacao/1", params={"formato": "intervalos"})
+    assert response.json() == [{"start": dia(3), "end": dia(6)}, {"start": dia(10), "end": dia(12)}]
+    assert client.get("/api/public/ocupacao/1").json() == [dia(3), dia(4), dia(5), dia(10), dia(11)]
+
+    etag = response.headers["etag"]
+    revalidacao = client.get(
+        "/api/public/ocupacao/1", params={"formato": "intervalos"}, headers={"If-None-Match": etag}
+    )
+    assert revalidacao.status_code == 304
+
+    # Cancelar uma reserva invalida o bitmap e muda o ETag
+    reserva_id = client.get("/api/reservas/", params={"cabana_id": 1, "ordem": "asc"}).json()[-1]["id"]
+    client.delete(f"/api/reservas/{reserva_id}")
+    response = client.get(
+        "/api/public/ocupacao/1", params={"formato": "intervalos"}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.json() == [{"start": dia(3), "end": dia(6)}]
+
+    janela = client.get("/api/public/ocupacao/1", params={"inicio": dia(4), "fim": dia(5)})
+    assert janela.json() == [dia(4)]
+
+    # Limites invertidos são erro; um só limite fora do período padrão não tem noites
+    assert client.get("/api/public/ocupacao/1", params={"inicio": dia(5), "fim": dia(4)}).status_code == 400
+    assert client.get("/api/public/ocupacao/1", params={"inicio": dia(5000)}).json() == []
+    assert client.get("/api/public/ocupacao/1", params={"fim": dia(-5000)}).json() == []
+    assert client.get("/api/public/ocupacao/1", params={"inicio": dia(-3), "fim": dia(4)}).json() == [dia(3)]
+
+def test_disponibilidade_individual_e_em_lote():
+    client.post("/api/reservas/", json={
+        "cliente_id": 1, "cabana_id": 1, "data_checkin": "2026-09-10", "data_checkout": "2026-09-12"
+    })
+    db = TestingSessionLocal()
+    from app.models.models import Cabana
+    db.add(Cabana(id=2, nome="Outra Cabana", numero=102, capacidade=2))
+    db.commit()
+    db.close()
+
+    periodo = {"inicio": "2026-09-11", "fim": "2026-09-13"}
+    assert client.get("/api/public/disponibilidade/1", params=periodo).json() == {"disponivel": False}
+    assert client.get("/api/public/disponibilidade/2", params=periodo).json() == {"disponivel": True}
+    # Check-out no dia do check-in seguinte não é conflito
+    livre = {"inicio": "2026-09-12", "fim": "2026-09-14"}
+    assert client.get("/api/public/disponibilidade/1", params=livre).json() == {"disponivel": True}
+
+    lote = client.get("/api/public/disponibilidade", params=periodo).json()
+    assert [(c["cabana_id"], c["disponivel"]) for c in lote] == [(1, False), (2, True)]
+
+def test_motor_de_preco_confere_com_calculo_noite_a_noite():
+    import random
+    from datetime import date, timedelta
+    from app.models.models import Cabana
+    from app.services.preco_service import calcular_orcamento
+
+    cabana = Cabana(preco_base_semana=490.0, preco_base_fds=690.0, hospedes_inclusos=2, valor_hospede_extra=350.0)
+    sorteio = random.Random(3)
+    for _ in range(200):
+        checkin = date(2026, 1, 1) + timedelta(days=sorteio.randrange(400))
+        checkout = checkin + timedelta(days=sorteio.randint(1, 120))
+        adultos = sorteio.randint(1, 5)
+
+        esperado, dia = 0.0, checkin
+        while dia < checkout:
+            esperado += 690.0 if dia.weekday() in [4, 5] else 490.0
+            esperado += max(0, adultos - 2) * 350.0
+            dia += timedelta(days=1)
+
+        orcamento = calcular_orcamento(cabana, checkin, checkout, adultos, detalhado=True)
+        assert orcamento["total"] == esperado
+        assert orcamento["diarias"] == (checkout - checkin).days
+        assert sum(n["valor"] for n in orcamento["noites"]) == esperado
+
+def test_cotacao_de_todas_as_cabanas():
+    db = TestingSessionLocal()
+    from app.models.models import Cabana
+    cabana = db.get(Cabana, 1)
+    cabana.preco_base_semana, cabana.preco_base_fds = 100.0, 200.0
+    db.add(Cabana(id=2, nome="Hobbit", numero=103, preco_base_semana=300.0, preco_base_fds=400.0,
+                  hospedes_inclusos=2, valor_hospede_extra=50.0))
+    db.commit()
+    db.close()
+
+    # Quinta a domingo: quinta (semana), sexta e sábado (fds)
+    cotacoes = client.get("/api/public/cotacoes", params={
+        "data_checkin": "2026-10-01", "data_checkout": "2026-10-04", "adultos": 3
+    }).json()
+    assert [(c["cabana_id"], c["total"]) for c in cotacoes] == [(1, 500.0), (2, 1250.0)]
+
+    lote = client.post("/api/public/cotacoes", json=[
+        {"cabana_id": 2, "data_checkin": "2026-10-05", "data_checkout": "2026-10-06"},
+        {"cabana_id": 99, "data_checkin": "2026-10-05", "data_checkout": "2026-10-06"},
+    ]).json()
+    assert [c["total"] for c in lote] == [300.0, 0]
+
+def test_tarifario_com_temporada_feriado_e_estadia_minima(monkeypatch):
+    from datetime import date, timedelta
+    db = TestingSessionLocal()
+    from app.models.models import Cabana
+    cabana = db.get(Cabana, 1)
+    cabana.preco_base_semana, cabana.preco_base_fds = 100.0, 200.0
+    db.commit()
+    db.close()
+
+    # Segunda-feira dentro do horizonte do tarifário
+    hoje = date.today()
+    segunda = hoje + timedelta(days=14 - hoje.weekday())
+    dia = lambda n: (segunda + timedelta(days=n)).isoformat()
+    orcar = lambda a, b: client.get("/api/public/calcular-preco", params={
+        "cabana_id": 1, "data_checkin": dia(a), "data_checkout": dia(b)
+    }).json()
+
+    # Segunda a segunda: 5 noites de semana + sexta e sábado
+    assert orcar(0, 7)["total"] == 900.0
+
+    # Orçamento já em cache: a regra nova recompila só o período dela
+    temporada = client.post("/api/tarifas/", json={
+        "cabana_id": 1, "nome": "Alta temporada", "data_inicio": dia(0), "data_fim": dia(7),
+        "preco_semana": 150.0, "preco_fds": 300.0, "estadia_minima": 2
+    }).json()
+    client.post("/api/tarifas/", json={
+        "nome": "Feriado", "tipo": "feriado", "data_inicio": dia(2), "data_fim": dia(3),
+        "preco_semana": 500.0, "prioridade": 10
+    })
+    orcamento = orcar(0, 7)
+    assert orcamento["total"] == 4 * 150.0 + 500.0 + 2 * 300.0
+    assert orcamento["detalhamento"]["valor_fds"] == 600.0
+    assert orcamento["estadia_minima"] == 2
+    # Estadia que passa do período da regra volta ao preço base
+    assert orcar(5, 8)["total"] == 300.0 + 150.0 + 100.0
+
+    reserva = {"nome": "Ana", "telefone": "1", "email": "ana@teste.com", "cabana_id": 1,
+               "data_checkin": dia(0), "data_checkout": dia(1)}
+    response = client.post("/api/public/reservar", json=reserva)
+    assert response.status_code == 400
+    assert "Estadia mínima" in response.json()["detail"]
+
+    client.delete(f"/api/tarifas/{temporada['id']}")
+    assert orcar(0, 7)["total"] == 900.0 - 100.0 + 500.0
+
+    client.put("/api/cabanas/1/precos", params={"preco_semana": 110.0, "preco_fds": 200.0})
+    assert orcar(0, 1)["total"] == 110.0
+
+    # Uma regra alterada enquanto a tabela compila: a tabela (já velha) não fica em cache
+    from app.services import tarifario_service
+    regras_no_periodo = tarifario_service.regras_no_periodo
+    def regras_alteradas_durante(db, cabana_id, inicio, fim):
+        regras = regras_no_periodo(db, cabana_id, inicio, fim)
+        tarifario_service.invalidar(cabana_id)
+        return regras
+    tarifario_service.invalidar(1)
+    monkeypatch.setattr(tarifario_service, "regras_no_periodo", regras_alteradas_durante)
+    assert orcar(0, 1)["total"] == 110.0
+    assert 1 not in tarifario_service._tabelas
+
+    # Uma regra nova recompila o período com consultas feitas fora da trava do cache
+    com_trava = []
+    def regras_registrando_trava(db, cabana_id, inicio, fim):
+        com_trava.append(tarifario_service._trava.locked())
+        return regras_no_periodo(db, cabana_id, inicio, fim)
+    monkeypatch.setattr(tarifario_service, "regras_no_periodo", regras_registrando_trava)
+    orcar(0, 1)
+    tabela = tarifario_service._tabelas[1]
+    client.post("/api/tarifas/", json={"cabana_id": 1, "nome": "Promo", "data_inicio": dia(0), "data_fim": dia(1),
+                                       "preco_semana": 90.0})
+    assert tarifario_service._tabelas[1] is not tabela
+    assert orcar(0, 1)["total"] == 90.0
+    assert com_trava and not any(com_trava)
+
+def test_calendario_com_numero_constante_de_consultas():
+    from sqlalchemy import event
+    from app.models.models import Cliente
+
+    def criar_reservas(quantidade, mes):
+        db = TestingSessionLocal()
+        clientes = [Cliente(nome=f"Cliente {mes}-{i}", telefone="1") for i in range(quantidade)]
+        db.add_all(clientes)
+        db.commit()
+        ids = [c.id for c in clientes]
+        db.close()
+        for i, cliente_id in enumerate(ids):
+            client.post("/api/reservas/", json={
+                "cliente_id": cliente_id, "cabana_id": 1,
+                "data_checkin": f"2027-{mes:02d}-{i + 1:02d}", "data_checkout": f"2027-{mes:02d}-{i + 2:02d}"
+            })
+
+    def contar_consultas(**params):
+        consultas = []
+        contador = lambda *args: consultas.append(1)
+        event.listen(engine, "before_cursor_execute", contador)
+        try:
+            response = client.get("/api/reservas/calendario", params=params)
+        finally:
+            event.remove(engine, "before_cursor_execute", contador)
+        return len(consultas), response.json()
+
+    criar_reservas(3, 1)
+    poucas, eventos = contar_consultas()
+    assert len(eventos) == 3
+    assert eventos[0]["title"] == "Cliente 1-0 - Teste Cabana"
+
+    criar_reservas(20, 2)
+    muitas, eventos = contar_consultas()
+    assert len(eventos) == 23
+    assert muitas == poucas
+
+    _, janela = contar_consultas(start="2027-02-05", end="2027-02-08", cabana_id=1)
+    assert [e["start"] for e in janela] == ["2027-02-05", "2027-02-06", "2027-02-07"]
+
+def _criar_reservas_exportacao():
+    for checkin, checkout, origem in [("2026-03-01", "2026-03-03", "local"), ("2026-04-01", "2026-04-02", "airbnb")]:
+        client.post("/api/reservas/", json={
+            "cliente_id": 1, "cabana_id": 1, "data_checkin": checkin, "data_checkout": checkout,
+            "valor_total": 100.0, "origem": origem
+        })
+
+def test_exportacao_csv_em_lotes_com_filtros(monkeypatch):
+    import csv
+    import gzip
+    import io
+    from app.services import exportacao_service
+
+    # Lotes pequenos para exercitar várias escritas na resposta
+    monkeypatch.setattr(exportacao_service, "TAMANHO_LOTE", 1)
+    _criar_reservas_exportacao()
+
+    linhas = list(csv.reader(io.StringIO(client.get("/api/reservas/export").text)))
+    assert linhas[0][0] == "ID"
+    assert [l[4] for l in linhas[1:]] == ["2026-03-01", "2026-04-01"]
+    assert linhas[1][1] == "Cliente Teste"
+
+    filtrado = client.get("/api/reservas/export", params={"origem": "airbnb", "inicio": "2026-03-15"})
+    assert len(filtrado.text.strip().splitlines()) == 2
+
+    compactado = client.get("/api/reservas/export", params={"formato": "csv.gz"})
+    assert compactado.headers["content-type"] == "application/gzip"
+    assert gzip.decompress(compactado.content).decode() == "\r\n".join(",".join(l) for l in linhas) + "\r\n"
+
+def test_exportacao_parquet():
+    pq = pytest.importorskip("pyarrow.parquet")
+    import io
+    _criar_reservas_exportacao()
+
+    response = client.get("/api/reservas/export", params={"formato": "parquet"})
+    tabela = pq.read_table(io.BytesIO(response.content))
+    assert tabela.column("origem").to_pylist() == ["local", "airbnb"]
+
+def test_listagem_paginada_por_cursor_com_projecao_e_expansao():
+    from sqlalchemy import event
+
+    for dia in range(1, 8):
+        client.post("/api/reservas/", json={
+            "cliente_id": 1, "cabana_id": 1,
+            "data_checkin": f"2027-03-{dia:02d}", "data_checkout": f"2027-03-{dia + 1:02d}"
+        })
+
+    paginas, cursor = [], None
+    while True:
+        params = {"limit": 3, "fields": "id,data_checkin"}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/reservas/", params=params)
+        paginas.append(response.json())
+        cursor = response.headers.get("x-proximo-cursor")
+        if not cursor:
+            break
+
+    assert [len(p) for p in paginas] == [3, 3, 1]
+    datas = [r["data_checkin"] for p in paginas for r in p]
+    assert datas == sorted(datas, reverse=True) and len(set(datas)) == 7
+    assert set(paginas[0][0]) == {"id", "data_checkin"}
+
+    # Sem limit nem cursor: todas as reservas, como antes da paginação
+    todas = client.get("/api/reservas/", params={"ordem": "asc"})
+    assert len(todas.json()) == 7 and "x-proximo-cursor" not in todas.headers
+    proximas = client.get("/api/reservas/", params={"desde": "2027-03-05", "ordem": "asc", "limit": 2}).json()
+    assert [r["data_checkin"] for r in proximas] == ["2027-03-05", "2027-03-06"]
+
+    consultas = []
+    contador = lambda *args: consultas.append(1)
+    event.listen(engine, "before_cursor_execute", contador)
+    try:
+        expandida = client.get("/api/reservas/", params={"expand": "cliente,cabana"}).json()
+    finally:
+        event.remove(engine, "before_cursor_execute", contador)
+    # Página + uma consulta por relacionamento expandido
+    assert len(consultas) == 3
+    assert expandida[0]["cliente"]["nome"] == "Cliente Teste"
+    assert expandida[0]["cabana"]["nome"] == "Teste Cabana"
+
+    assert "cliente" not in client.get("/api/reservas/").json()[0]
+    assert client.get("/api/reservas/", params={"fields": "senha"}).status_code == 400
+
+def test_relatorios_resumos_incrementais_batem_com_reconstrucao():
+    base = {"cliente_id": 1, "cabana_id": 1, "forma_pagamento": "Pix"}
+    # Estadia que atravessa a virada de mês: 2 noites em janeiro, 2 em fevereiro
+    r1 = client.post("/api/reservas/", json={**base, "data_checkin": "2027-01-30", "data_checkout": "2027-02-03",
+                                             "valor_total": 400.0, "status": "confirmada"}).json()
+    r2 = client.post("/api/reservas/", json={**base, "data_checkin": "2027-02-10", "data_checkout": "2027-02-12",
+                                             "valor_total": 300.0, "status": "confirmada"}).json()
+    client.post("/api/reservas/", json={**base, "data_checkin": "2027-03-01", "data_checkout": "2027-03-02",
+                                        "valor_total": 999.0, "status": "pendente"})
+
+    dados = client.get("/api/reservas/relatorios").json()
+    assert dados["mensal"] == [{"mes": 1, "ano": 2027, "total": 400.0}, {"mes": 2, "ano": 2027, "total": 300.0}]
+    assert dados["por_cabana"] == [{"cabana_id": 1, "reservas": 2, "faturamento": 700.0}]
+    fevereiro = [m for m in dados["metricas"] if m["mes"] == 2][0]
+    assert fevereiro["noites_ocupadas"] == 4
+    assert fevereiro["taxa_ocupacao"] == pytest.approx(4 / 28)
+    assert fevereiro["adr"] == pytest.approx((200.0 + 300.0) / 4)
+    assert fevereiro["revpar"] == pytest.approx(500.0 / 28)
+
+    # Remarcação para outro mês e cancelamento refletem na hora
+    client.put(f"/api/reservas/{r1['id']}", json={"data_checkin": "2027-04-01", "data_checkout": "2027-04-03"})
+    client.put(f"/api/reservas/{r2['id']}", json={"status": "cancelada"})
+    incremental = client.get("/api/reservas/relatorios").json()
+    assert incremental["mensal"] == [{"mes": 4, "ano": 2027, "total": 400.0}]
+
+    assert client.post("/api/reservas/relatorios/reconstruir").json() == {"linhas": 1}
+    assert client.get("/api/reservas/relatorios").json() == incremental
+
+    filtrado = client.get("/api/reservas/relatorios", params={"inicio": "2027-01-01", "fim": "2027-03-31"}).json()
+    assert filtrado["mensal"] == [] and filtrado["metricas"] == []
+
+def _servidor_ical(feeds):
+    """Servidor HTTP local com um .ics por caminho, ETag e registro das requisições."""
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    estado = {"requisicoes": [], "em_andamento": 0, "pico": 0}
+    trava = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            with trava:
+                estado["requisicoes"].append((self.path, self.headers.get("If-None-Match")))
+                estado["em_andamento"] += 1
+                estado["pico"] = max(estado["pico"], estado["em_andamento"])
+            time.sleep(0.2)
+            corpo = feeds.get(self.path)
+            etag = f'"{hash(corpo)}"'
+            if corpo is None:
+                self.send_response(404)
+                self.end_headers()
+            elif self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+            else:
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+            with trava:
+                estado["em_andamento"] -= 1
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, estado
+
+def _feed_ics(*estadias):
+    """Feed no formato do Airbnb; a estadia pode trazer o código de confirmação como 4º item."""
+    eventos = "".join(
+        f"BEGIN:VEVENT\r\nUID:{uid}@airbnb.com\r\nDTSTART;VALUE=DATE:{inicio}\r\nDTEND;VALUE=DATE:{fim}\r\n"
+        + (f"DESCRIPTION:Reservation URL: https://www.airbnb.com/hosting/reservations/details/{codigo[0]}\r\n"
+           if codigo else "")
+        + "SUMMARY:Reserved\r\nEND:VEVENT\r\n"
+        for uid, inicio, fim, *codigo in estadias
+    )
+    return f"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//Airbnb//EN\r\n{eventos}END:VCALENDAR\r\n".encode()
+
+def _resultado_do_job(resposta):
+    """Executa a fila de jobs (no servidor, os workers do lifespan) e retorna o resultado do job da resposta."""
+    from app.services import jobs_service
+    assert resposta.status_code == 202
+    db = TestingSessionLocal()
+    jobs_service.executar_pendentes(db)
+    db.close()
+    job = client.get(f"/api/jobs/{resposta.json()['job_id']}").json()
+    assert (job["status"], job["progresso"], job["erro"]) == ("concluido", 100, None)
+    return job["resultado"]
+
+def test_sync_de_todas_as_cabanas_em_paralelo_com_get_condicional():
+    from app.models.models import Cabana, Reserva
+    feeds = {f"/{n}.ics": _feed_ics((f"a{n}", f"202712{n:02d}", f"202712{n + 2:02d}")) for n in (1, 2, 3)}
+    servidor, estado = _servidor_ical(feeds)
+    try:
+        db = TestingSessionLocal()
+        url = f"http://127.0.0.1:{servidor.server_address[1]}"
+        db.get(Cabana, 1).airbnb_ical_url = f"{url}/1.ics"
+        db.add_all([
+            Cabana(id=2, nome="Dois", numero=102, capacidade=2, airbnb_ical_url=f"{url}/2.ics"),
+            Cabana(id=3, nome="Tres", numero=103, capacidade=2, airbnb_ical_url=f"{url}/3.ics"),
+        ])
+        db.commit()
+
+        primeira = _resultado_do_job(client.post("/calendar/sync"))
+        assert [c["status"] for c in primeira["cabanas"]] == ["atualizado"] * 3
+        assert primeira["novas_reservas"] == 3
+        assert estado["pico"] > 1 # downloads simultâneos
+
+        segunda = _resultado_do_job(client.post("/calendar/sync"))
+        assert [c["status"] for c in segunda["cabanas"]] == ["nao_modificado"] * 3
+        assert all(etag for _, etag in estado["requisicoes"][3:])
+        assert db.query(Reserva).filter(Reserva.origem == "airbnb").count() == 3
+
+        # Endpoint de uma cabana continua com o mesmo resultado
+        feeds["/1.ics"] = _feed_ics(("a1", "20271201", "20271203"), ("b1", "20271220", "20271222"))
+        resposta = _resultado_do_job(client.post("/calendar/sync/1"))
+        assert (resposta["novas_reservas"], resposta["removidas"]) == (1, 0)
+        db.close()
+    finally:
+        servidor.shutdown()
+
+def test_importacao_ical_por_diferenca_em_consultas_constantes():
+    from datetime import date, timedelta
+    from sqlalchemy import event
+    from app.models.models import Reserva
+    from app.services.calendar_service import aplicar_diferenca, ler_estadias
+
+    origem = hoje = date(2027, 1, 1)
+    def feed(n, inicio=0):
+        return _feed_ics(*[
+            (f"e{i}", (origem + timedelta(days=3 * i)).strftime("%Y%m%d"),
+             (origem + timedelta(days=3 * i + 2)).strftime("%Y%m%d"))
+            for i in range(inicio, inicio + n)
+        ])
+
+    def importar(conteudo):
+        db = TestingSessionLocal()
+        consultas = []
+        contar = lambda *args: consultas.append(args[2])
+        event.listen(engine, "before_cursor_execute", contar)
+        try:
+            relatorio = aplicar_diferenca(db, 1, ler_estadias(conteudo), hoje=hoje)
+        finally:
+            event.remove(engine, "before_cursor_execute", contar)
+        db.commit()
+        db.close()
+        return relatorio, len(consultas)
+
+    importar(feed(10)) # cria o cliente "Airbnb Import"
+    pequeno, consultas_pequeno = importar(feed(30))
+    assert (len(pequeno["adicionadas"]), len(pequeno["inalteradas"])) == (20, 10)
+    grande, consultas_grande = importar(feed(300))
+    assert (len(grande["adicionadas"]), len(grande["inalteradas"])) == (270, 30)
+    assert consultas_grande == consultas_pequeno
+
+    # As 10 primeiras estadias somem do feed: as futuras são canceladas, as já passadas ficam
+    hoje = date(2027, 1, 16) # estadias 0 a 4 já começaram
+    sem_as_primeiras, _ = importar(feed(290, inicio=10))
+    assert len(sem_as_primeiras["removidas"]) == 5
+    assert sem_as_primeiras["adicionadas"] == [] and len(sem_as_primeiras["inalteradas"]) == 290
+
+    db = TestingSessionLocal()
+    canceladas = db.query(Reserva).filter(Reserva.origem == "airbnb", Reserva.status == "cancelada").count()
+    ativas = db.query(Reserva).filter(Reserva.origem == "airbnb", Reserva.status == "confirmada").count()
+    db.close()
+    assert (canceladas, ativas) == (5, 295)
+
+    # A remoção libera as datas na disponibilidade
+    livre = client.get("/api/public/disponibilidade/1", params={"inicio": "2027-01-19", "fim": "2027-01-20"}).json()
+    assert livre["disponivel"] is True
+
+def test_agendador_com_trava_unica_e_espera_exponencial():
+    from datetime import datetime, timedelta
+    from app.models.models import Cabana, FeedIcal
+    from app.services import agendador_service
+    from app.services.calendar_service import cabanas_pendentes, SYNC_INTERVALO_SEGUNDOS, ESPERA_FALHA_SEGUNDOS
+
+    servidor, _ = _servidor_ical({"/1.ics": _feed_ics(("a1", "20271201", "20271203"))})
+    try:
+        url = f"http://127.0.0.1:{servidor.server_address[1]}"
+        db = TestingSessionLocal()
+        db.get(Cabana, 1).airbnb_ical_url = f"{url}/1.ics"
+        db.add(Cabana(id=2, nome="Dois", numero=102, capacidade=2, airbnb_ical_url=f"{url}/sumiu.ics"))
+        db.commit()
+
+        nome = agendador_service.NOME_TRAVA
+        assert agendador_service.adquirir_trava(db, nome, "worker-a", 60)
+        assert not agendador_service.adquirir_trava(db, nome, "worker-b", 60)
+        assert agendador_service.adquirir_trava(db, nome, "worker-a", 60) # renovação
+        agendador_service.liberar_trava(db, nome, "worker-b") # não é o dono: nada muda
+        assert not agendador_service.adquirir_trava(db, nome, "worker-b", 60)
+
+        assert cabanas_pendentes(db) == [1, 2]
+        rodada = agendador_service.executar_rodada(db)
+        assert (rodada["cabanas"], rodada["erros"]) == (2, 1)
+
+        agora = datetime.now()
+        ok, falha = db.query(FeedIcal).order_by(FeedIcal.cabana_id).all()
+        assert (ok.status, ok.falhas_consecutivas) == ("atualizado", 0)
+        assert timedelta(seconds=SYNC_INTERVALO_SEGUNDOS * 0.85) < ok.proxima_sincronizacao - agora
+        assert (falha.status, falha.falhas_consecutivas) == ("erro", 1)
+        assert falha.proxima_sincronizacao - agora < timedelta(seconds=ESPERA_FALHA_SEGUNDOS * 1.15)
+        assert cabanas_pendentes(db) == []
+
+        # Falha seguida: a espera dobra
+        falha.proxima_sincronizacao = agora
+        db.commit()
+        agendador_service.executar_rodada(db)
+        db.refresh(falha)
+        assert falha.falhas_consecutivas == 2
+        assert falha.proxima_sincronizacao - datetime.now() > timedelta(seconds=ESPERA_FALHA_SEGUNDOS * 2 * 0.85)
+
+        status = client.get("/calendar/sync/status").json()
+        assert status["agendador"]["lider"] == "worker-a"
+        assert status["agendador"]["ultima_execucao_em"] is not None
+        assert [(f["cabana_id"], f["status"]) for f in status["feeds"]] == [(1, "atualizado"), (2, "erro")]
+        db.close()
+    finally:
+        servidor.shutdown()
+
+def test_ics_exportado_em_cache_com_get_condicional(monkeypatch):
+    from datetime import date, timedelta
+    from sqlalchemy import event
+    from app.services import calendar_service
+
+    base = {"cliente_id": 1, "cabana_id": 1, "forma_pagamento": "Pix", "valor_total": 100.0}
+    antiga = date.today() - timedelta(days=400)
+    client.post("/api/reservas/", json={**base, "data_checkin": antiga.isoformat(),
+                                        "data_checkout": (antiga + timedelta(days=2)).isoformat()})
+
+    primeira = client.get("/calendar/1.ics")
+    assert primeira.status_code == 200
+    assert b"Cliente Teste" in primeira.content
+    etag, modificado = primeira.headers["etag"], primeira.headers["last-modified"]
+
+    consultas = []
+    contar = lambda *args: consultas.append(args[2])
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        assert client.get("/calendar/1.ics", headers={"If-None-Match": etag}).status_code == 304
+        assert client.get("/calendar/1.ics", headers={"If-Modified-Since": modificado}).status_code == 304
+        assert client.get("/calendar/1.ics").content == primeira.content
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+    assert consultas == []
+
+    # Nova reserva da cabana invalida o cache
+    futura = date.today() + timedelta(days=10)
+    nova = client.post("/api/reservas/", json={**base, "data_checkin": futura.isoformat(),
+                                               "data_checkout": (futura + timedelta(days=2)).isoformat()}).json()
+    atualizada = client.get("/calendar/1.ics", headers={"If-None-Match": etag})
+    assert atualizada.status_code == 200 and atualizada.headers["etag"] != etag
+    assert f"reserva-{nova['id']}@".encode() in atualizada.content
+
+    # Horizonte de estadias passadas
+    monkeypatch.setattr(calendar_service, "EXPORT_DIAS_PASSADOS", 30)
+    calendar_service.limpar_cache_ical()
+    recortado = client.get("/calendar/1.ics").content
+    assert recortado.count(b"BEGIN:VEVENT") == 1
+    assert client.get("/calendar/99.ics").status_code == 404
+
+def _csv_airbnb(linhas, encoding="utf-8"):
+    cabecalho = "Código de confirmação,Status,Nome do hóspede,Entrar em contato,Data de início,Data de término,Anúncio,Ganhos\n"
+    return (cabecalho + "".join(",".join(linha) + "\n" for linha in linhas)).encode(encoding)
+
+def test_importacao_csv_airbnb_em_lote_com_relatorio_de_erros(monkeypatch, tmp_path):
+    import io
+    from datetime import date, timedelta
+    from sqlalchemy import event
+    from app.models.models import Cliente, Reserva
+    from app.services import jobs_service
+    from app.services.airbnb_csv_service import ler_linhas, process_airbnb_csv
+    monkeypatch.setattr(jobs_service, "DIRETORIO_UPLOADS", str(tmp_path))
+
+    # Decodificação aos pedaços, inclusive com caractere multibyte cortado entre dois pedaços
+    texto = "Anúncio,José\r\nção,\"linha\nquebrada\"\n"
+    assert "".join(ler_linhas(io.BytesIO(texto.encode()), tamanho_pedaco=3)) == texto
+    assert "".join(ler_linhas(io.BytesIO(texto.encode("latin-1")), tamanho_pedaco=3)) == texto
+
+    db = TestingSessionLocal()
+    db.add(Reserva(cliente_id=1, cabana_id=1, data_checkin=date(2027, 3, 1), data_checkout=date(2027, 3, 4),
+                   status="confirmada", origem="airbnb", valor_total=0.0))
+    db.commit()
+
+    arquivo = _csv_airbnb([
+        ["HMAAA1", "Confirmada", "Maria Souza", "+55 11 9999", "01/03/2027", "04/03/2027", "Cabana na Mata", '"R$1.200,50"'],
+        ["HMAAA2", "Confirmada", "João Lima", "", "10/03/2027", "12/03/2027", "Cabana Hobbit", "R$800,00"],
+        ["HMAAA3", "Confirmada", "Ana", "", "31/02/2027", "02/03/2027", "Cabana Hobbit", ""],
+        ["HMAAA4", "Confirmada", "Pedro", "", "20/03/2027", "22/03/2027", "Outro anúncio", ""],
+        ["HMAAA5", "Cancelada", "Paula", "", "20/04/2027", "22/04/2027", "Cabana Hobbit", ""],
+    ], encoding="latin-1")
+    resposta = client.post("/calendar/upload-csv", files={"file": ("reservations.csv", arquivo, "text/csv")})
+    stats = _resultado_do_job(resposta)
+    assert list(tmp_path.iterdir()) == [] # o arquivo salvo some quando a importação termina
+    assert (stats["atualizados"], stats["criados"], stats["ignorados"], stats["erros"]) == (2, 1, 1, 1)
+    assert stats["erros_linhas"][0]["linha"] == 4 and stats["erros_linhas"][0]["codigo"] == "HMAAA3"
+
+    db.expire_all()
+    existente = db.query(Reserva).filter(Reserva.data_checkin == date(2027, 3, 1)).one()
+    assert (existente.cliente.nome, existente.valor_total, existente.pago_total) == ("Maria Souza", 1200.5, True)
+    nova = db.query(Reserva).filter(Reserva.data_checkin == date(2027, 3, 10)).one()
+    assert (nova.cabana_id, nova.cliente.nome, nova.valor_total) == (3, "João Lima", 800.0)
+
+    # Número de consultas não cresce com o tamanho do arquivo
+    def importar(n, inicio):
+        linhas = [[f"HMX{i}", "Confirmada", f"Hóspede {i}", "", "01/01/2028", "03/01/2028", "Cabana Hobbit", ""]
+                  for i in range(inicio, inicio + n)]
+        for i, linha in enumerate(linhas):
+            dia = date(2028, 1, 1) + timedelta(days=3 * (inicio + i))
+            linha[4], linha[5] = dia.strftime("%d/%m/%Y"), (dia + timedelta(days=2)).strftime("%d/%m/%Y")
+        # Conta só a importação; o commit ainda atualiza os resumos financeiros dos meses tocados
+        consultas, importando = [], [True]
+        contar = lambda *args: importando[0] and consultas.append(args[2])
+        sessao = TestingSessionLocal()
+        commit = sessao.commit
+        sessao.commit = lambda: (importando.__setitem__(0, False), commit())
+        event.listen(engine, "before_cursor_execute", contar)
+        try:
+            stats = process_airbnb_csv(sessao, io.BytesIO(_csv_airbnb(linhas)))
+        finally:
+            event.remove(engine, "before_cursor_execute", contar)
+            sessao.close()
+        assert stats["criados"] == n
+        return len(consultas)
+
+    assert importar(20, 0) == importar(200, 20)
+    assert db.query(Cliente).filter(Cliente.nome.like("Hóspede %")).count() == 220
+    db.close()
+
+def test_reimportacao_idempotente_pelo_codigo_de_confirmacao():
+    import io
+    from datetime import date
+    from sqlalchemy import event
+    from app.models.models import Cabana, Reserva
+    from app.services.airbnb_csv_service import process_airbnb_csv
+    from app.services.calendar_service import aplicar_diferenca, ler_estadias
+
+    db = TestingSessionLocal()
+    db.add(Cabana(id=3, nome="Cabana Hobbit", numero=103, capacidade=2))
+    # Estadia de outra cabana com as mesmas datas: não pode receber o hóspede
+    db.add(Reserva(cliente_id=1, cabana_id=1, data_checkin=date(2027, 5, 1), data_checkout=date(2027, 5, 3),
+                   status="confirmada", origem="airbnb", valor_total=0.0))
+    db.commit()
+
+    arquivo = _csv_airbnb([
+        ["HMB1", "Confirmada", "Maria", "", "01/05/2027", "03/05/2027", "Cabana Hobbit", "R$500,00"],
+        ["HMB2", "Confirmada", "João", "", "10/05/2027", "12/05/2027", "Cabana Hobbit", "R$300,00"],
+    ])
+    stats = process_airbnb_csv(db, io.BytesIO(arquivo))
+    assert (stats["criados"], stats["inalterados"]) == (2, 0)
+    db.expire_all()
+    assert db.query(Reserva).filter(Reserva.cabana_id == 1).one().cliente_id == 1
+
+    # Reenviar o mesmo arquivo não grava nada
+    escritas = []
+    contar = lambda conn, cursor, statement, *args: statement.startswith(("INSERT", "UPDATE")) and escritas.append(statement)
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        stats = process_airbnb_csv(db, io.BytesIO(arquivo))
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+    assert (stats["criados"], stats["atualizados"], stats["inalterados"]) == (0, 0, 2)
+    assert escritas == []
+
+    # O feed iCal casa pelo mesmo código: remarcação atualiza as datas em vez de criar outra estadia
+    feed = ler_estadias(_feed_ics(("x1", "20270501", "20270503", "HMB1"), ("x2", "20270511", "20270513", "HMB2")))
+    relatorio = aplicar_diferenca(db, 3, feed, hoje=date(2027, 1, 1))
+    db.commit()
+    assert relatorio["adicionadas"] == [] and relatorio["removidas"] == []
+    assert relatorio["alteradas"] == [{"data_checkin": date(2027, 5, 11), "data_checkout": date(2027, 5, 13)}]
+    db.expire_all()
+    remarcada = db.query(Reserva).filter(Reserva.codigo_externo == "HMB2").one()
+    assert (remarcada.data_checkin, remarcada.cliente.nome, remarcada.valor_total) == (date(2027, 5, 11), "João", 300.0)
+    assert db.query(Reserva).filter(Reserva.cabana_id == 3).count() == 2
+
+    # Evento sem o código na descrição: a estadia entra pelo UID e o CSV a encontra pelas datas
+    sem_descricao = [("x1", "20270501", "20270503", "HMB1"), ("x2", "20270511", "20270513", "HMB2"),
+                     ("x3", "20270601", "20270604")]
+    assert aplicar_diferenca(db, 3, ler_estadias(_feed_ics(*sem_descricao)), hoje=date(2027, 1, 1))["adicionadas"] == [
+        {"data_checkin": date(2027, 6, 1), "data_checkout": date(2027, 6, 4)}
+    ]
+    db.commit()
+    arquivo = _csv_airbnb([["HMB3", "Confirmada", "Rita", "", "01/06/2027", "04/06/2027", "Cabana Hobbit", "R$900,00"]])
+    for _ in range(2):
+        stats = process_airbnb_csv(db, io.BytesIO(arquivo))
+        assert stats["criados"] == 0
+    db.expire_all()
+    estadia = db.query(Reserva).filter(Reserva.cabana_id == 3, Reserva.data_checkin == date(2027, 6, 1)).one()
+    assert (estadia.codigo_externo, estadia.cliente.nome, estadia.valor_total) == ("HMB3", "Rita", 900.0)
+    # A próxima sincronização (ainda só com o UID) não duplica nem cancela a estadia, que mantém o código
+    relatorio = aplicar_diferenca(db, 3, ler_estadias(_feed_ics(*sem_descricao)), hoje=date(2027, 1, 1))
+    db.commit()
+    assert relatorio["adicionadas"] == [] and relatorio["removidas"] == []
+    db.expire_all()
+    assert db.query(Reserva).filter(Reserva.cabana_id == 3, Reserva.status != "cancelada").count() == 3
+    assert db.get(Reserva, estadia.id).codigo_externo == "HMB3"
+    db.close()
+
+def test_fila_de_jobs_retoma_job_de_worker_que_caiu(monkeypatch, tmp_path):
+    import os
+    from datetime import datetime, timedelta
+    from app.models.models import Job
+    from app.services import airbnb_csv_service, jobs_service
+    monkeypatch.setattr(jobs_service, "DIRETORIO_UPLOADS", str(tmp_path))
+    monkeypatch.setattr(airbnb_csv_service, "TAMANHO_LOTE", 2)
+
+    linhas = [[f"HMJ{i}", "Confirmada", f"Hóspede {i}", "", f"{i + 1:02d}/06/2027", f"{i + 2:02d}/06/2027", "Cabana Hobbit", ""]
+              for i in range(0, 10, 2)]
+    resposta = client.post("/calendar/upload-csv", files={"file": ("reservations.csv", _csv_airbnb(linhas), "text/csv")})
+    assert resposta.status_code == 202
+    job_id = resposta.json()["job_id"]
+    assert client.get(f"/api/jobs/{job_id}").json()["status"] == "pendente"
+    assert len(list(tmp_path.iterdir())) == 1
+
+    db = TestingSessionLocal()
+    # Um worker pega o job e cai antes de terminar: ninguém mais o pega até o prazo vencer
+    assert jobs_service.reservar(db, "worker-a").id == job_id
+    assert jobs_service.reservar(db, "worker-b") is None
+    db.query(Job).filter(Job.id == job_id).update({"expira_em": datetime.now() - timedelta(seconds=1)})
+    db.commit()
+
+    progressos = []
+    registrar = jobs_service.registrar_progresso
+    monkeypatch.setattr(airbnb_csv_service, "registrar_progresso",
+                        lambda db, job, fracao: (progressos.append(fracao), registrar(db, job, fracao)))
+    assert jobs_service.executar_pendentes(db, "worker-b") == 1
+    job = client.get(f"/api/jobs/{job_id}").json()
+    assert (job["status"], job["tentativas"], job["resultado"]["criados"]) == ("concluido", 2, 5)
+    # Um progresso por lote intermediário (fração do arquivo já lida)
+    assert len(progressos) == 2 and 0 < progressos[0] <= progressos[1] <= 1
+    assert not os.listdir(tmp_path)
+
+    # Job que falha, ou abandonado após MAX_TENTATIVAS quedas do worker, também apaga o arquivo
+    def falhar(*args, **kwargs):
+        raise ValueError("CSV ilegível")
+    monkeypatch.setattr(airbnb_csv_service, "process_airbnb_csv", falhar)
+    for tentativas in (0, jobs_service.MAX_TENTATIVAS):
+        resposta = client.post("/calendar/upload-csv", files={"file": ("reservations.csv", _csv_airbnb(linhas), "text/csv")})
+        job_id = resposta.json()["job_id"]
+        db.query(Job).filter(Job.id == job_id).update({"tentativas": tentativas})
+        db.commit()
+        assert len(os.listdir(tmp_path)) == 1
+        assert jobs_service.executar_pendentes(db, "worker-c") == 1
+        assert client.get(f"/api/jobs/{job_id}").json()["status"] == "erro"
+        assert not os.listdir(tmp_path)
+    db.close()
+
+    # Cabana sem URL é recusada na hora; job inexistente dá 404
+    assert client.post("/calendar/sync/1").status_code == 400
+    assert client.get("/api/jobs/999").status_code == 404
+
+def test_auditoria_na_mesma_transacao_com_usuario_do_token():
+    from sqlalchemy import event
+    from app.utils.auth import create_access_token
+
+    cabecalho = {"Authorization": f"Bearer {create_access_token({'sub': 'maria'})}"}
+    base = {"cliente_id": 1, "cabana_id": 1, "forma_pagamento": "Pix"}
+    reserva = client.post("/api/reservas/", json={**base, "data_checkin": "2027-09-01", "data_checkout": "2027-09-03"},
+                          headers=cabecalho).json()
+    client.post("/api/reservas/", json={**base, "data_checkin": "2027-09-10", "data_checkout": "2027-09-12"})
+
+    # Uma escrita, um commit: a entrada de auditoria vai junto com a alteração
+    commits = []
+    contar = lambda conn: commits.append(1)
+    event.listen(engine, "commit", contar)
+    try:
+        assert client.post(f"/api/reservas/{reserva['id']}/check-in", headers=cabecalho).status_code == 200
+    finally:
+        event.remove(engine, "commit", contar)
+    assert len(commits) == 1
+
+    # Alteração recusada não deixa rastro; token inválido fica como anônimo
+    conflito = client.put(f"/api/reservas/{reserva['id']}", json={"data_checkout": "2027-09-11"}, headers=cabecalho)
+    assert conflito.status_code == 400
+    client.delete(f"/api/reservas/{reserva['id']}", headers={"Authorization": "Bearer invalido"})
+
+    logs = client.get(f"/api/reservas/{reserva['id']}/logs").json()
+    assert sorted((log["acao"], log["usuario"]) for log in logs) == [
+        ("Check-in realizado", "maria"), ("Criação de Reserva", "maria"), ("Reserva cancelada", "anônimo")
+    ]
+
+def test_auditoria_arquivada_com_paginacao_sobre_ativas_e_arquivadas():
+    from datetime import datetime, timedelta
+    from sqlalchemy import text
+    from app.models.models import AuditLog, AuditLogArquivo
+
+    reserva = client.post("/api/reservas/", json={
+        "cliente_id": 1, "cabana_id": 1, "data_checkin": "2027-10-01", "data_checkout": "2027-10-03"
+    }).json()
+    client.put(f"/api/reservas/{reserva['id']}", json={"data_checkout": "2027-10-04", "observacoes": "late"})
+    atualizacao = client.get(f"/api/reservas/{reserva['id']}/logs").json()[0]
+    assert atualizacao["detalhes"] == {"data_checkout": "2027-10-04", "observacoes": "late"}
+
+    # Histórico antigo, de antes da retenção
+    db = TestingSessionLocal()
+    antigo = datetime.now() - timedelta(days=800)
+    db.query(AuditLog).delete()
+    db.add_all([AuditLog(reserva_id=reserva["id"], usuario="admin", acao=f"Antiga {n}", created_at=antigo + timedelta(hours=n))
+                for n in range(5)])
+    db.commit()
+    client.post(f"/api/reservas/{reserva['id']}/check-in")
+    client.post(f"/api/reservas/{reserva['id']}/check-out")
+
+    assert _resultado_do_job(client.post("/api/auditoria/arquivar")) == {"arquivadas": 5}
+    assert (db.query(AuditLog).count(), db.query(AuditLogArquivo).count()) == (2, 5)
+
+    # Páginas de 3 passam das entradas ativas para as arquivadas sem repetir nem pular
+    acoes, cursor = [], None
+    while True:
+        response = client.get(f"/api/reservas/{reserva['id']}/logs", params={"limit": 3, **({"cursor": cursor} if cursor else {})})
+        acoes += [log["acao"] for log in response.json()]
+        cursor = response.headers.get("x-proximo-cursor")
+        if not cursor:
+            break
+    assert acoes == ["Check-out realizado", "Check-in realizado"] + [f"Antiga {n}" for n in range(4, -1, -1)]
+    assert len(client.get("/api/auditoria/", params={"limit": 500}).json()) == 7
+
+    plano = db.execute(text(
+        "EXPLAIN QUERY PLAN SELECT * FROM audit_logs WHERE reserva_id = 1 ORDER BY created_at DESC"
+    )).fetchall()
+    assert "ix_audit_logs_reserva_created" in str(plano)
+
+    # Com tudo arquivado, a próxima entrada não reaproveita um id que está no arquivo
+    assert _resultado_do_job(client.post("/api/auditoria/arquivar", params={"antes_de": "2100-01-01T00:00:00"})) == {"arquivadas": 2}
+    client.put(f"/api/reservas/{reserva['id']}", json={"observacoes": "nova"})
+    nova = client.get(f"/api/reservas/{reserva['id']}/logs").json()
+    assert nova[0]["acao"] != "Check-out realizado" and nova[0]["id"] > max(log["id"] for log in nova[1:])
+    assert len({log["id"] for log in nova}) == len(nova) == 8
+    assert _resultado_do_job(client.post("/api/auditoria/arquivar", params={"antes_de": "2100-01-01T00:00:00"})) == {"arquivadas": 1}
+    db.close()
+
+def test_engine_sqlite_configurada_e_rotas_publicas_na_replica(monkeypatch, tmp_path):
+    from datetime import date
+    from sqlalchemy import text
+    from sqlalchemy.orm import sessionmaker
+    from app import database
+    from app.models.models import Cabana
+
+    replica = database.criar_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    with replica.connect() as conexao:
+        pragmas = [conexao.execute(text(f"PRAGMA {nome}")).scalar()
+                   for nome in ("journal_mode", "synchronous", "busy_timeout", "mmap_size")]
+    assert pragmas == ["wal", 1, database.SQLITE_BUSY_TIMEOUT_MS, database.SQLITE_MMAP_BYTES]
+    assert replica.pool.size() == database.POOL_SIZE
+    # Em memória: sem WAL nem pool de arquivo
+    with database.criar_engine("sqlite://").connect() as conexao:
+        assert conexao.execute(text("PRAGMA journal_mode")).scalar() == "memory"
+
+    Base.metadata.create_all(bind=replica)
+    SessionReplica = sessionmaker(autocommit=False, autoflush=False, bind=replica)
+    db = SessionReplica()
+    db.add(Cabana(id=7, nome="Só na réplica", numero=7, capacidade=2))
+    db.commit()
+    db.close()
+
+    replica_async = database.criar_engine_async(f"sqlite:///{tmp_path / 'replica.db'}", poolclass=NullPool)
+    assert replica_async.url.drivername == "sqlite+aiosqlite"
+    monkeypatch.setattr(database, "AsyncSessionLeitura", async_sessionmaker(replica_async, expire_on_commit=False))
+    inicio = date(2030, 1, 1).isoformat()
+    assert [c["nome"] for c in client.get(
+        "/api/public/disponibilidade", params={"inicio": inicio, "fim": "2030-01-03"}
+    ).json()] == ["Só na réplica"]
+    # Escritas e rotas internas continuam no banco principal
+    assert [c["nome"] for c in client.get("/api/cabanas/").json()] == ["Teste Cabana"]
+
+    # Logo após uma alteração, o mapa lido da réplica (talvez ainda sem ela) não fica em cache
+    from app.services import ocupacao_service
+    monkeypatch.setattr(database, "engine_leitura_async", replica_async)
+    ocupacao_service.invalidar({7})
+    assert client.get("/api/public/ocupacao/7").json() == []
+    assert 7 not in ocupacao_service._mapas
+    monkeypatch.setattr(database, "REPLICA_ATRASO_MAX_SEGUNDOS", 0)
+    client.get("/api/public/ocupacao/7")
+    assert 7 in ocupacao_service._mapas
+
+def test_rotas_publicas_pela_sessao_assincrona_criada_no_primeiro_uso(monkeypatch, tmp_path):
+    import httpx
+    from datetime import date, timedelta
+    from app import database
+    from app.models.models import Cabana
+
+    # Sem os overrides: as rotas usam `get_db_async` de verdade, num banco só deste teste
+    url = f"sqlite:///{tmp_path / 'assincrono.db'}"
+    banco = create_engine(url)
+    Base.metadata.create_all(bind=banco)
+    db = sessionmaker(bind=banco)()
+    db.add(Cabana(id=3, nome="Cabana Assíncrona", numero=3, capacidade=4, preco_base_semana=100.0, preco_base_fds=100.0))
+    db.commit()
+    db.close()
+    monkeypatch.setattr(database, "SQLALCHEMY_DATABASE_URL", url)
+    for nome in ("engine_async", "AsyncSessionLocal"):
+        monkeypatch.setattr(database, nome, None)
+    monkeypatch.delitem(app.dependency_overrides, get_db_async)
+
+    inicio = date.today() + timedelta(days=30)
+    periodo = {"inicio": inicio.isoformat(), "fim": (inicio + timedelta(days=2)).isoformat()}
+    pedido = {"nome": "Bia", "telefone": "1", "email": "bia@teste.com", "cabana_id": 3,
+              "data_checkin": periodo["inicio"], "data_checkout": periodo["fim"]}
+
+    async def cenario():
+        # Um único event loop, como no uvicorn: a engine mantém as conexões no pool entre as requisições
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://teste") as cliente:
+            assert database.engine_async is None
+            assert [c["nome"] for c in (await cliente.get("/api/public/cabanas")).json()] == ["Cabana Assíncrona"]
+            assert database.engine_async.url.drivername == "sqlite+aiosqlite"
+            assert (await cliente.get("/api/public/disponibilidade/3", params=periodo)).json() == {"disponivel": True}
+            assert (await cliente.get("/api/public/disponibilidade/99", params=periodo)).status_code == 404
+
+            # Dois pedidos simultâneos para as mesmas datas: a trava da cabana deixa passar um só
+            respostas = await asyncio.gather(*[cliente.post("/api/public/reservar", json=pedido) for _ in range(2)])
+            assert sorted(r.status_code for r in respostas) == [200, 400]
+
+            assert (await cliente.get("/api/public/disponibilidade/3", params=periodo)).json() == {"disponivel": False}
+            assert (await cliente.get("/api/public/ocupacao/3", params=periodo)).json() == [
+                periodo["inicio"], (inicio + timedelta(days=1)).isoformat()
+            ]
+            orcamento = (await cliente.get("/api/public/calcular-preco", params={
+                "cabana_id": 3, "data_checkin": periodo["inicio"], "data_checkout": periodo["fim"]
+            })).json()
+            assert orcamento["total"] == 200.0
+        await database.fechar_engines_async()
+
+    asyncio.run(cenario())
+    banco.dispose()
+
+def test_catalogo_em_cache_com_etag_e_invalidado_pelas_edicoes():
+    from sqlalchemy import event
+    from app.services import cache_service
+
+    consultas = []
+    def contar(conn, cursor, statement, *args):
+        if "FROM cabanas" in statement:
+            consultas.append(statement)
+    event.listen(engine_async.sync_engine, "before_cursor_execute", contar)
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        primeira = client.get("/api/public/cabanas")
+        assert primeira.status_code == 200
+        assert primeira.headers["cache-control"].startswith("public, max-age=")
+        etag = primeira.headers["etag"]
+        # Mesma lista no painel e no site, servida do cache
+        painel = client.get("/api/cabanas/")
+        assert painel.json() == primeira.json() and painel.headers["cache-control"] == "private, no-cache"
+        assert client.get("/api/public/cabanas", headers={"If-None-Match": etag}).status_code == 304
+        assert len(consultas) == 1
+
+        client.put("/api/cabanas/1/precos", params={"preco_semana": 321.0, "preco_fds": 456.0})
+        depois = client.get("/api/public/cabanas")
+        assert depois.headers["etag"] != etag and depois.json()[0]["preco_base_semana"] == 321.0
+        assert client.get("/api/cabanas/").json()[0]["preco_base_fds"] == 456.0
+    finally:
+        event.remove(engine_async.sync_engine, "before_cursor_execute", contar)
+        event.remove(engine, "before_cursor_execute", contar)
+
+    # LRU e TTL do backend local
+    local = cache_service.BackendLocal(max_entradas=2)
+    local.gravar("a", b"1", ttl=60)
+    local.gravar("b", b"2", ttl=60)
+    local.obter("a")
+    local.gravar("c", b"3", ttl=60)
+    assert (local.obter("a"), local.obter("b"), local.obter("c")) == (b"1", None, b"3")
+    local.gravar("d", b"4", ttl=0)
+    assert local.obter("d") is None
+
+    # Resposta gerada durante uma invalidação não fica no cache como atual
+    def gerar_durante_edicao():
+        cache_service.invalidar("teste")
+        return b"antiga"
+    assert cache_service.resposta("teste", "x", gerar_durante_edicao).corpo == b"antiga"
+    assert cache_service.resposta("teste", "x", lambda: b"nova").corpo == b"nova"
+
+def test_amenities_e_galeria_estruturadas_com_variantes():
+    from sqlalchemy import text
+    # O formato antigo (texto separado por vírgula) ainda é aceito na escrita
+    resposta = client.put("/api/cabanas/1", json={
+        "nome": "Teste Cabana", "numero": 101,
+        "amenities": "Wi-fi, Ofurô, ",
+        "galeria_urls": ["/fotos/a.jpg", {"full": "/fotos/b.jpg", "medium": "/fotos/b-800.webp",
+                                          "thumbnail": "/fotos/b-320.webp"}],
+    })
+    assert resposta.status_code == 200
+    esperado_galeria = [
+        {"full": "/fotos/a.jpg"},
+        {"full": "/fotos/b.jpg", "medium": "/fotos/b-800.webp", "thumbnail": "/fotos/b-320.webp"},
+    ]
+    assert resposta.json()["amenities"] == ["Wi-fi", "Ofurô"]
+    assert resposta.json()["galeria_urls"] == esperado_galeria
+
+    cabana = client.get("/api/public/cabanas").json()[0]
+    assert cabana["amenities"] == ["Wi-fi", "Ofurô"] and cabana["galeria_urls"] == esperado_galeria
+
+    # Gravado como JSON, sem variantes vazias
+    with engine.connect() as conexao:
+        galeria = conexao.execute(text("SELECT galeria_urls FROM cabanas WHERE id = 1")).scalar()
+    assert '"medium": null' not in galeria
+
+def test_upload_de_imagem_gera_variantes_imutaveis(monkeypatch, tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    import io
+    from app.services import imagens_service
+    monkeypatch.setattr(imagens_service, "IMAGENS_DIR", str(tmp_path))
+
+    original = io.BytesIO()
+    Image.new("RGB", (2400, 1600), (34, 85, 51)).save(original, format="PNG")
+    enviar = lambda **params: client.post("/api/cabanas/1/imagens", params=params,
+                                          files={"file": ("foto.png", original.getvalue(), "image/png")})
+    resposta = enviar(capa="true")
+    assert resposta.status_code == 200
+    foto = resposta.json()["galeria_urls"][0]
+    assert (foto["largura"], foto["altura"]) == (2400, 1600)
+    assert resposta.json()["imagem_url"] == foto["medium"]
+    assert [foto[v].rsplit("-", 1)[1] for v in ("thumbnail", "medium", "full")] == ["320.webp", "960.webp", "1920.webp"]
+    if imagens_service.formatos_suportados()[0] == "avif":
+        assert foto["avif"]["full"].endswith("-1920.avif")
+
+    servida = client.get(foto["medium"])
+    assert servida.status_code == 200 and servida.headers["content-type"] == "image/webp"
+    assert servida.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert Image.open(io.BytesIO(servida.content)).size == (960, 640)
+    assert len(servida.content) < len(original.getvalue())
+
+    # Mesma foto: mesmos arquivos (nomes pelo conteúdo), nada novo no disco
+    arquivos = sorted(p.name for p in tmp_path.iterdir())
+    segunda = enviar().json()["galeria_urls"]
+    assert len(segunda) == 2 and segunda[1] == segunda[0]
+    assert sorted(p.name for p in tmp_path.iterdir()) == arquivos
+    assert client.get("/api/public/cabanas").json()[0]["galeria_urls"] == segunda
+
+    assert client.post("/api/cabanas/1/imagens", files={"file": ("x.png", b"nada", "image/png")}).status_code == 400
+    assert client.get("/imagens/..%2Ftest.db").status_code == 404
+
+def test_eventos_de_reserva_em_tempo_real_por_cabana():
+    from datetime import date
+    from app.models.models import Cabana
+    from app.services import fluxo_eventos_service
+    from app.services.eventos_reserva import registrar_alteracao
+
+    db = TestingSessionLocal()
+    db.add(Cabana(id=2, nome="Outra", numero=102, capacidade=2))
+    db.commit()
+    db.close()
+
+    async def proximo(fila):
+        return await asyncio.wait_for(fila.get(), 1)
+
+    async def cenario():
+        async with fluxo_eventos_service.assinar({1}) as fila, fluxo_eventos_service.assinar({2}) as outra:
+            criada = (await asyncio.to_thread(client.post, "/api/reservas/", json={
+                "cliente_id": 1, "cabana_id": 1, "data_checkin": "2031-03-01", "data_checkout": "2031-03-04"
+            })).json()
+            evento = await proximo(fila)
+            assert (evento["tipo"], evento["reserva_id"], evento["data_checkin"]) == ("criada", criada["id"], "2031-03-01")
+
+            await asyncio.to_thread(client.put, f"/api/reservas/{criada['id']}", json={"data_checkout": "2031-03-06"})
+            evento = await proximo(fila)
+            assert evento["tipo"] == "atualizada" and evento["anterior"] == {"data_checkin": "2031-03-01",
+                                                                              "data_checkout": "2031-03-04"}
+            await asyncio.to_thread(client.delete, f"/api/reservas/{criada['id']}")
+            assert (await proximo(fila))["tipo"] == "cancelada"
+
+            # Reserva do site (sessão assíncrona) e escrita em lote (sincronização do Airbnb)
+            await asyncio.to_thread(client.post, "/api/public/reservar", json={
+                "nome": "Ana", "telefone": "31999999999", "email": "ana@exemplo.com",
+                "cabana_id": 1, "data_checkin": "2031-04-01", "data_checkout": "2031-04-03"
+            })
+            assert (await proximo(fila))["tipo"] == "criada"
+            db = TestingSessionLocal()
+            registrar_alteracao(db, 1, date(2031, 5, 1), date(2031, 5, 9))
+            db.commit()
+            db.close()
+            assert (await proximo(fila))["tipo"] == "periodo"
+            assert outra.empty()
+
+        # O site recebe só a cabana e o período, e nada quando a disponibilidade não muda
+        chamadas = iter([False, False, True])
+        async def desconectado():
+            return next(chamadas)
+        fluxo = fluxo_eventos_service.fluxo_sse(desconectado, {1}, fluxo_eventos_service.evento_publico)
+        assert await fluxo.__anext__() == "retry: 1000\n\n"
+        await asyncio.to_thread(client.put, f"/api/reservas/{criada['id']}", json={"observacoes": "Chega tarde"})
+        await asyncio.to_thread(client.put, f"/api/reservas/{criada['id']}", json={"status": "confirmada"})
+        assert await fluxo.__anext__() == (
+            'event: disponibilidade\ndata: {"tipo": "disponibilidade", "cabana_id": 1, '
+            '"inicio": "2031-03-01", "fim": "2031-03-06"}\n\n'
+        )
+        await fluxo.aclose()
+
+    asyncio.run(cenario())
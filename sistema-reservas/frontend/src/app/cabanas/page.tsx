@@ -9,6 +9,10 @@ import { Loading } from '@/components/ui/Loading';
 import { Image as ImageIcon, Settings, Info, ListChecks, Save } from 'lucide-react';
 import toast from 'react-hot-toast';
 import axios from 'axios';
+import { Cabana } from '@/types';
+
+// O formulário edita as listas como texto; a API recebe e devolve arrays
+const paraLista = (texto: string) => texto.split(',').map(item => item.trim()).filter(Boolean);
 
 export default function CabanasGestaoPage() {
   const queryClient = useQueryClient();
@@ -49,14 +53,14 @@ export default function CabanasGestaoPage() {
   );
 }
 
-function CabanaEditor({ cabana, onSave, isSaving }: { cabana: any, onSave: (data: any) => void, isSaving: boolean }) {
+function CabanaEditor({ cabana, onSave, isSaving }: { cabana: Cabana & Record<string, any>, onSave: (data: any) => void, isSaving: boolean }) {
   const [formData, setFormData] = useState({
     nome: cabana.nome,
     numero: cabana.numero,
     descricao: cabana.descricao || '',
     full_description: cabana.full_description || '',
-    amenities: cabana.amenities || '',
-    galeria_urls: cabana.galeria_urls || '',
+    amenities: cabana.amenities.join(', '),
+    galeria_urls: cabana.galeria_urls.map(foto => foto.full).join(', '),
     capacidade: cabana.capacidade,
     preco_base_semana: cabana.preco_base_semana,
     preco_base_fds: cabana.preco_base_fds,
@@ -140,7 +144,14 @@ function CabanaEditor({ cabana, onSave, isSaving }: { cabana: any, onSave: (data
           </div>
 
           <Button 
-            onClick={() => onSave(formData)} 
+            onClick={() => onSave({
+              ...formData,
+              amenities: paraLista(formData.amenities),
+              // Fotos já cadastradas mantêm as variantes geradas
+              galeria_urls: paraLista(formData.galeria_urls).map(
+                url => cabana.galeria_urls.find(foto => foto.full === url) ?? url
+              ),
+            })} 
             isLoading={isSaving}
             className="w-full bg-stone-900 dark:bg-stone-100 text-white dark:text-stone-900 h-12"
           >
@@ -1,10 +1,11 @@
 'use client';
 
 import React from 'react';
-import { useQuery } from '@tanstack/react-query';
+import { keepPreviousData, useQuery } from '@tanstack/react-query';
 import { cabanasAPI, reservasAPI } from '@/services/api';
 import { Loading } from '@/components/ui/Loading';
-import { MapaOcupacao } from '@/components/MapaOcupacao';
+import { MapaOcupacao, DIAS_VISIVEIS } from '@/components/MapaOcupacao';
+import { addDays, format, startOfToday } from 'date-fns';
 import { Calendar as CalendarIcon, Filter, Plus } from 'lucide-react';
 import { Modal } from '@/components/ui/Modal';
 import { NovaReservaForm } from '@/components/NovaReservaForm';
@@ -13,15 +14,20 @@ import { ReservaDetalhesModal } from '@/components/ReservaDetalhesModal';
 export default function CalendarioPage() {
   const [isModalOpen, setIsModalOpen] = React.useState(false);
   const [selectedReservaId, setSelectedReservaId] = React.useState<number | null>(null);
+  const [startDate, setStartDate] = React.useState(startOfToday());
+  const start = format(startDate, 'yyyy-MM-dd');
+  const end = format(addDays(startDate, DIAS_VISIVEIS), 'yyyy-MM-dd');
 
   const { data: cabanas, isLoading: loadingCabanas } = useQuery({
     queryKey: ['cabanas'],
     queryFn: cabanasAPI.listar,
   });
 
+  // Só a janela visível do mapa; a anterior continua na tela enquanto a próxima carrega
   const { data: reservas, isLoading: loadingReservas } = useQuery({
-    queryKey: ['reservas-calendario'],
-    queryFn: () => reservasAPI.listar({ limit: 100 } as any),
+    queryKey: ['reservas-calendario', start, end],
+    queryFn: () => reservasAPI.calendario({ start, end }),
+    placeholderData: keepPreviousData,
   });
 
   if (loadingCabanas || loadingReservas) return <Loading />;
@@ -47,6 +53,8 @@ export default function CalendarioPage() {
       <MapaOcupacao 
         cabanas={cabanas || []} 
         reservas={reservas || []} 
+        startDate={startDate}
+        onStartDateChange={setStartDate}
         onReservaClick={(id) => setSelectedReservaId(id)}
       />
 
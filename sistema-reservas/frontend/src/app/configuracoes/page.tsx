@@ -10,6 +10,7 @@ export default function ConfiguracoesPage() {
   const [file, setFile] = useState<File | null>(null);
   const [uploading, setUploading] = useState(false);
   const [result, setResult] = useState<any>(null);
+  const [progress, setProgress] = useState<number | null>(null);
 
   const handleFileChange = (e: React.ChangeEvent<HTMLInputElement>) => {
     if (e.target.files) {
@@ -21,6 +22,7 @@ export default function ConfiguracoesPage() {
     if (!file) return;
 
     setUploading(true);
+    setProgress(null);
     const formData = new FormData();
     formData.append('file', file);
 
@@ -31,16 +33,30 @@ export default function ConfiguracoesPage() {
       });
 
       const data = await response.json();
-      if (data.status === 'success') {
-        setResult(data.stats);
+      if (data.status !== 'queued') {
+        toast.error(data.detail || 'Erro ao enviar arquivo.');
+        return;
+      }
+
+      // A importação roda em segundo plano: acompanha o job até terminar
+      let job;
+      do {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        job = await (await fetch(`http://localhost:8000/api/jobs/${data.job_id}`)).json();
+        setProgress(job.progresso);
+      } while (job.status === 'pendente' || job.status === 'executando');
+
+      if (job.status === 'concluido') {
+        setResult(job.resultado);
         toast.success('Arquivo processado com sucesso!');
       } else {
-        toast.error('Erro ao processar arquivo.');
+        toast.error(job.erro || 'Erro ao processar arquivo.');
       }
     } catch (error) {
       toast.error('Erro de conexão com o servidor.');
     } finally {
       setUploading(false);
+      setProgress(null);
     }
   };
 
@@ -81,7 +97,7 @@ export default function ConfiguracoesPage() {
               className="w-full bg-stone-900 dark:bg-stone-100 text-white dark:text-stone-900"
               isLoading={uploading}
             >
-              Processar e Sincronizar Dados
+              {progress !== null ? `Processando... ${progress}%` : 'Processar e Sincronizar Dados'}
             </Button>
 
             {result && (
@@ -93,7 +109,18 @@ export default function ConfiguracoesPage() {
                 <div className="grid grid-cols-2 gap-4 text-xs">
                   <div className="text-stone-600 dark:text-stone-400">Reservas Atualizadas: <span className="font-bold text-green-600">{result.atualizados}</span></div>
                   <div className="text-stone-600 dark:text-stone-400">Não encontradas no iCal: <span className="font-bold text-stone-500">{result.ignorados}</span></div>
+                  <div className="text-stone-600 dark:text-stone-400">Linhas com erro: <span className="font-bold text-red-600">{result.erros}</span></div>
                 </div>
+                {result.erros_linhas?.length > 0 && (
+                  <ul className="mt-2 max-h-40 overflow-y-auto text-[11px] text-red-700 dark:text-red-400 space-y-1">
+                    {result.erros_linhas.map((item: any) => (
+                      <li key={item.linha} className="flex items-start gap-1">
+                        <AlertCircle size={12} className="mt-0.5 shrink-0" />
+                        Linha {item.linha}{item.codigo ? ` (${item.codigo})` : ''}: {item.erro}
+                      </li>
+                    ))}
+                  </ul>
+                )}
               </div>
             )}
           </div>
@@ -3,6 +3,7 @@
 import React from 'react';
 import { useQuery } from '@tanstack/react-query';
 import { cabanasAPI, reservasAPI } from '@/services/api';
+import { format } from 'date-fns';
 import { Card } from '@/components/ui/Card';
 import { Loading } from '@/components/ui/Loading';
 import { 
@@ -21,7 +22,8 @@ export default function DashboardPage() {
 
   const { data: reservas, isLoading: reservasLoading } = useQuery({
     queryKey: ['reservas-recentes'],
-    queryFn: () => reservasAPI.listar({ limit: 5 } as any),
+    // As 5 próximas estadias (ainda não encerradas), da mais próxima para a mais distante
+    queryFn: () => reservasAPI.listar({ desde: format(new Date(), 'yyyy-MM-dd'), ordem: 'asc', limit: 5 }),
   });
 
   if (statsLoading || reservasLoading) return <Loading />;
@@ -12,17 +12,22 @@ import {
 } from 'date-fns';
 import { ptBR } from 'date-fns/locale';
 import { ChevronLeft, ChevronRight, Calendar as CalendarIcon } from 'lucide-react';
-import { Reserva, Cabana } from '../types';
+import { ReservaCalendario, Cabana } from '../types';
+
+// Exibir 3 semanas de uma vez
+export const DIAS_VISIVEIS = 21;
 
 interface MapaOcupacaoProps {
-  reservas: Reserva[];
+  // Reservas da janela [startDate, startDate + DIAS_VISIVEIS), de /api/reservas/calendario
+  reservas: ReservaCalendario[];
   cabanas: Cabana[];
+  startDate: Date;
+  onStartDateChange: (data: Date) => void;
   onReservaClick?: (reservaId: number) => void;
 }
 
-export const MapaOcupacao: React.FC<MapaOcupacaoProps> = ({ reservas, cabanas, onReservaClick }) => {
-  const [startDate, setStartDate] = React.useState(startOfToday());
-  const diasParaExibir = 21; // Exibir 3 semanas de uma vez
+export const MapaOcupacao: React.FC<MapaOcupacaoProps> = ({ reservas, cabanas, startDate, onStartDateChange, onReservaClick }) => {
+  const diasParaExibir = DIAS_VISIVEIS;
 
   const dias = useMemo(() => {
     return eachDayOfInterval({
@@ -32,7 +37,7 @@ export const MapaOcupacao: React.FC<MapaOcupacaoProps> = ({ reservas, cabanas, o
   }, [startDate]);
 
   const navegar = (quantidade: number) => {
-    setStartDate(addDays(startDate, quantidade));
+    onStartDateChange(addDays(startDate, quantidade));
   };
 
   return (
@@ -47,7 +52,7 @@ export const MapaOcupacao: React.FC<MapaOcupacaoProps> = ({ reservas, cabanas, o
             </span>
           </div>
           <button 
-            onClick={() => setStartDate(startOfToday())}
+            onClick={() => onStartDateChange(startOfToday())}
             className="text-xs font-bold uppercase tracking-widest px-3 py-1 bg-white dark:bg-stone-800 border border-stone-200 dark:border-stone-700 rounded-full hover:bg-stone-50 dark:hover:bg-stone-700 transition-colors"
           >
             Hoje
@@ -100,16 +105,16 @@ export const MapaOcupacao: React.FC<MapaOcupacaoProps> = ({ reservas, cabanas, o
                   
                   // Encontrar reserva que cobre este dia
                   const reserva = reservas.find(r => {
-                    const checkin = startOfDay(new Date(r.data_checkin));
-                    const checkout = startOfDay(new Date(r.data_checkout));
+                    const checkin = startOfDay(new Date(r.start));
+                    const checkout = startOfDay(new Date(r.end));
                     return r.cabana_id === cabana.id && 
                            dataDia >= checkin && 
                            dataDia < checkout;
                   });
 
                   if (reserva) {
-                    const checkin = startOfDay(new Date(reserva.data_checkin));
-                    const checkout = startOfDay(new Date(reserva.data_checkout));
+                    const checkin = startOfDay(new Date(reserva.start));
+                    const checkout = startOfDay(new Date(reserva.end));
                     const isStart = isSameDay(dataDia, checkin);
                     
                     if (isStart || isSameDay(dataDia, startDate)) {
@@ -139,7 +144,7 @@ export const MapaOcupacao: React.FC<MapaOcupacaoProps> = ({ reservas, cabanas, o
                               marginLeft: isStart ? '0' : '0',
                             }}
                           >
-                            <span className={isStart ? 'ml-0' : ''}>{reserva.cliente?.nome || 'N/A'}</span>
+                            <span className={isStart ? 'ml-0' : ''}>{reserva.cliente_nome || 'N/A'}</span>
                           </div>
                         </td>
                       );
@@ -5,6 +5,12 @@ import { useState } from 'react';
 import { Toaster } from 'react-hot-toast';
 import { AuthProvider } from '@/hooks/useAuth';
 import { ThemeProvider } from '@/hooks/useTheme';
+import { useEventosReservas } from '@/hooks/useEventosReservas';
+
+function EventosReservas() {
+  useEventosReservas();
+  return null;
+}
 
 export default function Providers({ children }: { children: React.ReactNode }) {
   const [queryClient] = useState(() => new QueryClient({
@@ -18,6 +24,7 @@ export default function Providers({ children }: { children: React.ReactNode }) {
 
   return (
     <QueryClientProvider client={queryClient}>
+      <EventosReservas />
       <AuthProvider>
         <ThemeProvider>
           {children}
@@ -0,0 +1,28 @@
+'use client';
+
+import { useEffect } from 'react';
+import { useQueryClient } from '@tanstack/react-query';
+import { API_URL } from '@/services/api';
+
+const TIPOS = ['criada', 'atualizada', 'cancelada', 'removida', 'periodo', 'ressincronizar'];
+
+// Recarrega as telas de reservas quando o backend avisa de uma alteração (SSE), sem polling
+export function useEventosReservas() {
+  const queryClient = useQueryClient();
+
+  useEffect(() => {
+    const fonte = new EventSource(`${API_URL}/api/reservas/eventos`);
+    const aoAlterar = (mensagem: MessageEvent) => {
+      const evento = JSON.parse(mensagem.data);
+      for (const chave of ['reservas-calendario', 'reservas', 'reservas-recentes', 'stats', 'relatorios']) {
+        queryClient.invalidateQueries({ queryKey: [chave] });
+      }
+      if (evento.reserva_id) {
+        queryClient.invalidateQueries({ queryKey: ['reserva', evento.reserva_id] });
+        queryClient.invalidateQueries({ queryKey: ['logs', evento.reserva_id] });
+      }
+    };
+    TIPOS.forEach(tipo => fonte.addEventListener(tipo, aoAlterar));
+    return () => fonte.close();
+  }, [queryClient]);
+}
@@ -1,8 +1,10 @@
 import axios from 'axios';
 import { Cliente, Cabana, Reserva, Mensagem, ReservaCalendario, Stats, AuditLog } from '../types';
 
+export const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
+
 const api = axios.create({
-  baseURL: process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000',
+  baseURL: API_URL,
 });
 
 // --- CLIENTES ---
@@ -16,9 +18,11 @@ export const clientesAPI = {
 
 // --- RESERVAS ---
 export const reservasAPI = {
-  listar: (params?: { cabana_id?: number; status?: string }) => 
-    api.get<Reserva[]>('/api/reservas/', { params }).then(res => res.data),
-  calendario: () => api.get<ReservaCalendario[]>('/api/reservas/calendario').then(res => res.data),
+  // Sem limit/cursor, todas as reservas do filtro; com eles, uma página (próxima em X-Proximo-Cursor)
+  listar: (params?: { cabana_id?: number; status?: string; desde?: string; ordem?: 'asc' | 'desc'; limit?: number; cursor?: string }) => 
+    api.get<Reserva[]>('/api/reservas/', { params: { expand: 'cliente,cabana', ...params } }).then(res => res.data),
+  calendario: (params?: { start?: string; end?: string; cabana_id?: number }) =>
+    api.get<ReservaCalendario[]>('/api/reservas/calendario', { params }).then(res => res.data),
   buscar: (id: number) => api.get<Reserva>(`/api/reservas/${id}`).then(res => res.data),
   criar: (data: any) => api.post<Reserva>('/api/reservas/', data).then(res => res.data),
   atualizar: (id: number, data: any) => api.put<Reserva>(`/api/reservas/${id}`, data).then(res => res.data),
@@ -7,6 +7,12 @@ export interface Cliente {
   updated_at?: string;
 }
 
+export interface ImagemGaleria {
+  full: string;
+  medium?: string;
+  thumbnail?: string;
+}
+
 export interface Cabana {
   id: number;
   nome: string;
@@ -14,6 +20,8 @@ export interface Cabana {
   descricao?: string;
   capacidade: number;
   airbnb_ical_url?: string;
+  amenities: string[];
+  galeria_urls: ImagemGaleria[];
 }
 
 export type ReservaStatus = 'confirmada' | 'pendente' | 'cancelada' | 'concluída';
@@ -58,6 +66,7 @@ export interface ReservaCalendario {
   end: string;
   cabana_id: number;
   status: ReservaStatus;
+  cliente_nome?: string;
 }
 
 export interface AuditLog {
@@ -65,7 +74,7 @@ export interface AuditLog {
   reserva_id?: number;
   usuario: string;
   acao: string;
-  detalhes?: string;
+  detalhes?: Record<string, unknown> | null;
   created_at: string;
 }
 